@@ -0,0 +1,314 @@
+"""
+HerApt Benchmark Suite
+Inference and training performance on profiles sampled from career_path_ultra_enhanced.csv
+Results are written as JSON and compared against a baseline run to flag regressions
+
+Run:
+    python benchmark_ultra.py --output bench.json
+    python benchmark_ultra.py --baseline bench.json --fail-on-regression
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+BATCH_SIZES = [1, 16, 256, 4096]
+
+# Profiles carry no labels; everything else in the CSV is a model input
+LABEL_COLUMNS = ('Career', 'Success_Percentage')
+
+
+def sample_profiles(data_path, n, seed=42):
+    """n profiles sampled (with replacement) from the training CSV, labels dropped"""
+
+    import pandas as pd
+
+    df = pd.read_csv(data_path)
+    sample = df.drop(columns=[c for c in LABEL_COLUMNS if c in df.columns])
+    sample = sample.sample(n, replace=True, random_state=seed)
+    return sample.to_dict('records')
+
+
+def percentiles_ms(timings):
+    """p50/p95/p99/mean of a list of seconds, in milliseconds"""
+
+    values = np.asarray(timings) * 1000
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': float(values.mean()),
+    }
+
+
+def quiet():
+    """Swallow the predictor's and sklearn's status prints while timing"""
+
+    stack = contextlib.ExitStack()
+    stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+    stack.enter_context(contextlib.redirect_stderr(io.StringIO()))
+    return stack
+
+
+def load_predictor(mode):
+    """(predictor, load seconds) for 'sklearn', 'flat' or 'artifact'"""
+
+    from career_predictor_ultra import UltraCareerPredictor
+
+    kwargs = {'artifact': {'artifact_path': 'career_model_ultra.bin'}, 'flat': {'engine': 'flat'}}.get(mode, {})
+    start = time.perf_counter()
+    with quiet():
+        predictor = UltraCareerPredictor(**kwargs)
+    elapsed = time.perf_counter() - start
+    if predictor.model is not None:
+        predictor.model.verbose = 0
+    return predictor, elapsed
+
+
+def bench_predict(predictor, profiles):
+    """Single-profile predict() latency distribution"""
+
+    predictor.predict(profiles[0])
+    timings = []
+    with quiet():
+        for profile in profiles:
+            start = time.perf_counter()
+            predictor.predict(profile)
+            timings.append(time.perf_counter() - start)
+    return percentiles_ms(timings)
+
+
+def bench_throughput(predictor, profiles, batch_sizes=BATCH_SIZES, min_seconds=0.5):
+    """predict_proba rows/s on encoded features, per batch size"""
+
+    numeric, categorical, frame = predictor.profile_columns(profiles)
+    if frame is None:
+        X = predictor.encoder.encode_columns(numeric, categorical)
+    else:
+        X = predictor.preprocessor.transform(frame)
+    estimator = predictor.forest if predictor.forest is not None else predictor.model
+
+    results = {}
+    for batch_size in batch_sizes:
+        batch = X[np.arange(batch_size) % len(X)]
+        estimator.predict_proba(batch)
+        rows, start = 0, time.perf_counter()
+        while time.perf_counter() - start < min_seconds:
+            estimator.predict_proba(batch)
+            rows += batch_size
+        results[f'batch_{batch_size}_rows_per_s'] = rows / (time.perf_counter() - start)
+    return results
+
+
+def bench_scoring(predictor, profiles, repeats=2000):
+    """calculate_success_percentage and get_personalized_advice cost per call"""
+
+    careers = list(predictor.career_classes[:20])
+    calls = [(profiles[i % len(profiles)], careers[i % len(careers)]) for i in range(repeats)]
+
+    start = time.perf_counter()
+    for profile, career in calls:
+        predictor.calculate_success_percentage(profile, career, 0.5)
+    success_us = (time.perf_counter() - start) / repeats * 1e6
+
+    start = time.perf_counter()
+    for profile, career in calls:
+        predictor.get_personalized_advice(profile, career)
+    advice_us = (time.perf_counter() - start) / repeats * 1e6
+
+    return {'success_percentage_us': success_us, 'personalized_advice_us': advice_us}
+
+
+def bench_training(data_path, engine='rf', cv=True):
+    """
+    Wall time of each training stage, without the stage cache and without
+    writing model files
+    """
+
+    import pandas as pd
+    import train_model_ultra as tm
+    from dataset_loader_ultra import read_csv_typed
+
+    timings = {}
+
+    def stage(name, fn):
+        start = time.perf_counter()
+        with quiet():
+            result = fn()
+        timings[f'{name}_s'] = time.perf_counter() - start
+        return result
+
+    stage('read_csv_legacy', lambda: pd.read_csv(data_path))
+    df = stage('read_csv_typed', lambda: read_csv_typed(data_path))
+    le_career, y = stage('encode_target', lambda: tm.encode_target(df))
+    kind = tm.ENGINES[engine]['features']
+    _, X = stage('preprocess', lambda: tm.fit_preprocessor(
+        df, tm.NUMERIC_FEATURES, tm.CATEGORICAL_FEATURES, kind=kind))
+    X_train, X_test, y_train, y_test = stage('split', lambda: tm.split_data(X, y))
+    model, _ = stage('fit', lambda: tm.train_model(engine, X_train, y_train))
+    if cv:
+        stage('evaluate_cv', lambda: tm.evaluate_model(model, X_test, y_test, X, y))
+    if kind == 'onehot':
+        stage('flatten', lambda: tm.FlatForest.from_sklearn(model))
+    timings['total_s'] = sum(timings.values()) - timings['read_csv_legacy_s']
+    return timings
+
+
+def environment():
+    """Versions and machine details stored with every run"""
+
+    import sklearn
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': commit or None,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run(args):
+    """All selected benchmarks as a flat {metric: value} dict"""
+
+    metrics = {}
+    profiles = sample_profiles(args.data, args.profiles, seed=args.seed)
+
+    for mode in args.modes:
+        print(f" [{mode}] loading...")
+        predictor, load_s = load_predictor(mode)
+        metrics[f'{mode}.load_s'] = load_s
+
+        print(f" [{mode}] predict latency over {len(profiles)} profiles...")
+        for name, value in bench_predict(predictor, profiles).items():
+            metrics[f'{mode}.predict.{name}'] = value
+
+        print(f" [{mode}] predict_proba throughput...")
+        for name, value in bench_throughput(predictor, profiles).items():
+            metrics[f'{mode}.predict_proba.{name}'] = value
+
+        if mode == args.modes[0]:
+            print(f" [{mode}] success percentage and advice...")
+            for name, value in bench_scoring(predictor, profiles).items():
+                metrics[f'scoring.{name}'] = value
+        del predictor
+
+    if args.cold_start:
+        import startup_benchmark_ultra
+
+        print(" [cold start] fresh interpreters...")
+        modes = [m for m in ('pickle-sklearn', 'artifact') if m != 'artifact' or 'artifact' in args.modes]
+        for mode, result in startup_benchmark_ultra.benchmark(modes, repeats=3).items():
+            metrics[f'cold_start.{mode}.total_s'] = result['total_s']
+
+    if args.training:
+        print(f" [training] {args.engine} stages (no cache)...")
+        for name, value in bench_training(args.data, args.engine, cv=not args.no_cv).items():
+            metrics[f'training.{args.engine}.{name}'] = value
+
+    return metrics
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_s')
+
+
+def compare(metrics, baseline, threshold):
+    """
+    Relative change of every metric present in both runs
+
+    Returns:
+        list of (metric, baseline value, current value, change, regressed);
+        change > 0 always means "worse", whatever the metric's direction
+    """
+
+    rows = []
+    for metric, value in metrics.items():
+        if metric not in baseline or not baseline[metric]:
+            continue
+        base = baseline[metric]
+        change = (base - value) / base if higher_is_better(metric) else (value - base) / base
+        rows.append((metric, base, value, change, change > threshold))
+    return rows
+
+
+def format_value(metric, value):
+    if higher_is_better(metric):
+        return f"{value:,.0f}/s"
+    if metric.endswith('_us'):
+        return f"{value:.1f}µs"
+    if metric.endswith('_ms'):
+        return f"{value:.3f}ms"
+    return f"{value:.3f}s"
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark HerApt inference and training")
+    parser.add_argument('--data', default='career_path_ultra_enhanced.csv')
+    parser.add_argument('--profiles', type=int, default=1000, help="sampled profiles for latency runs")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--modes', nargs='+', choices=['sklearn', 'flat', 'artifact'],
+                        default=['sklearn', 'artifact'])
+    parser.add_argument('--training', action='store_true', help="also time every training stage")
+    parser.add_argument('--engine', default='rf', help="engine for --training")
+    parser.add_argument('--no-cv', action='store_true', help="skip cross-validation in --training")
+    parser.add_argument('--cold-start', action='store_true', help="also time fresh-interpreter starts")
+    parser.add_argument('--output', default='benchmark_results_ultra.json')
+    parser.add_argument('--baseline', help="earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="relative slowdown reported as a regression (default 10%%)")
+    parser.add_argument('--fail-on-regression', action='store_true', help="exit 1 on any regression")
+    args = parser.parse_args()
+
+    print("="*80)
+    print("HERAPT BENCHMARK SUITE")
+    print("="*80 + "\n")
+
+    metrics = run(args)
+    result = {'environment': environment(), 'settings': vars(args), 'metrics': metrics}
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(metrics, baseline['metrics'], args.threshold)
+        regressions = [row for row in rows if row[4]]
+
+        print(f"\n {'Metric':<52} {'Baseline':>12} {'Current':>12} {'Gain':>8}")
+        for metric, base, value, change, regressed in rows:
+            flag = '  REGRESSION' if regressed else ''
+            print(f" {metric:<52} {format_value(metric, base):>12} {format_value(metric, value):>12} "
+                  f"{-change:>+8.1%}{flag}")
+        print(f"\n Baseline: {baseline['environment'].get('git_commit')} "
+              f"({baseline['environment'].get('timestamp')})")
+    else:
+        print(f"\n {'Metric':<52} {'Value':>12}")
+        for metric, value in metrics.items():
+            print(f" {metric:<52} {format_value(metric, value):>12}")
+
+    print(f"\n Saved {args.output}")
+    if regressions:
+        print(f" {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+    print("\n" + "="*80)
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
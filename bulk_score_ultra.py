@@ -0,0 +1,281 @@
+"""
+HerApt Bulk Scoring
+Stream a JSONL or CSV file of profiles through the predictor in fixed-size chunks
+Results are written as they are produced, so memory stays flat for any input size
+
+Run:
+    python bulk_score_ultra.py profiles.jsonl --output scores.jsonl --top-n 5
+    python bulk_score_ultra.py career_path_ultra_enhanced.csv --workers 4
+    python bulk_score_ultra.py profiles.jsonl --advice
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+
+from profile_record_ultra import ProfileSchema
+
+
+def detect_format(path):
+    """'csv' or 'jsonl' from the file extension"""
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    raise ValueError(f"Cannot tell the format of {path!r}; pass --format csv|jsonl")
+
+
+def iter_jsonl(f):
+    """Profiles from a JSONL stream, one object per non-blank line"""
+
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            profile = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"line {line_number}: invalid JSON ({e})")
+        if not isinstance(profile, dict):
+            raise ValueError(f"line {line_number}: expected a JSON object")
+        yield profile
+
+
+def iter_csv(f, numeric_features):
+    """
+    Profiles from a CSV stream
+
+    Numeric columns are converted to numbers (ints unless the field is
+    fractional, as in a JSON profile); empty cells are left out so the
+    predictor fills them with its defaults.
+    """
+
+    schema = ProfileSchema(numeric_features, [], [])
+    for line_number, row in enumerate(csv.DictReader(f), 2):
+        profile = {}
+        for key, value in row.items():
+            if value is None or value == '':
+                continue
+            if key in schema.numeric_index:
+                try:
+                    value = schema.numeric_value(schema.numeric_index[key], float(value))
+                except ValueError:
+                    raise ValueError(f"line {line_number}: {key}={value!r} is not a number")
+            profile[key] = value
+        yield profile
+
+
+def iter_chunks(profiles, chunk_size):
+    """Group an iterable of profiles into lists of at most chunk_size"""
+
+    chunk = []
+    for profile in profiles:
+        chunk.append(profile)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ResultWriter:
+    """Incremental JSONL or CSV writer for scored profiles"""
+
+    def __init__(self, f, fmt, top_n, id_field=None, advice=False):
+        self.f = f
+        self.fmt = fmt
+        self.top_n = top_n
+        self.id_field = id_field
+        self.advice = advice
+        self.csv_writer = None
+
+        if fmt == 'csv':
+            header = ['row'] + ([id_field] if id_field else [])
+            for rank in range(1, top_n + 1):
+                header += [f'career_{rank}', f'success_{rank}', f'match_{rank}']
+                if advice:
+                    header += [f'strengths_{rank}', f'improvements_{rank}']
+            self.csv_writer = csv.writer(f)
+            self.csv_writer.writerow(header)
+
+    def write(self, row, profile, recommendations, advice=None):
+        """advice: one get_personalized_advice dict per recommendation (with advice=True)"""
+
+        advice = advice or [None] * len(recommendations)
+        if self.fmt == 'csv':
+            record = [row] + ([profile.get(self.id_field, '')] if self.id_field else [])
+            for (career, success, match), career_advice in zip(recommendations, advice):
+                record += [career, float(success), round(float(match), 4)]
+                if self.advice:
+                    record += ['; '.join(career_advice['strengths']), '; '.join(career_advice['improvements'])]
+            self.csv_writer.writerow(record)
+            return
+
+        record = {'row': row}
+        if self.id_field:
+            record[self.id_field] = profile.get(self.id_field)
+        record['recommendations'] = []
+        for (career, success, match), career_advice in zip(recommendations, advice):
+            entry = {'career': str(career), 'success_percentage': float(success), 'match_score': float(match)}
+            if self.advice:
+                entry['strengths'] = career_advice['strengths']
+                entry['improvements'] = career_advice['improvements']
+            record['recommendations'].append(entry)
+        self.f.write(json.dumps(record) + '\n')
+
+
+def score_file(input_path, output_path, top_n=5, chunk_size=1024, workers=1,
+               artifact_path=None, input_format=None, id_field=None, progress_every=0,
+               advice=False):
+    """
+    Score every profile in input_path and write results to output_path
+
+    Args:
+        input_path: JSONL or CSV file of profiles
+        output_path: results file; .csv writes one row per profile, anything
+                     else JSONL with a recommendations list per profile
+        top_n: careers per profile
+        chunk_size: profiles encoded and predicted together
+        workers: >1 scores chunks in an InferencePool (needs an artifact)
+        artifact_path: memory-map this model artifact instead of the pickles
+        input_format: 'csv' or 'jsonl' (default: from the extension)
+        id_field: profile field copied into each result, e.g. a user id
+        progress_every: print throughput every this many rows (0 = only at the end)
+        advice: add strengths and improvements to every recommendation
+
+    Returns:
+        dict with rows, seconds, rows_per_sec and peak_rss_mb
+    """
+
+    from career_predictor_ultra import personalized_advice_batch
+    from dataset_loader_ultra import peak_rss_mb
+
+    input_format = input_format or detect_format(input_path)
+    output_format = 'csv' if output_path.lower().endswith('.csv') else 'jsonl'
+
+    pool = None
+    if workers > 1:
+        from inference_pool_ultra import InferencePool
+        pool = InferencePool(artifact_path or 'career_model_ultra.bin', processes=workers,
+                             chunk_size=chunk_size)
+        numeric_features = pool_numeric_features(pool)
+    else:
+        from career_predictor_ultra import UltraCareerPredictor
+        predictor = UltraCareerPredictor(artifact_path=artifact_path)
+        numeric_features = predictor.numeric_features
+
+
+    start = time.perf_counter()
+    rows = 0
+    try:
+        with open(input_path, newline='') as fin, open(output_path, 'w', newline='') as fout:
+            if input_format == 'csv':
+                profiles = iter_csv(fin, numeric_features)
+            else:
+                profiles = iter_jsonl(fin)
+
+            writer = ResultWriter(fout, output_format, top_n, id_field, advice)
+
+            # Chunks are kept alongside their results only until written
+            chunks = iter_chunks(profiles, chunk_size)
+            if pool is not None:
+                pending = deque()
+
+                def remember(chunks):
+                    for chunk in chunks:
+                        pending.append(chunk)
+                        yield chunk
+
+                scored = (
+                    (pending.popleft(), results)
+                    for results in pool.imap_chunks(remember(chunks), top_n=top_n)
+                )
+            else:
+                scored = ((chunk, predictor.predict_batch(chunk, top_n=top_n)) for chunk in chunks)
+
+            next_report = progress_every
+            for chunk, results in scored:
+                chunk_advice = [None] * len(chunk)
+                if advice:
+                    careers = [[career for career, _, _ in recommendations] for recommendations in results]
+                    chunk_advice = personalized_advice_batch(chunk, careers)
+
+                for profile, recommendations, profile_advice in zip(chunk, results, chunk_advice):
+                    writer.write(rows, profile, recommendations, profile_advice)
+                    rows += 1
+
+                if progress_every and rows >= next_report:
+                    elapsed = time.perf_counter() - start
+                    print(f" {rows:>10,} rows  {rows / elapsed:>10,.0f} rows/s  "
+                          f"peak RSS {peak_rss_mb():.0f}MB")
+                    next_report += progress_every
+    finally:
+        if pool is not None:
+            pool.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def pool_numeric_features(pool):
+    """Numeric feature names from the pool's artifact without loading another predictor"""
+
+    from model_artifact_ultra import read_header
+    header, _ = read_header(pool.artifact_path)
+    return header['numeric_features']
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a JSONL or CSV file of profiles")
+    parser.add_argument('input', help="profiles, one JSON object per line or a CSV with a header")
+    parser.add_argument('--output', '-o', help="results file (.jsonl or .csv; default: <input>_scores.jsonl)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="input format (default: from extension)")
+    parser.add_argument('--top-n', type=int, default=5)
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=1, help="processes scoring chunks in parallel")
+    parser.add_argument('--artifact', help="model artifact to memory-map (required for --workers > 1 "
+                                           "unless career_model_ultra.bin exists)")
+    parser.add_argument('--id-field', help="profile field copied into each result")
+    parser.add_argument('--progress-every', type=int, default=100_000)
+    parser.add_argument('--advice', action='store_true',
+                        help="add strengths and improvements for every recommended career")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.input)[0] + '_scores.jsonl'
+    artifact = args.artifact
+    if artifact is None and os.path.exists('career_model_ultra.bin'):
+        artifact = 'career_model_ultra.bin'
+
+    print("="*80)
+    print("HERAPT BULK SCORING")
+    print("="*80)
+    print(f"\n Input:  {args.input}")
+    print(f" Output: {output}")
+    print(f" Chunk size {args.chunk_size}, top {args.top_n}, {args.workers} worker(s)\n")
+
+    try:
+        summary = score_file(
+            args.input, output, top_n=args.top_n, chunk_size=args.chunk_size,
+            workers=args.workers, artifact_path=artifact, input_format=args.format,
+            id_field=args.id_field, progress_every=args.progress_every, advice=args.advice,
+        )
+    except (ValueError, FileNotFoundError) as e:
+        print(f"\n Error: {e}")
+        sys.exit(1)
+
+    print(f"\n Scored {summary['rows']:,} profiles in {summary['seconds']:.2f}s "
+          f"({summary['rows_per_sec']:,.0f} rows/s)")
+    print(f" Peak RSS: {summary['peak_rss_mb']:.0f}MB")
+    print("\n" + "="*80)
@@ -5,6 +5,7 @@ Returns career predictions with SUCCESS PERCENTAGE (0-100%)
 """
 
 from career_predictor_ultra import UltraCareerPredictor
+from profile_record_ultra import FORM_RANGES, ProfileRecord
 import json
 
 class CareerAssessmentForm:
@@ -95,7 +96,7 @@ class CareerAssessmentForm:
             ['High School (10th/12th)', 'Bachelors Degree', 'Masters Degree', 'PhD/Doctorate'])
         
         self.question_numeric('GPA', 
-            "Your GPA/Percentage (on 4.0 scale)", 0, 4.0)
+            "Your GPA/Percentage (on 4.0 scale)", *FORM_RANGES['GPA'])
         
         
         print("\n" + "="*80)
@@ -103,19 +104,19 @@ class CareerAssessmentForm:
         print("="*80)
         
         self.question_numeric('Work_Experience_Years',
-            "Years of work experience", 0, 30)
+            "Years of work experience", *FORM_RANGES['Work_Experience_Years'])
         
         self.question_numeric('Internships',
-            "Number of internships completed", 0, 10)
+            "Number of internships completed", *FORM_RANGES['Internships'])
         
         self.question_numeric('Projects',
-            "Number of projects you've worked on", 0, 20)
+            "Number of projects you've worked on", *FORM_RANGES['Projects'])
         
         self.question_numeric('Industry_Certifications',
-            "Number of professional certifications", 0, 20)
+            "Number of professional certifications", *FORM_RANGES['Industry_Certifications'])
         
         self.question_numeric('Extracurricular_Activities',
-            "Extracurricular activities you've participated in", 0, 20)
+            "Extracurricular activities you've participated in", *FORM_RANGES['Extracurricular_Activities'])
         
         
         print("\n" + "="*80)
@@ -128,7 +129,7 @@ class CareerAssessmentForm:
         
         if self.answers['Career_Break'] == 'Yes':
             self.question_numeric('Career_Break_Months',
-                "Duration of career break (months)", 1, 120)
+                "Duration of career break (months)", *FORM_RANGES['Career_Break_Months'])
             self.answers['Career_Break'] = 1
         else:
             self.answers['Career_Break_Months'] = 0
@@ -234,7 +235,7 @@ class CareerAssessmentForm:
             "Interest in starting your own business", 5)
         
         self.question_numeric('Salary_Expectation_Lakh',
-            "Expected salary (in lakh per annum)", 1, 100)
+            "Expected salary (in lakh per annum)", *FORM_RANGES['Salary_Expectation_Lakh'])
         
         
         print("\n" + "="*80)
@@ -273,7 +274,8 @@ class CareerAssessmentForm:
     def get_predictions(self):
         """Get career predictions with success percentage"""
         try:
-            recommendations = self.predictor.predict_with_success_rate(self.answers)
+            profile = ProfileRecord.from_form_answers(self.predictor.schema, self.answers)
+            recommendations = self.predictor.predict_with_success_rate(profile)
             return recommendations
         except Exception as e:
             print(f" Error getting predictions: {e}")
@@ -0,0 +1,410 @@
+"""
+HerApt Career Index
+Reverse of predict: the K stored profiles most likely to fit a career
+Keeps every profile's career probabilities and success scores plus a ranked
+top list per career, updated incrementally as profiles are inserted or rescored
+
+Run:
+    python career_index_ultra.py --career "Data Scientist" --filter Age_Group=25-30
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from profile_record_ultra import ProfileBatch, ProfileSchema
+
+
+SCORES = ('success', 'probability')
+
+
+def rank_rows(rows, scores, k):
+    """The k rows with the highest scores, ties broken by row number"""
+
+    if len(rows) > k:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        keep = scores >= kth
+        rows, scores = rows[keep], scores[keep]
+    return rows[np.lexsort((rows, -scores))[:k]]
+
+
+class CareerIndex:
+    """Per-career top-K profile index over a growing profile population"""
+
+    def __init__(self, careers, schema, depth=1000, score='success', predictor=None):
+        """
+        Args:
+            careers: career names in model class order (label_encoder.classes_)
+            schema: ProfileSchema of the model; its categoricals become filters
+            depth: profiles kept in each career's ranked list; deeper
+                   filtered queries fall back to a scan of the whole population
+            score: rank by 'success' percentage or model 'probability'
+            predictor: UltraCareerPredictor used to score inserted profiles
+        """
+        if score not in SCORES:
+            raise ValueError(f"score must be one of {SCORES}, got {score!r}")
+
+        self.careers = [str(c) for c in careers]
+        self.career_index = {c: j for j, c in enumerate(self.careers)}
+        self.schema = schema
+        self.depth = depth
+        self.score = score
+        self.predictor = predictor
+
+        self.size = 0
+        self.ids = []
+        self.rows = {}
+        self.probabilities = np.zeros((0, len(self.careers)), dtype=np.float32)
+        self.success = np.zeros((0, len(self.careers)), dtype=np.float32)
+        self.codes = np.zeros((0, len(schema.categorical_features)), dtype=np.int8)
+        self.active = np.zeros(0, dtype=bool)
+        self.top = [np.zeros(0, dtype=np.int64) for _ in self.careers]
+
+    @classmethod
+    def for_predictor(cls, predictor, depth=1000, score='success'):
+        return cls(predictor.career_classes, predictor.schema, depth, score, predictor)
+
+    @property
+    def n_active(self):
+        return len(self.rows)
+
+    @property
+    def scores(self):
+        """(rows, careers) matrix the index ranks by"""
+        return (self.success if self.score == 'success' else self.probabilities)[:self.size]
+
+    def _batch(self, profiles):
+        if isinstance(profiles, ProfileBatch):
+            return profiles
+        if hasattr(profiles, 'columns'):
+            return ProfileBatch.from_frame(self.schema, profiles)
+        return ProfileBatch.from_dicts(self.schema, profiles)
+
+    def _score(self, batch):
+        if self.predictor is None:
+            raise ValueError("This index has no predictor; pass one to score new profiles")
+        probabilities, success = self.predictor.score_matrix(batch)
+        return probabilities.astype(np.float32), success.astype(np.float32)
+
+    def _reserve(self, n_rows):
+        """Grow the row arrays (doubling) to hold n_rows"""
+
+        capacity = len(self.active)
+        if n_rows <= capacity and self.active.flags.writeable:
+            return
+        capacity = max(n_rows, 2 * capacity, 1024)
+
+        def grown(array, fill=0):
+            out = np.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+            out[:self.size] = array[:self.size]
+            return out
+
+        self.probabilities = grown(self.probabilities)
+        self.success = grown(self.success)
+        self.codes = grown(self.codes, -1)
+        self.active = grown(self.active, False)
+
+    def insert(self, profiles, ids=None):
+        """
+        Score and add profiles
+
+        Args:
+            profiles: list of profile dicts, a DataFrame or a ProfileBatch
+            ids: one unique id per profile (default: running row numbers)
+
+        Returns:
+            row numbers of the new profiles
+        """
+
+        batch = self._batch(profiles)
+        n = len(batch)
+        ids = list(range(self.size, self.size + n)) if ids is None else list(ids)
+        if len(ids) != n:
+            raise ValueError(f"{n} profiles but {len(ids)} ids")
+        duplicates = [i for i in ids if i in self.rows]
+        if duplicates or len(set(ids)) != n:
+            raise ValueError(f"Ids already indexed or repeated, use update(): {duplicates[:5]}")
+
+        probabilities, success = self._score(batch)
+        thresholds = self._thresholds()
+        self._reserve(self.size + n)
+        rows = np.arange(self.size, self.size + n)
+        self.probabilities[rows] = probabilities
+        self.success[rows] = success
+        self.codes[rows] = batch.codes
+        self.active[rows] = True
+        self.size += n
+        for row, profile_id in zip(rows.tolist(), ids):
+            self.rows[profile_id] = row
+        self.ids.extend(ids)
+
+        for j, threshold in enumerate(thresholds):
+            self.top[j] = self._merged(j, rows, threshold)
+        return rows
+
+    def update(self, profiles, ids):
+        """Rescore existing profiles (e.g. after their answers or the model changed)"""
+
+        ids = list(ids)
+        missing = [i for i in ids if i not in self.rows]
+        if missing:
+            raise KeyError(f"Ids not in the index: {missing[:5]}")
+
+        batch = self._batch(profiles)
+        if len(batch) != len(ids):
+            raise ValueError(f"{len(batch)} profiles but {len(ids)} ids")
+        probabilities, success = self._score(batch)
+
+        self._reserve(self.size)
+        rows = np.array([self.rows[i] for i in ids], dtype=np.int64)
+        thresholds = self._thresholds()
+        self.probabilities[rows] = probabilities
+        self.success[rows] = success
+        self.codes[rows] = batch.codes
+
+        for j, threshold in enumerate(thresholds):
+            self.top[j] = self._merged(j, rows, threshold)
+
+    def _thresholds(self):
+        """
+        Per career, the (score, row) of its list's last entry, or None when
+        the list holds every active row
+        """
+
+        scores = self.scores
+        return [
+            None if len(top) == self.n_active
+            else (scores[top[-1], j], top[-1]) if len(top)
+            else (np.inf, -1)
+            for j, top in enumerate(self.top)
+        ]
+
+    def _merged(self, j, rows, threshold):
+        """
+        Career j's list with new or rescored rows merged in
+
+        A list shorter than the population is exact only down to its last
+        entry (threshold, taken before the change): rows it never held could
+        outrank anything below that, so merged rows ranked below it are dropped.
+        """
+
+        scores = self.scores
+        candidates = np.union1d(self.top[j], rows)
+        ranked = rank_rows(candidates, scores[candidates, j], self.depth)
+        if threshold is not None:
+            last_score, last_row = threshold
+            ranked_scores = scores[ranked, j]
+            ranked = ranked[(ranked_scores > last_score) | ((ranked_scores == last_score) & (ranked <= last_row))]
+        return ranked
+
+    def remove(self, ids):
+        """
+        Drop profiles from every result (their rows are left unused)
+
+        Raises:
+            KeyError: some ids are not in the index (nothing is removed)
+        """
+
+        ids = list(dict.fromkeys(ids))
+        missing = [i for i in ids if i not in self.rows]
+        if missing:
+            raise KeyError(f"Ids not in the index: {missing[:5]}")
+
+        rows = np.array([self.rows.pop(i) for i in ids], dtype=np.int64)
+        self._reserve(self.size)
+        self.active[rows] = False
+        for j, top in enumerate(self.top):
+            self.top[j] = top[~np.isin(top, rows)]
+
+    def _filter_mask(self, rows, filters):
+        """Boolean mask of rows matching {categorical field: value or list of values}"""
+
+        mask = np.ones(len(rows), dtype=bool)
+        for field, wanted in (filters or {}).items():
+            j = self.schema.categorical_index.get(field)
+            if j is None:
+                raise ValueError(f"Cannot filter on {field!r}; filters: {self.schema.categorical_features}")
+            values = [wanted] if isinstance(wanted, str) else list(wanted)
+            codes = []
+            for value in values:
+                code = self.schema.code(j, value)
+                if code < 0 and value != 'Unknown':
+                    raise ValueError(f"Unknown {field} {value!r}; known: {self.schema.categories[j]}")
+                codes.append(code)
+            mask &= np.isin(self.codes[rows, j], codes)
+        return mask
+
+    def query(self, career, k=10, filters=None):
+        """
+        The k indexed profiles that fit a career best
+
+        Args:
+            career: a name from the model's career classes
+            k: number of profiles
+            filters: {categorical field: value or list of values},
+                     e.g. {'Age_Group': '25-30', 'Preferred_Work_Mode': ['Remote', 'Hybrid']}
+
+        Returns:
+            List of (id, success_percentage, match_score) tuples, best first
+        """
+
+        j = self.career_index.get(str(career))
+        if j is None:
+            raise KeyError(f"Unknown career {career!r}")
+
+        # Updates can shorten a list; refill it once it is half empty
+        top = self.top[j]
+        if len(top) < min(self.depth // 2, self.n_active):
+            top = self.top[j] = self._rebuild(j)
+
+        rows = top[self._filter_mask(top, filters)] if filters else top
+        if len(rows) < k and len(top) < self.n_active:
+            rows = np.flatnonzero(self.active[:self.size])
+            if filters:
+                rows = rows[self._filter_mask(rows, filters)]
+            rows = rank_rows(rows, self.scores[rows, j], k)
+
+        return [
+            (self.ids[row], round(float(self.success[row, j]), 1), float(self.probabilities[row, j]) * 100)
+            for row in rows[:k].tolist()
+        ]
+
+    def _rebuild(self, j):
+        """A career's ranked list from a scan of every active row"""
+
+        rows = np.flatnonzero(self.active[:self.size])
+        return rank_rows(rows, self.scores[rows, j], self.depth)
+
+    def save(self, path):
+        """Write the index as .npy arrays plus manifest.json (replaced atomically)"""
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+
+        top = np.full((len(self.careers), self.depth), -1, dtype=np.int64)
+        for j, rows in enumerate(self.top):
+            top[j, :len(rows)] = rows
+        arrays = {
+            'probabilities': self.probabilities[:self.size],
+            'success': self.success[:self.size],
+            'codes': self.codes[:self.size],
+            'active': self.active[:self.size],
+            'top': top,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(temp_path, f"{name}.npy"), array)
+
+        manifest = {
+            'careers': self.careers,
+            'numeric_features': self.schema.numeric_features,
+            'categorical_features': self.schema.categorical_features,
+            'categories': self.schema.categories,
+            'depth': self.depth,
+            'score': self.score,
+            'ids': self.ids,
+        }
+        with open(os.path.join(temp_path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, predictor=None, mmap=True):
+        """
+        Open a saved index; arrays are memory-mapped until the first insert or update
+
+        Args:
+            path: directory written by save()
+            predictor: needed only to insert or update profiles
+            mmap: memory-map the arrays instead of reading them
+        """
+
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        schema = ProfileSchema(manifest['numeric_features'], manifest['categorical_features'],
+                               manifest['categories'])
+        index = cls(manifest['careers'], schema, manifest['depth'], manifest['score'], predictor)
+
+        def array(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+
+        index.probabilities = array('probabilities')
+        index.success = array('success')
+        index.codes = array('codes')
+        index.active = array('active')
+        index.size = len(index.active)
+        index.ids = manifest['ids']
+        index.rows = {
+            profile_id: row for row, profile_id in enumerate(index.ids) if index.active[row]
+        }
+
+        top = np.load(os.path.join(path, 'top.npy'))
+        index.top = [rows[rows >= 0] for rows in top]
+        return index
+
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import pandas as pd
+
+    from career_predictor_ultra import UltraCareerPredictor
+
+    parser = argparse.ArgumentParser(description="Build a career → profiles index and query it")
+    parser.add_argument('--data', default='career_path_ultra_enhanced.csv')
+    parser.add_argument('--rows', type=int, default=100_000, help="profiles indexed (sampled from --data)")
+    parser.add_argument('--career', help="career to query (default: the first class)")
+    parser.add_argument('--filter', action='append', default=[], metavar='FIELD=VALUE',
+                        help="categorical filter, repeatable")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=1000)
+    parser.add_argument('--score', choices=SCORES, default='success')
+    parser.add_argument('--artifact', default='career_model_ultra.bin' if os.path.exists('career_model_ultra.bin') else None)
+    parser.add_argument('--save', help="directory to save the index to")
+    args = parser.parse_args()
+
+    print("="*80)
+    print("HERAPT CAREER INDEX")
+    print("="*80)
+
+    predictor = UltraCareerPredictor(artifact_path=args.artifact)
+    df = pd.read_csv(args.data)
+    profiles = df.sample(args.rows, replace=True, random_state=42).reset_index(drop=True)
+
+    index = CareerIndex.for_predictor(predictor, depth=args.depth, score=args.score)
+    start = time.perf_counter()
+    for offset in range(0, len(profiles), 10_000):
+        index.insert(profiles.iloc[offset:offset + 10_000])
+    elapsed = time.perf_counter() - start
+    print(f"\n Indexed {index.n_active:,} profiles in {elapsed:.1f}s ({index.n_active / elapsed:,.0f}/s)")
+    print(f" Score matrices: {(index.probabilities.nbytes + index.success.nbytes) / 1e6:.0f}MB")
+
+    career = args.career or index.careers[0]
+    filters = dict(f.split('=', 1) for f in args.filter)
+
+    start = time.perf_counter()
+    results = index.query(career, k=args.k, filters=filters)
+    print(f"\n Top {args.k} for {career!r} {filters or ''} in {(time.perf_counter() - start) * 1000:.2f}ms")
+    for profile_id, success, match in results:
+        print(f"   row {profile_id:>8}  success {success:5.1f}%  match {match:5.1f}%")
+
+    timings = []
+    for name in index.careers:
+        start = time.perf_counter()
+        index.query(name, k=args.k, filters=filters)
+        timings.append(time.perf_counter() - start)
+    print(f"\n Query latency over all {len(index.careers)} careers: "
+          f"p50 {np.percentile(timings, 50) * 1000:.2f}ms, max {max(timings) * 1000:.2f}ms")
+
+    if args.save:
+        index.save(args.save)
+        print(f" Saved to {args.save}/")
+
+    print("\n" + "="*80)
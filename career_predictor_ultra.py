@@ -2,56 +2,393 @@
 Ultra Career Predictor for HerApt
 48 features → Success Percentage (0-100%)
 Uses advanced ML with better accuracy
+joblib/sklearn/pandas load lazily; the artifact path needs only NumPy
 """
 
+import hashlib
+import itertools
+import operator
+import os
+import threading
+import zlib
 import numpy as np
-import pandas as pd
-import joblib
-from sklearn.preprocessing import StandardScaler, OneHotEncoder, LabelEncoder
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
+from feature_encoder_ultra import CompiledFeatureEncoder
+from forest_attribution_ultra import PathExplainer, input_groups, node_value_table
+from forest_engine_ultra import FlatForest
+from model_artifact_ultra import load_artifact
+from prediction_cache_ultra import PredictionCache
+from predictor_metrics_ultra import NULL_METRICS
+from profile_record_ultra import FORM_RANGES, ProfileBatch, ProfileRecord, ProfileSchema
 import warnings
 warnings.filterwarnings('ignore')
 
+
+JITTER_MODES = ('hash', 'random', None)
+
+# Training engines (train_model_ultra.ENGINES) FlatForest can represent
+FLAT_ENGINES = ('rf', 'et')
+
+# (field, comparison, threshold, list, message); rules fire in this order and
+# {value} in a message is replaced by the profile's value of the field
+ADVICE_RULES = (
+    ('Coding_Skills', '>=', 4, 'strengths', "Strong Coding Proficiency"),
+    ('Coding_Skills', '<=', 1, 'improvements', "Improve Coding Proficiency"),
+    ('Analytical_Skills', '>=', 4, 'strengths', "Strong Analytical Thinking"),
+    ('Analytical_Skills', '<=', 1, 'improvements', "Improve Analytical Thinking"),
+    ('Problem_Solving_Skills', '>=', 4, 'strengths', "Strong Problem Solving"),
+    ('Problem_Solving_Skills', '<=', 1, 'improvements', "Improve Problem Solving"),
+    ('Communication_Skills', '>=', 4, 'strengths', "Excellent Communication"),
+    ('Communication_Skills', '<=', 1, 'improvements', "Build Communication"),
+    ('Teamwork_Skills', '>=', 4, 'strengths', "Excellent Teamwork"),
+    ('Teamwork_Skills', '<=', 1, 'improvements', "Build Teamwork"),
+    ('Work_Experience_Years', '>=', 5, 'strengths', "Solid {value} years experience"),
+    ('Work_Experience_Years', '==', 0, 'improvements', "Gain practical work experience"),
+    ('Continuous_Learning', '>=', 4, 'strengths', "Strong commitment to learning"),
+)
+
+# Career name → rules used instead of ADVICE_RULES for that career
+CAREER_ADVICE_RULES = {}
+
+ADVICE_COMPARISONS = {
+    '>=': operator.ge, '>': operator.gt, '<=': operator.le,
+    '<': operator.lt, '==': operator.eq, '!=': operator.ne,
+}
+
+# what_if: one step per field (default 1), and form answers that are
+# circumstances or wishes rather than something to work on
+WHATIF_STEPS = {'GPA': 0.2}
+WHATIF_EXCLUDED = ('Career_Break_Months', 'Salary_Expectation_Lakh')
+
+
+def career_key(career):
+    """Stable 32-bit key for a career name (same in every process)"""
+    return zlib.crc32(str(career).encode('utf-8'))
+
+
+def hashed_jitter(profile_hashes, career_keys, amplitude=2.0):
+    """
+    Deterministic jitter in [-amplitude, amplitude) per (profile, career)
+    
+    Mixes a 64-bit profile hash with a career key through splitmix64, so the
+    same profile and career always get the same offset.
+    """
+    with np.errstate(over='ignore'):
+        z = np.asarray(profile_hashes, dtype=np.uint64)[..., None] ^ (
+            (np.asarray(career_keys, dtype=np.uint64) + np.uint64(1)) * np.uint64(0x9E3779B97F4A7C15)
+        )
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    uniform = (z >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+    return uniform * (2 * amplitude) - amplitude
+
+
+def advice_field_values(profiles, fields):
+    """
+    Values of the advice rule fields for every profile
+    
+    Returns:
+        (values, raw): float64 (n_profiles, n_fields) array with missing
+        fields as 0 (like profile.get(field, 0)), and raw(row, field) giving
+        the original value for message formatting
+    """
+    
+    if isinstance(profiles, dict):
+        profiles = [profiles]
+    
+    if hasattr(profiles, 'schema') and hasattr(profiles, 'numeric'):
+        rows = len(profiles)
+        values = np.zeros((rows, len(fields)))
+        for k, field in enumerate(fields):
+            i = profiles.schema.numeric_index.get(field)
+            if i is not None:
+                values[:, k] = profiles.numeric[:, i]
+        return values, lambda row, field: profiles[row].get(field, 0)
+    
+    if hasattr(profiles, 'columns'):
+        values = np.zeros((len(profiles), len(fields)))
+        for k, field in enumerate(fields):
+            if field in profiles.columns:
+                values[:, k] = profiles[field].to_numpy(dtype=np.float64, na_value=np.nan)
+        return values, lambda row, field: profiles[field].iloc[row] if field in profiles.columns else 0
+    
+    profiles = list(profiles)
+    values = np.array([[p.get(field, 0) for field in fields] for p in profiles], dtype=np.float64)
+    return values.reshape(len(profiles), len(fields)), lambda row, field: profiles[row].get(field, 0)
+
+
+def evaluate_advice_rules(values, fields, rules, raw, rows):
+    """(strengths, improvements) lists for each row in rows under one rule set"""
+    
+    column = {field: k for k, field in enumerate(fields)}
+    fired = np.column_stack([
+        ADVICE_COMPARISONS[comparison](values[rows, column[field]], threshold)
+        for field, comparison, threshold, _, _ in rules
+    ]) if rules else np.zeros((len(rows), 0), dtype=bool)
+    
+    
+    # Rows with the same pattern of fired rules share one (strengths, improvements) pair
+    templated = ['{value}' in message for *_, message in rules]
+    patterns = {}
+    advice = []
+    for position, key in enumerate(map(bytes, np.packbits(fired, axis=1))):
+        pair = patterns.get(key)
+        if pair is None:
+            fired_rules = np.flatnonzero(fired[position]).tolist()
+            if any(templated[k] for k in fired_rules):
+                pair = fired_rules
+            else:
+                pair = (
+                    tuple(rules[k][4] for k in fired_rules if rules[k][3] == 'strengths'),
+                    tuple(rules[k][4] for k in fired_rules if rules[k][3] != 'strengths'),
+                )
+            patterns[key] = pair
+        
+        if isinstance(pair, list):
+            lists = {'strengths': [], 'improvements': []}
+            for k in pair:
+                field, _, _, target, message = rules[k]
+                if templated[k]:
+                    message = message.format(value=raw(rows[position], field))
+                lists[target].append(message)
+            advice.append((lists['strengths'], lists['improvements']))
+        else:
+            advice.append(pair)
+    return advice
+
+
+def personalized_advice_batch(profiles, careers, rules=ADVICE_RULES, career_rules=None):
+    """
+    Vectorized get_personalized_advice for many profiles
+    
+    Every threshold rule is evaluated as a NumPy mask over the whole batch;
+    the advice lists are then assembled per row from those masks.
+    
+    Args:
+        profiles: list of profile dicts or ProfileRecords, a DataFrame or a ProfileBatch
+        careers: one entry per profile, a career name or a list of careers
+        rules: default rule table (see ADVICE_RULES)
+        career_rules: {career: rules} overrides (default: CAREER_ADVICE_RULES)
+        
+    Returns:
+        List (one entry per profile) of advice dicts, or lists of advice dicts
+        where that profile's careers entry was a list
+    """
+    
+    career_rules = CAREER_ADVICE_RULES if career_rules is None else career_rules
+    careers = list(careers)
+    
+    
+    # Rows of each career with its own rules; every other pair uses the default table
+    override_rows = {}
+    if career_rules:
+        for row, entry in enumerate(careers):
+            for career in ([entry] if isinstance(entry, str) else entry):
+                if career in career_rules:
+                    override_rows.setdefault(career, set()).add(row)
+    
+    fields = list(dict.fromkeys(
+        [rule[0] for rule in rules]
+        + [rule[0] for career in override_rows for rule in career_rules[career]]
+    ))
+    values, raw = advice_field_values(profiles, fields)
+    if len(values) != len(careers):
+        raise ValueError(f"{len(values)} profiles but {len(careers)} careers entries")
+    
+    default_advice = evaluate_advice_rules(values, fields, rules, raw, np.arange(len(values)))
+    override_advice = {}
+    for career, rows in override_rows.items():
+        rows = sorted(rows)
+        override_advice[career] = dict(zip(rows, evaluate_advice_rules(values, fields, career_rules[career], raw, rows)))
+    
+    
+    def advice(row, career):
+        if override_advice and career in override_advice:
+            strengths, improvements = override_advice[career][row]
+        else:
+            strengths, improvements = default_advice[row]
+        return {'career': career, 'strengths': list(strengths), 'improvements': list(improvements)}
+    
+    return [
+        advice(row, entry) if isinstance(entry, str) else [advice(row, career) for career in entry]
+        for row, entry in enumerate(careers)
+    ]
+
+
+def whatif_perturbations(numeric_features, base, fields, deltas=(1,), max_changes=2):
+    """
+    Every change of up to max_changes distinct fields that stays inside FORM_RANGES
+    
+    Args:
+        numeric_features: field order of base
+        base: (n_numeric,) numeric values of the profile
+        fields: fields that may change
+        deltas: multiples of each field's WHATIF_STEPS step to try
+        max_changes: fields changed together
+        
+    Returns:
+        (numeric, changes): (n, n_numeric) perturbed copies of base, and per
+        row a tuple of (field index, new value); single-field changes first
+    """
+    
+    singles = []
+    for field in fields:
+        j = numeric_features.index(field)
+        low, high = FORM_RANGES[field]
+        for delta in deltas:
+            value = round(float(base[j]) + delta * WHATIF_STEPS.get(field, 1), 6)
+            if low <= value <= high and value != base[j]:
+                singles.append((j, value))
+    
+    changes = [
+        combo
+        for size in range(1, max_changes + 1)
+        for combo in itertools.combinations(singles, size)
+        if len({j for j, _ in combo}) == size
+    ]
+    numeric = np.tile(np.asarray(base, dtype=np.float64), (len(changes), 1))
+    for row, combo in enumerate(changes):
+        for j, value in combo:
+            numeric[row, j] = value
+    return numeric, changes
+
+
 class UltraCareerPredictor:
     """Advanced career prediction with success percentages"""
     
-    def __init__(self):
-        """Initialize predictor"""
+    def __init__(self, engine='sklearn', artifact_path=None, jitter='hash',
+                 cache_size=0, cache_ttl=None, metrics=None, model_dir=None):
+        """
+        Initialize predictor
+        
+        Args:
+            engine: 'sklearn' to score with the saved sklearn model,
+                    'flat' to use the array-backed FlatForest engine
+                    (forest models only; others fall back to 'sklearn')
+            artifact_path: memory-map a model artifact (career_model_ultra.bin)
+                    instead of loading the joblib pickles; implies engine='flat'
+            jitter: ±2% success-percentage noise; 'hash' derives it from the
+                    canonical profile and career (repeatable), 'random' draws
+                    it from np.random, None turns it off
+            cache_size: keep up to this many predictions in an LRU cache (0 = off)
+            cache_ttl: seconds a cached prediction stays valid (None = forever)
+            metrics: PredictorMetrics recording stage latencies, batch sizes,
+                    default-filled fields and errors (None = off, no overhead)
+            model_dir: directory holding the joblib pickles (default: the
+                    working directory), e.g. a published models/v0003
+        
+        Raises:
+            FileNotFoundError: the model files are missing
+        """
+        if engine not in ('sklearn', 'flat'):
+            raise ValueError(f"Unknown engine: {engine!r}")
+        if jitter not in JITTER_MODES:
+            raise ValueError(f"Unknown jitter mode: {jitter!r}")
+        if cache_size and jitter == 'random':
+            raise ValueError("Caching needs deterministic scores; use jitter='hash' or None")
+        
+        self.jitter = jitter
+        self.cache = PredictionCache(cache_size, cache_ttl) if cache_size else None
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.engine = 'flat' if artifact_path is not None else engine
+        self.artifact_path = artifact_path
+        self.model_dir = model_dir
+        self.model_version = None
         self.model = None
         self.preprocessor = None
         self.label_encoder = None
         self.feature_config = None
         self.numeric_features = None
         self.categorical_features = None
+        self.encoder = None
+        self.forest = None
+        self.career_classes = None
+        self.career_keys = None
+        self.schema = None
+        self.neighbour_index = None
+        self.flattened_model = None
+        self.node_values = None
+        self.explainer = None
+        self.explainer_lock = threading.Lock()
         
         
         self.load_or_create_model()
+        self.model_version = self.feature_config.get('model_version')
+        self.career_keys = np.array([career_key(c) for c in self.career_classes], dtype=np.uint64)
+        self.schema = ProfileSchema.from_predictor(self)
     
     def load_or_create_model(self):
         """Try to load model, create if doesn't exist"""
+        if self.artifact_path is not None:
+            self.load_model_artifact(self.artifact_path)
+            return
+        
+        import joblib
+        
+        def path(name):
+            return os.path.join(self.model_dir, name) if self.model_dir else name
+        
         try:
-            self.model = joblib.load('career_rf_model_ultra.pkl')
-            self.preprocessor = joblib.load('career_preprocessor_ultra.pkl')
-            self.label_encoder = joblib.load('career_label_encoder_ultra.pkl')
-            self.feature_config = joblib.load('feature_config_ultra.pkl')
+            self.model = joblib.load(path('career_rf_model_ultra.pkl'))
+            self.preprocessor = joblib.load(path('career_preprocessor_ultra.pkl'))
+            self.label_encoder = joblib.load(path('career_label_encoder_ultra.pkl'))
+            self.feature_config = joblib.load(path('feature_config_ultra.pkl'))
             print(" Loaded existing ultra model")
         except FileNotFoundError:
             print("  Model not found. Run train_model_ultra.py first.")
             print("   Command: python train_model_ultra.py")
-            exit(1)
+            raise
+        
+        
+        self.numeric_features = self.feature_config['numeric_features']
+        self.categorical_features = self.feature_config['categorical_features']
+        self.career_classes = self.label_encoder.classes_
         
         
+        try:
+            self.encoder = CompiledFeatureEncoder.from_preprocessor(self.preprocessor)
+        except ValueError as e:
+            print(f"  Compiled encoder unavailable ({e}), using preprocessor.transform")
+            self.encoder = None
+        
+        
+        # The flat engine only understands forests of plain decision trees
+        model_engine = self.feature_config.get('engine', 'rf')
+        if self.engine == 'flat' and model_engine not in FLAT_ENGINES:
+            print(f"  {model_engine!r} model has no flat form, scoring with sklearn")
+            self.engine = 'sklearn'
+        
+        if self.engine == 'flat':
+            self.forest = FlatForest.from_sklearn(self.model)
+    
+    def load_model_artifact(self, path):
+        """Memory-map a single-file model artifact written by train_model_ultra.py"""
+        try:
+            artifact = load_artifact(path)
+            print(f" Loaded model artifact {path}")
+        except FileNotFoundError:
+            print(f"  Model artifact {path} not found. Run train_model_ultra.py first.")
+            print("   Command: python train_model_ultra.py")
+            raise
+        
+        self.forest = artifact.forest
+        self.node_values = artifact.node_values
+        self.encoder = artifact.encoder
+        self.career_classes = artifact.classes
+        self.feature_config = artifact.feature_config
         self.numeric_features = self.feature_config['numeric_features']
         self.categorical_features = self.feature_config['categorical_features']
     
     def validate_input(self, user_profile):
         """Validate user input"""
+        if isinstance(user_profile, ProfileRecord):
+            return user_profile
+        
         required_fields = self.numeric_features + self.categorical_features
         missing = [f for f in required_fields if f not in user_profile]
         
         if missing:
+            self.metrics.record_missing({field: 1 for field in missing})
             print(f"  Missing fields: {missing}")
             print("   Using default values for missing fields")
             for field in missing:
@@ -74,40 +411,527 @@ class UltraCareerPredictor:
             List of (career, success_percentage, match_score) tuples
         """
         
-        user_profile = self.validate_input(user_profile)
+        with self.metrics.stage('validate_input'):
+            user_profile = self.validate_input(user_profile)
         
         
         try:
-            features_num = [user_profile.get(f, 0) for f in self.numeric_features]
-            features_cat = [user_profile.get(f, 'Unknown') for f in self.categorical_features]
-            
-            
-            feature_names = self.numeric_features + self.categorical_features
-            df_input = pd.DataFrame([features_num + features_cat], columns=feature_names)
-            
-            
-            X_processed = self.preprocessor.transform(df_input)
+            return self.predict_batch([user_profile], top_n=top_n)[0]
             
+        except Exception as e:
+            self.metrics.count('failed_predictions')
+            print(f" Error in prediction: {e}")
+            return []
+    
+    def predict_batch(self, profiles, top_n=5):
+        """
+        Predict top N careers for many profiles in one pass
+        
+        Runs a single preprocessor transform and a single predict_proba
+        over the whole batch, so results match calling predict per row.
+        
+        Args:
+            profiles: list of profile dicts or ProfileRecords, a DataFrame
+                    or a ProfileBatch
+            top_n: number of recommendations per profile
             
-            probabilities = self.model.predict_proba(X_processed)[0]
+        Returns:
+            List (one entry per profile) of
+            (career, success_percentage, match_score) tuple lists
+        """
+        
+        metrics = self.metrics
+        with metrics.stage('predict_batch'):
+            return self._predict_batch(profiles, top_n, metrics)
+    
+    def _predict_batch(self, profiles, top_n, metrics):
+        """predict_batch body, timed as a whole by the 'predict_batch' stage"""
+        if metrics.enabled and not isinstance(profiles, (ProfileBatch, ProfileRecord)):
+            if not isinstance(profiles, dict) and not hasattr(profiles, 'columns'):
+                profiles = list(profiles)
+            metrics.record_missing(self.count_missing_fields(profiles))
+        
+        with metrics.stage('profile_columns'):
+            numeric_values, categorical, df_input = self.profile_columns(profiles)
+        n_profiles = len(numeric_values)
+        metrics.observe_batch(n_profiles)
+        if n_profiles == 0:
+            return []
+        
+        
+        digests = None
+        if self.cache is not None or self.jitter == 'hash':
+            with metrics.stage('digest'):
+                digests = self.profile_digests(numeric_values, categorical)
+        
+        results = [None] * n_profiles
+        if self.cache is not None:
+            with metrics.stage('cache_lookup'):
+                for row, digest in enumerate(digests):
+                    cached = self.cache.get((digest, top_n))
+                    if cached is not None:
+                        results[row] = list(cached)
+        
+        pending = [row for row, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        if len(pending) < n_profiles:
+            numeric_values = numeric_values[pending]
+            categorical = categorical[pending]
+            if df_input is not None:
+                df_input = df_input.iloc[pending]
+            if digests is not None:
+                digests = [digests[row] for row in pending]
+        
+        
+        with metrics.stage('transform'):
+            X_processed = self.encode(numeric_values, categorical, df_input)
+        
+        estimator = self.forest if self.forest is not None else self.model
+        with metrics.stage('predict_proba'):
+            probabilities = estimator.predict_proba(X_processed)
+        
+        
+        with metrics.stage('top_n'):
+            top_indices = self.select_top_n(probabilities, top_n)
+            top_probs = np.take_along_axis(probabilities, top_indices, axis=1)
+            top_careers = self.career_classes[top_indices]
+        
+        
+        with metrics.stage('success_percentage'):
+            if self.jitter == 'hash':
+                jitter = hashed_jitter(self.digest_hashes(digests), self.career_keys[top_indices])
+            elif self.jitter == 'random':
+                jitter = np.random.uniform(-2, 2, size=top_probs.shape)
+            else:
+                jitter = None
             
+            success = self.calculate_success_percentages(numeric_values, top_probs, jitter)
+            match_scores = top_probs * 100
+        
+        
+        with metrics.stage('format_results'):
+            for i, row in enumerate(pending):
+                result = [
+                    (career, round(pct, 1), match)
+                    for career, pct, match in zip(top_careers[i], success[i], match_scores[i])
+                ]
+                results[row] = result
+                if self.cache is not None:
+                    self.cache.put((digests[i], top_n), tuple(result))
+        
+        return results
+    
+    def encode(self, numeric_values, categorical, df_input):
+        """Model input matrix from profile_columns output"""
+        if df_input is None:
+            return self.encoder.encode_columns(numeric_values, categorical)
+        return self.preprocessor.transform(df_input)
+    
+    def score_matrix(self, profiles):
+        """
+        Probability and success percentage of every career for every profile
+        
+        Returns:
+            (probabilities, success): (n_profiles, n_careers) arrays in
+            career_classes order; success is unrounded and carries the same
+            jitter predict_batch applies
+        """
+        
+        numeric_values, categorical, df_input = self.profile_columns(profiles)
+        if len(numeric_values) == 0:
+            empty = np.zeros((0, len(self.career_classes)))
+            return empty, empty
+        
+        estimator = self.forest if self.forest is not None else self.model
+        probabilities = estimator.predict_proba(self.encode(numeric_values, categorical, df_input))
+        
+        if self.jitter == 'hash':
+            digests = self.profile_digests(numeric_values, categorical)
+            jitter = hashed_jitter(self.digest_hashes(digests), self.career_keys)
+        elif self.jitter == 'random':
+            jitter = np.random.uniform(-2, 2, size=probabilities.shape)
+        else:
+            jitter = None
+        
+        return probabilities, self.calculate_success_percentages(numeric_values, probabilities, jitter)
+    
+    def similar_profiles(self, profiles, k=5, exact=False, n_probe=None):
+        """
+        Training profiles closest to each profile ("people like you")
+        
+        Loads the index train_model_ultra.py writes to similar_profiles_ultra/
+        on first use, and refuses one encoded by a different preprocessor
+        (e.g. after a hot swap or rollback to another model version).
+        
+        Args:
+            profiles: a profile dict, a list of dicts or ProfileRecords, a DataFrame or a ProfileBatch
+            k: neighbours per profile
+            exact: KD-tree search instead of the approximate IVF lists
+            n_probe: IVF lists scanned per query (default: the smallest reaching
+                90% recall at build time; see neighbour_index.recall_curve)
             
-            top_indices = np.argsort(probabilities)[-top_n:][::-1]
-            top_careers = self.label_encoder.inverse_transform(top_indices)
-            top_probs = probabilities[top_indices]
+        Returns:
+            List (one per profile) of dicts with the training CSV 'row',
+            'career', 'success_percentage' and 'distance', nearest first
+        """
+        
+        if self.neighbour_index is None:
+            from similar_profiles_ultra import DEFAULT_PATH, SimilarProfileIndex, encoding_key
+            try:
+                index = SimilarProfileIndex.load(DEFAULT_PATH)
+            except FileNotFoundError:
+                raise FileNotFoundError(f"{DEFAULT_PATH}/ not found. Run train_model_ultra.py first.")
+            if index.metadata.get('encoding_key') != encoding_key(self.encoder, self.preprocessor):
+                raise ValueError(
+                    f"{DEFAULT_PATH}/ was built for a different preprocessor than model version "
+                    f"{self.model_version}. Rerun train_model_ultra.py to rebuild it."
+                )
+            self.neighbour_index = index
+        
+        if isinstance(profiles, dict):
+            profiles = [profiles]
+        X = self.encode(*self.profile_columns(profiles))
+        return self.neighbour_index.neighbours(X, k=k, exact=exact, n_probe=n_probe)
+    
+    def what_if(self, user_profile, careers=None, max_changes=2, deltas=(1,), fields=None, top_k=5):
+        """
+        Answer changes that raise each career's success percentage the most
+        
+        Every change of up to max_changes answers, inside the ranges
+        CareerAssessmentForm accepts, is scored in one batch. On forest
+        models only the trees whose decision path a change flips are walked
+        again, from the flipped split down.
+        
+        Args:
+            user_profile: profile dict or ProfileRecord
+            careers: target careers (default: the profile's top 5)
+            max_changes: answers changed together (1 = single answers only)
+            deltas: steps to try per answer, e.g. (1, 2) or (-1, 1);
+                    a step is 1 point (0.2 for GPA)
+            fields: answers allowed to change (default: every numeric form
+                    answer except WHATIF_EXCLUDED)
+            top_k: changes returned per career
             
+        Returns:
+            {career: {'success_percentage', 'rank', 'changes'}} where changes
+            lists up to top_k dicts, biggest gain first, with 'changes'
+            ({field: (old, new)}), 'success_percentage', 'gain' (points),
+            'match_score' and 'rank' (1 = top recommendation). Scores leave
+            out the ±2% jitter so gains reflect only the changed answers.
+        """
+        
+        numeric_values, categorical, df_input = self.profile_columns([user_profile])
+        if fields is None:
+            fields = [f for f in FORM_RANGES if f in self.numeric_features and f not in WHATIF_EXCLUDED]
+        perturbed, changes = whatif_perturbations(self.numeric_features, numeric_values[0], fields,
+                                                  deltas, max_changes)
+        numeric_values = np.vstack([numeric_values, perturbed])
+        categorical = np.repeat(categorical, len(numeric_values), axis=0)
+        if df_input is not None:
+            df_input = df_input.iloc[np.zeros(len(numeric_values), dtype=int)].reset_index(drop=True)
+            df_input[self.numeric_features] = numeric_values
+        X_processed = self.encode(numeric_values, categorical, df_input)
+        
+        forest = self.flat_forest()
+        if forest is not None:
+            leaves = np.vstack([forest.apply(X_processed[:1]),
+                                forest.apply_perturbed(X_processed[0], X_processed[1:])])
+            probabilities = forest.proba_from_leaves(leaves)
+        else:
+            probabilities = self.model.predict_proba(X_processed)
+        success = self.calculate_success_percentages(numeric_values, probabilities, None)
+        
+        
+        if careers is None:
+            careers = self.career_classes[self.select_top_n(probabilities[:1], 5)[0]]
+        columns = {career: c for c, career in enumerate(self.career_classes)}
+        unknown = [career for career in careers if career not in columns]
+        if unknown:
+            raise ValueError(f"Unknown careers: {unknown}")
+        
+        results = {}
+        for career in careers:
+            c = columns[career]
+            ranks = (probabilities > probabilities[:, c:c + 1]).sum(axis=1) + 1
+            gains = success[1:, c] - success[0, c]
+            best = np.argsort(-gains, kind='stable')[:top_k]
+            results[career] = {
+                'success_percentage': round(float(success[0, c]), 1),
+                'rank': int(ranks[0]),
+                'changes': [
+                    {
+                        'changes': {
+                            self.numeric_features[j]: (self.schema.numeric_value(j, numeric_values[0, j]),
+                                                       self.schema.numeric_value(j, value))
+                            for j, value in changes[row]
+                        },
+                        'success_percentage': round(float(success[row + 1, c]), 1),
+                        'gain': round(float(gains[row]), 1),
+                        'match_score': float(probabilities[row + 1, c] * 100),
+                        'rank': int(ranks[row + 1]),
+                    }
+                    for row in best if gains[row] > 0
+                ],
+            }
+        return results
+    
+    def flat_forest(self):
+        """The model as a FlatForest (flattened on first use with engine='sklearn'), None for non-forest models"""
+        if self.forest is not None:
+            return self.forest
+        if self.flattened_model is None and self.feature_config.get('engine', 'rf') in FLAT_ENGINES:
+            self.flattened_model = FlatForest.from_sklearn(self.model)
+        return self.flattened_model
+    
+    def build_explainer(self):
+        """PathExplainer over the forest, building its node values when the model has none"""
+        forest = self.flat_forest()
+        if forest is None:
+            raise ValueError(f"{self.feature_config.get('engine')!r} models have no tree paths to explain")
+        if self.node_values is None:
+            if self.model is None:
+                raise ValueError("This artifact has no node values (compressed artifacts from before "
+                                 "they were exported); re-export it with train_model_ultra.py")
+            self.node_values = node_value_table(self.model, forest)
+        if self.encoder is not None:
+            categories = self.encoder.categories
+        else:
+            categories = self.preprocessor.named_transformers_['cat'].categories_
+        group, names = input_groups(self.numeric_features, self.categorical_features, categories)
+        return PathExplainer(forest, *self.node_values, group, names)
+    
+    def explain(self, profiles, top_n=3, careers=None):
+        """
+        Why each profile got its top careers: per-feature path contributions
+        
+        Saabas attributions: every split on a profile's path through a tree
+        moves the career probability, and the move is credited to the input
+        feature the split tests (one-hot columns count towards their original
+        categorical field). Node distributions are computed once per model.
+        
+        Args:
+            profiles: a profile dict, a list of dicts or ProfileRecords, a DataFrame or a ProfileBatch
+            top_n: explain each profile's top N careers
+            careers: explain these careers instead, for every profile
             
-            results = []
-            for career, prob in zip(top_careers, top_probs):
-                success_pct = self.calculate_success_percentage(user_profile, career, prob)
-                match_score = prob * 100
-                results.append((career, success_pct, match_score))
+        Returns:
+            List (one per profile) of dicts per career with 'career',
+            'match_score', 'base_score' (the forest's prior for the career,
+            the same for every profile) and
+            'contributions' ({feature: percentage points}, largest effect
+            first); base_score + sum of contributions == match_score
+        """
+        
+        with self.explainer_lock:
+            if self.explainer is None:
+                self.explainer = self.build_explainer()
+        
+        if isinstance(profiles, dict):
+            profiles = [profiles]
+        numeric_values, categorical, df_input = self.profile_columns(profiles)
+        X_processed = self.encode(numeric_values, categorical, df_input)
+        if careers is None:
+            targets = self.select_top_n(self.explainer.forest.predict_proba(X_processed), top_n)
+        else:
+            columns = {career: c for c, career in enumerate(self.career_classes)}
+            unknown = [career for career in careers if career not in columns]
+            if unknown:
+                raise ValueError(f"Unknown careers: {unknown}")
+            targets = np.tile([columns[career] for career in careers], (len(X_processed), 1))
+        
+        bias, contributions = self.explainer.contributions(X_processed, targets)
+        names = self.explainer.names
+        
+        results = []
+        for row in range(len(targets)):
+            explanations = []
+            for k, c in enumerate(targets[row]):
+                values = contributions[row, k] * 100
+                order = np.argsort(-np.abs(values), kind='stable')
+                explanations.append({
+                    'career': self.career_classes[c],
+                    'match_score': float(bias[row, k] + contributions[row, k].sum()) * 100,
+                    'base_score': float(bias[row, k]) * 100,
+                    'contributions': {names[j]: float(values[j]) for j in order},
+                })
+            results.append(explanations)
+        return results
+    
+    def count_missing_fields(self, profiles):
+        """{field: profiles missing it} for fields that will be filled with defaults"""
+        
+        fields = self.numeric_features + self.categorical_features
+        if isinstance(profiles, dict):
+            profiles = [profiles]
+        if hasattr(profiles, 'columns'):
+            return {
+                f: int(profiles[f].isna().sum()) if f in profiles.columns else len(profiles)
+                for f in fields
+            }
+        
+        missing = dict.fromkeys(fields, 0)
+        for profile in profiles:
+            for field in fields:
+                if profile.get(field) is None:
+                    missing[field] += 1
+        return missing
+    
+    def profile_columns(self, profiles):
+        """
+        Raw model inputs for a batch of profiles
+        
+        Returns:
+            (numeric_values, categorical, df_input): float64 numeric values in
+            numeric_features order; category codes (compiled encoder) or
+            category strings (preprocessor fallback); and the filled feature
+            frame when the fallback is in use, else None
+        """
+        
+        if isinstance(profiles, ProfileRecord):
+            profiles = ProfileBatch(profiles.schema, profiles.numeric[None], profiles.codes[None])
+        elif isinstance(profiles, list) and profiles and isinstance(profiles[0], ProfileRecord):
+            profiles = ProfileBatch.from_records(profiles[0].schema, profiles)
+        
+        if isinstance(profiles, ProfileBatch):
+            if self.encoder is not None and profiles.schema.same_layout(self.encoder):
+                return profiles.numeric.astype(np.float64), profiles.codes.astype(np.intp), None
+            profiles = profiles.to_frame()
+        
+        if self.encoder is not None:
+            numeric_values, codes = self.encoder.columns(profiles)
+            return numeric_values, codes, None
+        
+        df_input = self.build_feature_frame(profiles)
+        numeric_values = df_input[self.numeric_features].to_numpy(dtype=np.float64)
+        categorical = df_input[self.categorical_features].astype(str).to_numpy()
+        return numeric_values, categorical, df_input
+    
+    @staticmethod
+    def profile_digests(numeric_values, categorical):
+        """
+        Canonical digest per profile
+        
+        Built from the values the model actually sees (defaults filled,
+        numbers as float64), so 4 and 4.0 or a missing field and its default
+        give the same digest.
+        """
+        
+        numeric_values = np.ascontiguousarray(numeric_values, dtype=np.float64)
+        if categorical.dtype == object or categorical.dtype.kind == 'U':
+            categorical_bytes = ['\x1f'.join(row).encode('utf-8') for row in categorical.tolist()]
+        else:
+            categorical = np.ascontiguousarray(categorical, dtype=np.int64)
+            categorical_bytes = [row.tobytes() for row in categorical]
+        
+        return [
+            hashlib.blake2b(numeric.tobytes() + cats, digest_size=16).digest()
+            for numeric, cats in zip(numeric_values, categorical_bytes)
+        ]
+    
+    @staticmethod
+    def digest_hashes(digests):
+        """First 64 bits of each profile digest as a uint64 array"""
+        return np.frombuffer(b''.join(d[:8] for d in digests), dtype='<u8')
+    
+    def build_feature_frame(self, profiles):
+        """Build the model input frame, filling missing fields with defaults"""
+        import pandas as pd
+        
+        feature_names = self.numeric_features + self.categorical_features
+        if isinstance(profiles, pd.DataFrame):
+            df_input = profiles.reindex(columns=feature_names)
+        else:
+            df_input = pd.DataFrame.from_records(list(profiles), columns=feature_names)
+        
+        
+        defaults = {f: 0 for f in self.numeric_features}
+        defaults.update({f: 'Unknown' for f in self.categorical_features})
+        return df_input.fillna(defaults)
+    
+    @staticmethod
+    def select_top_n(probabilities, top_n):
+        """
+        Indices of the top N classes per row, highest probability first
+        
+        Ties go to the higher class index, the order of
+        np.argsort(p, kind='stable')[-top_n:][::-1] that predict used per row.
+        """
+        
+        n_classes = probabilities.shape[1]
+        top_n = max(1, min(top_n, n_classes))
+        
+        # Work on reversed columns, so ties resolve to the lowest position
+        flipped = probabilities[:, ::-1]
+        if top_n < n_classes:
+            candidates = np.argpartition(-flipped, top_n - 1, axis=1)[:, :top_n]
+            candidate_probs = np.take_along_axis(flipped, candidates, axis=1)
             
-            return results
+            # The partition picks arbitrarily among values tied at the cut
+            cut = candidate_probs.min(axis=1, keepdims=True)
+            tied = (flipped == cut).sum(axis=1) > (candidate_probs == cut).sum(axis=1)
+            if tied.any():
+                candidates[tied] = np.argsort(-flipped[tied], axis=1, kind='stable')[:, :top_n]
+        else:
+            candidates = np.tile(np.arange(n_classes), (len(probabilities), 1))
+        
+        candidate_probs = np.take_along_axis(flipped, candidates, axis=1)
+        order = np.lexsort((candidates, -candidate_probs), axis=1)
+        return n_classes - 1 - np.take_along_axis(candidates, order, axis=1)
+    
+    def calculate_success_percentages(self, numeric_values, base_probs, jitter=None):
+        """
+        Vectorized calculate_success_percentage
+        
+        Args:
+            numeric_values: (n_profiles, n_numeric) raw values in numeric_features order
+            base_probs: (n_profiles, n_careers) model probabilities
+            jitter: optional (n_profiles, n_careers) offsets added before clipping
             
-        except Exception as e:
-            print(f" Error in prediction: {e}")
-            return []
+        Returns:
+            (n_profiles, n_careers) unrounded success percentages in [10, 100];
+            terms are summed in the same order as the per-career formula
+        """
+        
+        def column(name):
+            return numeric_values[:, self.numeric_features.index(name)][:, None]
+        
+        
+        base_score = base_probs * 100 * 0.40
+        
+        
+        skills = (
+            column('Coding_Skills')
+            + column('Analytical_Skills')
+            + column('Problem_Solving_Skills')
+            + column('Communication_Skills')
+            + column('Teamwork_Skills')
+        )
+        skill_score = (skills / (5 * 4)) * 100 * 0.25
+        
+        
+        exp_score = np.minimum(column('Work_Experience_Years') / 10 * 100, 100) * 0.15
+        
+        
+        clarity = column('Career_Goal_Clarity')
+        clarity_score = (clarity / 5) * 100 * 0.10
+        
+        
+        pref_scores = (
+            column('Work_Life_Balance_Priority') / 5
+            + column('Continuous_Learning') / 5
+            + clarity / 5
+        )
+        pref_score = (pref_scores / 3) * 100 * 0.10
+        
+        
+        total = base_score + skill_score + exp_score + clarity_score + pref_score
+        
+        
+        final = total + jitter if jitter is not None else total
+        
+        
+        return np.maximum(np.minimum(final, 100), 10)
     
     def calculate_success_percentage(self, user_profile, career, base_prob):
         """
@@ -162,11 +986,23 @@ class UltraCareerPredictor:
         total = base_score + skill_score + exp_score + clarity_score + pref_score
         
         
-        final = total + np.random.uniform(-2, 2)
+        final = total + self.success_jitter(user_profile, career)
         
         
         return round(max(min(final, 100), 10), 1)
     
+    def success_jitter(self, user_profile, career):
+        """The ±2% offset predict would apply for this profile and career"""
+        
+        if self.jitter == 'random':
+            return np.random.uniform(-2, 2)
+        if self.jitter is None:
+            return 0.0
+        
+        numeric_values, categorical, _ = self.profile_columns([user_profile])
+        digests = self.profile_digests(numeric_values, categorical)
+        return float(hashed_jitter(self.digest_hashes(digests), [career_key(career)])[0, 0])
+    
     def predict_with_success_rate(self, user_profile):
         """Alias for predict method"""
         return self.predict(user_profile, top_n=5)
@@ -178,47 +1014,93 @@ class UltraCareerPredictor:
         improvements = []
         
         
-        tech_skills = {
-            'Coding_Skills': (user_profile.get('Coding_Skills', 0), 'Coding Proficiency'),
-            'Analytical_Skills': (user_profile.get('Analytical_Skills', 0), 'Analytical Thinking'),
-            'Problem_Solving_Skills': (user_profile.get('Problem_Solving_Skills', 0), 'Problem Solving'),
-        }
-        
-        for skill_key, (score, skill_name) in tech_skills.items():
-            if score >= 4:
-                strengths.append(f"Strong {skill_name}")
-            elif score <= 1:
-                improvements.append(f"Improve {skill_name}")
-        
-        
-        soft_skills = {
-            'Communication_Skills': (user_profile.get('Communication_Skills', 0), 'Communication'),
-            'Teamwork_Skills': (user_profile.get('Teamwork_Skills', 0), 'Teamwork'),
-        }
-        
-        for skill_key, (score, skill_name) in soft_skills.items():
-            if score >= 4:
-                strengths.append(f"Excellent {skill_name}")
-            elif score <= 1:
-                improvements.append(f"Build {skill_name}")
-        
-        
-        exp_years = user_profile.get('Work_Experience_Years', 0)
-        if exp_years >= 5:
-            strengths.append(f"Solid {exp_years} years experience")
-        elif exp_years == 0:
-            improvements.append("Gain practical work experience")
-        
-        
-        learning = user_profile.get('Continuous_Learning', 0)
-        if learning >= 4:
-            strengths.append("Strong commitment to learning")
+        for field, comparison, threshold, target, message in CAREER_ADVICE_RULES.get(career, ADVICE_RULES):
+            value = user_profile.get(field, 0)
+            if ADVICE_COMPARISONS[comparison](value, threshold):
+                message = message.format(value=value) if '{value}' in message else message
+                (strengths if target == 'strengths' else improvements).append(message)
         
         return {
             'career': career,
             'strengths': strengths,
             'improvements': improvements,
         }
+    
+    def get_personalized_advice_batch(self, profiles, careers):
+        """
+        get_personalized_advice for many profiles at once (same output, row for row)
+        
+        Args:
+            profiles: list of profile dicts or ProfileRecords, a DataFrame or a ProfileBatch
+            careers: one entry per profile, a career name or a list of careers
+                    (e.g. the careers predict_batch recommended for it)
+        """
+        return personalized_advice_batch(profiles, careers)
+
+
+
+SAMPLE_PROFILE = {
+    
+    'Age_Group': '25-30',
+    'Academic_Stream': 'Science',
+    'Education_Level': 'Masters',
+    'GPA': 3.7,
+    
+    
+    'Work_Experience_Years': 5,
+    'Internships': 2,
+    'Projects': 5,
+    'Industry_Certifications': 2,
+    'Extracurricular_Activities': 3,
+    
+    
+    'Career_Break': 0,
+    'Career_Break_Months': 0,
+    
+    
+    'Coding_Skills': 4,
+    'Analytical_Skills': 4,
+    'Problem_Solving_Skills': 4,
+    'Data_Driven_Thinking': 4,
+    'Domain_Expertise_Depth': 3,
+    
+    
+    'Communication_Skills': 3,
+    'Teamwork_Skills': 3,
+    'Presentation_Skills': 3,
+    'Networking_Skills': 2,
+    'Public_Speaking_Confidence': 3,
+    'Conflict_Resolution_Skills': 3,
+    
+    
+    'Leadership_Readiness': 3,
+    'Risk_Tolerance': 4,
+    'Adaptability_Score': 4,
+    'Stress_Management_Skills': 3,
+    'Continuous_Learning': 5,
+    'Innovation_Interest': 4,
+    'Customer_Focus': 3,
+    'Mentoring_Experience': 2,
+    
+    
+    'Preferred_Work_Mode': 'Hybrid',
+    'Location_Preference': 'Tier1_City',
+    'Work_Life_Balance_Priority': 4,
+    'Industry_Preference': 'Tech',
+    'Prefer_Corporate': 1,
+    'Entrepreneurship_Interest': 3,
+    'Salary_Expectation_Lakh': 25,
+    
+    
+    'Career_Goal_Clarity': 4,
+    'Certifications_Interest': 3,
+    'English_Proficiency': 4,
+    'Family_Support_Score': 4,
+    'Willing_To_Relocate': 1,
+    'Research_Experience': 1,
+    'Leadership_Positions': 1,
+    'Field_Specific_Courses': 5,
+}
 
 
 
@@ -230,68 +1112,7 @@ if __name__ == "__main__":
     predictor = UltraCareerPredictor()
     
     
-    profile = {
-        
-        'Age_Group': '25-30',
-        'Academic_Stream': 'Science',
-        'Education_Level': 'Masters',
-        'GPA': 3.7,
-        
-        
-        'Work_Experience_Years': 5,
-        'Internships': 2,
-        'Projects': 5,
-        'Industry_Certifications': 2,
-        'Extracurricular_Activities': 3,
-        
-        
-        'Career_Break': 0,
-        'Career_Break_Months': 0,
-        
-        
-        'Coding_Skills': 4,
-        'Analytical_Skills': 4,
-        'Problem_Solving_Skills': 4,
-        'Data_Driven_Thinking': 4,
-        'Domain_Expertise_Depth': 3,
-        
-        
-        'Communication_Skills': 3,
-        'Teamwork_Skills': 3,
-        'Presentation_Skills': 3,
-        'Networking_Skills': 2,
-        'Public_Speaking_Confidence': 3,
-        'Conflict_Resolution_Skills': 3,
-        
-        
-        'Leadership_Readiness': 3,
-        'Risk_Tolerance': 4,
-        'Adaptability_Score': 4,
-        'Stress_Management_Skills': 3,
-        'Continuous_Learning': 5,
-        'Innovation_Interest': 4,
-        'Customer_Focus': 3,
-        'Mentoring_Experience': 2,
-        
-        
-        'Preferred_Work_Mode': 'Hybrid',
-        'Location_Preference': 'Tier1_City',
-        'Work_Life_Balance_Priority': 4,
-        'Industry_Preference': 'Tech',
-        'Prefer_Corporate': 1,
-        'Entrepreneurship_Interest': 3,
-        'Salary_Expectation_Lakh': 25,
-        
-        
-        'Career_Goal_Clarity': 4,
-        'Certifications_Interest': 3,
-        'English_Proficiency': 4,
-        'Family_Support_Score': 4,
-        'Willing_To_Relocate': 1,
-        'Research_Experience': 1,
-        'Leadership_Positions': 1,
-        'Field_Specific_Courses': 5,
-    }
+    profile = dict(SAMPLE_PROFILE)
     
     print("\n User Profile:")
     print(f"  Education: {profile['Education_Level']} in {profile['Academic_Stream']}")
@@ -0,0 +1,307 @@
+"""
+HerApt Synthetic Dataset Generator
+Fits per-career distributions to career_path_ultra_enhanced.csv (empirical marginals joined
+by a Gaussian copula, categorical frequencies) and streams any number of new rows
+to CSV, JSONL or memory-mappable .npy columns; --unlabelled writes request profiles
+
+Run:
+    python create_ultra_dataset.py --rows 10000000 --output career_path_10m.csv
+    python create_ultra_dataset.py --rows 1000000 --unlabelled --output requests.jsonl
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+from dataset_loader_ultra import CATEGORICAL_COLUMNS, FLOAT_COLUMNS, SCHEMA, SCHEMA_VERSION, load_dataset
+
+
+CHUNK_ROWS = 100_000
+
+# Inverse-CDF table resolution per (career, column)
+QUANTILES = 1024
+
+# Decimals kept on generated float columns (the source CSV's salary and success precision)
+FLOAT_DECIMALS = 2
+
+# Request profiles carry no labels; everything else in the CSV is a model input
+LABEL_COLUMNS = ('Career', 'Success_Percentage')
+
+FORMATS = ('csv', 'jsonl', 'columns')
+
+# Flag columns that are 1 exactly when a count column is positive; a copula
+# only approximates such a rule, so the flag is recomputed from the count
+FLAG_COLUMNS = {'Career_Break': 'Career_Break_Months'}
+
+
+def normal_scores(values):
+    """Column-wise rank-based normal scores (ties share their average rank)"""
+
+    ranks = pd.DataFrame(values).rank(method='average').to_numpy()
+    return ndtri((ranks - 0.5) / len(values))
+
+
+def nearest_correlation(matrix, floor=1e-6):
+    """Clip the eigenvalues of a symmetric matrix and rescale it to a correlation matrix"""
+
+    values, vectors = np.linalg.eigh(matrix)
+    matrix = (vectors * np.maximum(values, floor)) @ vectors.T
+    d = np.sqrt(np.diag(matrix))
+    return matrix / np.outer(d, d)
+
+
+def correlation(z):
+    """Correlation of normal scores; constant columns are uncorrelated"""
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = np.corrcoef(z, rowvar=False)
+    corr = np.nan_to_num(corr)
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+class ProfileGenerator:
+    """Per-career Gaussian-copula model of the career dataset"""
+
+    def __init__(self, columns, careers, career_p, numeric, continuous, tables, cholesky,
+                 categorical, categories, category_cdf):
+        """
+        Args:
+            columns: output column order
+            careers, career_p: career labels and their frequencies
+            numeric: numeric column names; continuous: mask of those interpolated
+            tables: (n_careers, n_numeric, QUANTILES) inverse CDFs
+            cholesky: (n_careers, n_numeric, n_numeric) copula factors
+            categorical: categorical column names (without Career)
+            categories: category labels per categorical column
+            category_cdf: (n_careers, n_categories) cumulative frequencies per column
+        """
+        self.columns = list(columns)
+        self.careers = np.asarray(careers, dtype=object)
+        self.career_p = np.asarray(career_p, dtype=np.float64)
+        self.numeric = list(numeric)
+        self.continuous = np.asarray(continuous, dtype=bool)
+        self.tables = tables
+        self.cholesky = cholesky
+        self.categorical = list(categorical)
+        self.categories = [np.asarray(c, dtype=object) for c in categories]
+        self.category_cdf = category_cdf
+
+    @classmethod
+    def fit(cls, df):
+        """
+        Fit to a career DataFrame
+
+        Each career gets its own numeric marginals (QUANTILES-point inverse
+        CDFs), rank correlation (shrunk towards the pooled one, since a
+        career has ~100 rows for ~40 columns) and categorical frequencies.
+        """
+
+        categorical = [c for c in df.columns if c in CATEGORICAL_COLUMNS and c != 'Career']
+        numeric = [c for c in df.columns if c not in CATEGORICAL_COLUMNS]
+        continuous = np.array([c in FLOAT_COLUMNS for c in numeric])
+        careers, career_index = np.unique(df['Career'].astype(str), return_inverse=True)
+        career_p = np.bincount(career_index) / len(df)
+
+        values = df[numeric].to_numpy(dtype=np.float64)
+        pooled = correlation(normal_scores(values))
+
+        step = (np.arange(QUANTILES) + 0.5) / QUANTILES
+        tables = np.empty((len(careers), len(numeric), QUANTILES))
+        cholesky = np.empty((len(careers), len(numeric), len(numeric)))
+        for c in range(len(careers)):
+            rows = values[career_index == c]
+            tables[c, ~continuous] = np.quantile(rows[:, ~continuous], step, axis=0, method='inverted_cdf').T
+            tables[c, continuous] = np.quantile(rows[:, continuous], np.linspace(0, 1, QUANTILES), axis=0).T
+            shrink = min(1.0, len(numeric) / len(rows))
+            corr = (1 - shrink) * correlation(normal_scores(rows)) + shrink * pooled
+            cholesky[c] = np.linalg.cholesky(nearest_correlation(corr))
+
+        categories, category_cdf = [], []
+        for name in categorical:
+            labels, codes = np.unique(df[name].astype(str), return_inverse=True)
+            counts = np.zeros((len(careers), len(labels)))
+            np.add.at(counts, (career_index, codes), 1)
+            categories.append(labels)
+            category_cdf.append(np.cumsum(counts / counts.sum(axis=1, keepdims=True), axis=1))
+
+        return cls(df.columns, careers, career_p, numeric, continuous, tables, cholesky,
+                   categorical, categories, category_cdf)
+
+    def sample(self, n, rng):
+        """
+        n rows as column arrays
+
+        Returns:
+            dict of column name -> array: integer numerics in their SCHEMA
+            dtype, floats as float64 (exact decimals in text output),
+            categoricals (and Career) as category codes
+        """
+
+        career = rng.choice(len(self.careers), size=n, p=self.career_p)
+        order = np.argsort(career, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(career, minlength=len(self.careers)))))
+
+        # Correlated uniforms per career block, then each column's inverse CDF
+        u = np.empty((n, len(self.numeric)))
+        for c in np.flatnonzero(np.diff(bounds)):
+            rows = order[bounds[c]:bounds[c + 1]]
+            u[rows] = ndtr(rng.standard_normal((len(rows), len(self.numeric))) @ self.cholesky[c].T)
+
+        # Flat (career, column, quantile) positions into the inverse-CDF tables
+        tables = self.tables.reshape(-1)
+        base = (career[:, None] * len(self.numeric) + np.arange(len(self.numeric))) * QUANTILES
+        numeric = tables.take(base + np.minimum(u * QUANTILES, QUANTILES - 1).astype(np.intp))
+
+        cont = self.continuous
+        scaled = u[:, cont] * (QUANTILES - 1)
+        low = np.minimum(scaled.astype(np.intp), QUANTILES - 2)
+        lower = tables.take(base[:, cont] + low)
+        upper = tables.take(base[:, cont] + low + 1)
+        numeric[:, cont] = np.round(lower + (scaled - low) * (upper - lower), FLOAT_DECIMALS)
+
+        columns = {'Career': career}
+        for j, name in enumerate(self.numeric):
+            dtype = SCHEMA.get(name, 'float32')
+            columns[name] = numeric[:, j] if dtype == 'float32' else numeric[:, j].astype(dtype)
+        for flag, count in FLAG_COLUMNS.items():
+            if flag in columns and count in columns:
+                columns[flag] = (columns[count] > 0).astype(columns[flag].dtype)
+        for name, cdf in zip(self.categorical, self.category_cdf):
+            draw = rng.random(n)[:, None]
+            columns[name] = np.minimum((draw > cdf[career]).sum(axis=1), cdf.shape[1] - 1)
+        return columns
+
+    def labels(self, name):
+        """Category labels of a categorical column (or Career)"""
+        return self.careers if name == 'Career' else self.categories[self.categorical.index(name)]
+
+    def generate(self, rows, chunk_rows=CHUNK_ROWS, seed=42, unlabelled=False):
+        """
+        Yield DataFrame chunks totalling `rows` rows
+
+        Chunk i draws from its own spawned SeedSequence, so the output depends
+        only on seed and chunk_rows. The stream must not be [seed, i]: the
+        sharded trainer seeds its hold-out draws that way, and sharing them
+        would hold out exactly the careers drawn from the lowest uniforms.
+        """
+
+        columns = [c for c in self.columns if not (unlabelled and c in LABEL_COLUMNS)]
+        for index, start in enumerate(range(0, rows, chunk_rows)):
+            rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+            sample = self.sample(min(chunk_rows, rows - start), rng)
+            yield pd.DataFrame({
+                name: self.labels(name)[sample[name]] if name in self.categorical or name == 'Career'
+                else sample[name]
+                for name in columns
+            })
+
+
+def write_columns(chunks, path, rows):
+    """
+    Write chunks as one .npy file per column plus a manifest, in the
+    dataset_loader_ultra column-cache layout (dataset_loader_ultra.read_column_cache
+    memory-maps it back as a DataFrame)
+    """
+
+    staging = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    arrays, manifest, start = {}, None, 0
+    for chunk in chunks:
+        if manifest is None:
+            manifest = {'schema_version': SCHEMA_VERSION, 'source_digest': None, 'rows': rows, 'columns': []}
+            for i, name in enumerate(chunk.columns):
+                entry = {'name': name, 'file': f"{i:03d}.npy"}
+                if isinstance(chunk[name].dtype, pd.CategoricalDtype):
+                    entry['categories'] = [str(c) for c in chunk[name].cat.categories]
+                    dtype = chunk[name].cat.codes.dtype
+                else:
+                    dtype = chunk[name].dtype
+                arrays[name] = np.lib.format.open_memmap(os.path.join(staging, entry['file']), mode='w+',
+                                                         dtype=dtype, shape=(rows,))
+                manifest['columns'].append(entry)
+        for name, out in arrays.items():
+            series = chunk[name]
+            out[start:start + len(chunk)] = (series.cat.codes if isinstance(series.dtype, pd.CategoricalDtype)
+                                             else series).to_numpy()
+        start += len(chunk)
+
+    for out in arrays.values():
+        out.flush()
+    with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(staging, path)
+
+
+def write_dataset(generator, path, rows, output_format, chunk_rows=CHUNK_ROWS, seed=42, unlabelled=False):
+    """Stream generated rows to `path`; returns the number written"""
+
+    chunks = generator.generate(rows, chunk_rows, seed, unlabelled)
+    if output_format == 'columns':
+        categorical = set(generator.categorical) | {'Career'}
+        chunks = (chunk.astype({name: pd.CategoricalDtype(generator.labels(name)) if name in categorical
+                                else SCHEMA.get(name, 'float32') for name in chunk.columns})
+                  for chunk in chunks)
+        write_columns(chunks, path, rows)
+        return rows
+
+    with open(path, 'w', newline='') as f:
+        for index, chunk in enumerate(chunks):
+            if output_format == 'csv':
+                chunk.to_csv(f, header=index == 0, index=False)
+            else:
+                f.write(chunk.to_json(orient='records', lines=True))
+    return rows
+
+
+def infer_format(path):
+    """csv / jsonl from the file extension, columns for anything else (a directory)"""
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    return 'columns'
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic HerApt career profiles")
+    parser.add_argument('--source', default='career_path_ultra_enhanced.csv', help="CSV to fit")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--output', default='career_path_ultra_synthetic.csv',
+                        help=".csv, .jsonl, or a directory of .npy columns")
+    parser.add_argument('--format', choices=FORMATS, help="override the format implied by --output")
+    parser.add_argument('--unlabelled', action='store_true',
+                        help="drop Career and Success_Percentage (request profiles for benchmarks)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    output_format = args.format or infer_format(args.output)
+
+    print("="*80)
+    print("HERAPT SYNTHETIC DATASET GENERATOR")
+    print("="*80)
+
+    start = time.perf_counter()
+    generator = ProfileGenerator.fit(load_dataset(args.source))
+    print(f"\n Fitted {len(generator.careers)} careers x {len(generator.numeric)} numeric + "
+          f"{len(generator.categorical)} categorical columns from {args.source} "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    write_dataset(generator, args.output, args.rows, output_format, args.chunk_rows, args.seed, args.unlabelled)
+    seconds = time.perf_counter() - start
+    print(f" Wrote {args.rows:,} {'unlabelled ' if args.unlabelled else ''}rows to {args.output} "
+          f"({output_format}) in {seconds:.1f}s, {args.rows / seconds * 60:,.0f} rows/min")
+    print("\n" + "="*80)
@@ -0,0 +1,212 @@
+"""
+HerApt Typed Dataset Loader
+Reads the career CSV with an explicit schema (int8 scales, float32 values, categorical strings)
+Parsed columns are cached as .npy files that are memory-mapped on the next load
+"""
+
+import json
+import os
+import resource
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+from pipeline_cache_ultra import file_digest
+
+
+SCHEMA_VERSION = 1
+
+FLOAT_COLUMNS = ['GPA', 'Salary_Expectation_Lakh', 'Success_Percentage']
+
+# Counts that are not bounded by a 0-5 scale
+INT16_COLUMNS = ['Work_Experience_Years', 'Career_Break_Months']
+
+CATEGORICAL_COLUMNS = [
+    'Field', 'Career', 'Academic_Stream', 'Education_Level', 'Age_Group',
+    'Preferred_Work_Mode', 'Location_Preference', 'Industry_Preference',
+]
+
+INT8_COLUMNS = [
+    'Extracurricular_Activities', 'Internships', 'Projects', 'Leadership_Positions',
+    'Field_Specific_Courses', 'Research_Experience', 'Coding_Skills', 'Communication_Skills',
+    'Problem_Solving_Skills', 'Teamwork_Skills', 'Analytical_Skills', 'Presentation_Skills',
+    'Networking_Skills', 'Industry_Certifications', 'Career_Break', 'Family_Support_Score',
+    'English_Proficiency', 'Entrepreneurship_Interest', 'Risk_Tolerance', 'Leadership_Readiness',
+    'Certifications_Interest', 'Work_Life_Balance_Priority', 'Public_Speaking_Confidence',
+    'Conflict_Resolution_Skills', 'Stress_Management_Skills', 'Adaptability_Score',
+    'Mentoring_Experience', 'Innovation_Interest', 'Customer_Focus', 'Data_Driven_Thinking',
+    'Continuous_Learning', 'Career_Goal_Clarity', 'Willing_To_Relocate', 'Prefer_Corporate',
+    'Domain_Expertise_Depth', 'Current_Role_Success',
+]
+
+SCHEMA = {
+    **{name: 'float32' for name in FLOAT_COLUMNS},
+    **{name: 'int16' for name in INT16_COLUMNS},
+    **{name: 'int8' for name in INT8_COLUMNS},
+    **{name: 'category' for name in CATEGORICAL_COLUMNS},
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (Linux reports KB, macOS bytes)"""
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def read_csv_typed(path):
+    """
+    Parse the CSV with SCHEMA dtypes
+
+    Integer columns holding missing or out-of-range values are read as
+    float32 instead, so a dirty file still loads.
+    """
+
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {name: dtype for name, dtype in SCHEMA.items() if name in header}
+    try:
+        return pd.read_csv(path, dtype=dtypes)
+    except (ValueError, OverflowError):
+        relaxed = {name: ('float32' if dtype.startswith('int') else dtype) for name, dtype in dtypes.items()}
+        print("   ⚠️  Integer columns have missing or out-of-range values; reading them as float32")
+        return pd.read_csv(path, dtype=relaxed)
+
+
+def read_csv_chunks(path, chunk_rows=100_000, columns=None):
+    """
+    Stream the CSV as typed DataFrame chunks of at most chunk_rows rows
+
+    Integer columns are read as float32 up front: a missing value deep in a
+    large file must not fail the stream halfway through.
+
+    Args:
+        columns: names to read (None = every column)
+    """
+
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [name for name in header if columns is None or name in columns]
+    dtypes = {name: ('float32' if dtype.startswith('int') else dtype)
+              for name, dtype in SCHEMA.items() if name in usecols}
+    yield from pd.read_csv(path, dtype=dtypes, usecols=usecols, chunksize=chunk_rows)
+
+
+def write_column_cache(df, cache_path, source_digest):
+    """Store each column as <name>.npy (category codes for categoricals) plus a manifest"""
+
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        entry = {'name': name, 'file': f"{i:03d}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry['categories'] = [str(c) for c in series.cat.categories]
+            values = series.cat.codes.to_numpy()
+        else:
+            values = series.to_numpy()
+            if values.dtype == object or values.dtype.kind in 'OUT':
+                raise ValueError(f"Column {name!r} has no binary dtype; add it to SCHEMA")
+        np.save(os.path.join(temp_path, entry['file']), values)
+        columns.append(entry)
+
+    manifest = {
+        'schema_version': SCHEMA_VERSION,
+        'source_digest': source_digest,
+        'rows': len(df),
+        'columns': columns,
+    }
+    with open(os.path.join(temp_path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.replace(temp_path, cache_path)
+
+
+def read_column_cache(cache_path):
+    """DataFrame over the memory-mapped column files"""
+
+    with open(os.path.join(cache_path, 'manifest.json')) as f:
+        manifest = json.load(f)
+
+    data = {}
+    for entry in manifest['columns']:
+        values = np.load(os.path.join(cache_path, entry['file']), mmap_mode='r')
+        if 'categories' in entry:
+            data[entry['name']] = pd.Categorical.from_codes(np.asarray(values), entry['categories'])
+        else:
+            data[entry['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def load_dataset(path, cache_dir=None, digest=None):
+    """
+    Load the career dataset with compact dtypes
+
+    Args:
+        path: training CSV
+        cache_dir: keep parsed columns here (None = always parse the CSV)
+        digest: SHA-256 of the CSV if the caller already computed it
+
+    Returns:
+        DataFrame with int8/int16 scales, float32 values and categorical strings
+    """
+
+    if cache_dir is None:
+        return read_csv_typed(path)
+
+    digest = digest or file_digest(path)
+    cache_path = os.path.join(cache_dir, f"columns-v{SCHEMA_VERSION}-{digest[:24]}")
+    if os.path.exists(os.path.join(cache_path, 'manifest.json')):
+        try:
+            return read_column_cache(cache_path)
+        except Exception as e:
+            print(f"   ⚠️  Ignoring unreadable column cache {cache_path}: {e}")
+
+    df = read_csv_typed(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    write_column_cache(df, cache_path, digest)
+    return df
+
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(description="Compare CSV parsing with the typed column cache")
+    parser.add_argument('--data', default='career_path_ultra_enhanced.csv')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    print("="*80)
+    print("HERAPT DATASET LOADER")
+    print("="*80)
+
+    def best_time(load):
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            df = load()
+            times.append(time.perf_counter() - start)
+        return min(times), df
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        load_dataset(args.data, cache_dir)
+        loaders = [
+            ('pd.read_csv', lambda: pd.read_csv(args.data)),
+            ('typed read_csv', lambda: read_csv_typed(args.data)),
+            ('column cache', lambda: load_dataset(args.data, cache_dir)),
+        ]
+
+        print(f"\n {'Loader':<16} {'Time':>9} {'Frame memory':>13}")
+        for name, load in loaders:
+            seconds, df = best_time(load)
+            frame_mb = df.memory_usage(deep=True).sum() / 1e6
+            print(f" {name:<16} {seconds * 1000:7.1f}ms {frame_mb:>11.2f}MB")
+
+    print("\n" + "="*80)
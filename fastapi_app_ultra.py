@@ -0,0 +1,424 @@
+"""
+HerApt Ultra FastAPI Service
+Async /predict, /advice and /explain endpoints around UltraCareerPredictor
+Concurrent requests are micro-batched into one predict_proba call
+New model versions are hot-swapped in without a restart (POST /reload)
+
+Run:
+    uvicorn fastapi_app_ultra:app --host 0.0.0.0 --port 8000
+
+Configuration (environment variables):
+    HERAPT_MODELS_DIR      model registry to serve CURRENT from (default: models)
+    HERAPT_RELOAD_INTERVAL seconds between checks of the registry's CURRENT pointer
+                           (default 0 = reload only on POST /reload)
+    HERAPT_ARTIFACT        model artifact to memory-map instead of the registry (default:
+                           career_model_ultra.bin when there is no registry, otherwise
+                           the joblib pickles)
+    HERAPT_MAX_BATCH_SIZE  flush a batch once this many requests are queued (default 64)
+    HERAPT_MAX_WAIT_MS     flush a batch this long after its first request (default 5)
+    HERAPT_MAX_QUEUE       pending requests before /predict answers 503 (default 4096)
+    HERAPT_WORKERS         executor threads running batches (default 1)
+    HERAPT_CACHE_SIZE      cached predictions kept in the LRU cache (default 0 = off)
+    HERAPT_CACHE_TTL       seconds a cached prediction stays valid (default: no expiry)
+    HERAPT_METRICS         1 to record per-stage predictor metrics, served at /metrics (default 0)
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from fastapi import Body, FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from career_predictor_ultra import UltraCareerPredictor
+from model_registry_ultra import MODELS_DIR, HotSwapPredictor, ModelValidationError, current_version
+from predictor_metrics_ultra import PredictorMetrics
+
+
+class QueueFullError(Exception):
+    """Raised when the micro-batch queue has no room for another request"""
+
+
+class MicroBatcher:
+    """Collect concurrent predictions and run them as one batch off the event loop"""
+
+    def __init__(self, predict_batch, max_batch_size=64, max_wait_ms=5.0,
+                 max_queue=4096, workers=1):
+        """
+        Args:
+            predict_batch: callable(profiles, top_n) -> (served_by, list of
+                per-profile results), served_by identifying the model that
+                scored the batch
+            max_batch_size: flush as soon as this many requests are waiting
+            max_wait_ms: flush this long after the first request of a batch arrived
+            max_queue: pending requests accepted before submit raises QueueFullError
+            workers: executor threads, i.e. batches allowed in flight at once
+        """
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.workers = workers
+
+        self.queue = None
+        self.executor = None
+        self.in_flight = None
+        self.collector = None
+
+        self.stats = {'requests': 0, 'batches': 0, 'failed_batches': 0, 'rejected': 0, 'max_batch': 0}
+
+    async def start(self):
+        """Start the collector task (call from the running event loop)"""
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='herapt-batch')
+        self.in_flight = asyncio.Semaphore(self.workers)
+        self.collector = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        """Stop collecting and wait for running batches"""
+        if self.collector is not None:
+            self.collector.cancel()
+            try:
+                await self.collector
+            except asyncio.CancelledError:
+                pass
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    async def submit(self, profile, top_n=5):
+        """Queue one profile and wait for (served_by, its (career, success, match) list)"""
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((profile, top_n, future))
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            raise QueueFullError("Prediction queue is full")
+
+        self.stats['requests'] += 1
+        return await future
+
+    async def _collect(self):
+        """Form batches by size or deadline and hand them to the executor"""
+
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+
+            await self.in_flight.acquire()
+            asyncio.create_task(self._flush(batch))
+
+    async def _flush(self, batch):
+        """Run one batch in the executor and resolve its futures"""
+
+        try:
+            profiles = [profile for profile, _, _ in batch]
+            top_n = max(top_n for _, top_n, _ in batch)
+            loop = asyncio.get_running_loop()
+            try:
+                served_by, results = await loop.run_in_executor(
+                    self.executor, self.predict_batch, profiles, top_n)
+            except Exception:
+                # One bad profile must not fail its neighbours: rescore row by row
+                self.stats['failed_batches'] += 1
+                served_by, results = await loop.run_in_executor(self.executor, self._predict_rows, profiles, top_n)
+
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+            for (_, n, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result((served_by, result[:n]))
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.stats['batches'] += 1
+            self.in_flight.release()
+
+    def _predict_rows(self, profiles, top_n):
+        """(served_by, per-profile results or the exception that profile raised)"""
+
+        served_by, results = None, []
+        for profile in profiles:
+            try:
+                served_by, (result,) = self.predict_batch([profile], top_n)
+            except Exception as e:
+                result = e
+            results.append(result)
+        return served_by, results
+
+
+def create_model():
+    """
+    Serve the registry's CURRENT version when there is one, else the artifact
+    when available, else the pickles; every reloaded version shares the
+    cache settings and the metrics recorder
+    """
+
+    cache_ttl = os.environ.get('HERAPT_CACHE_TTL')
+    metrics_enabled = os.environ.get('HERAPT_METRICS', '0').lower() in ('1', 'true', 'yes')
+    options = {
+        'cache_size': int(os.environ.get('HERAPT_CACHE_SIZE', 0)),
+        'cache_ttl': float(cache_ttl) if cache_ttl else None,
+        'metrics': PredictorMetrics() if metrics_enabled else None,
+    }
+
+    models_dir = os.environ.get('HERAPT_MODELS_DIR', MODELS_DIR)
+    artifact_path = os.environ.get('HERAPT_ARTIFACT')
+    if artifact_path is None and current_version(models_dir) is not None:
+        return HotSwapPredictor.from_registry(models_dir, **options)
+    if artifact_path is None and os.path.exists('career_model_ultra.bin'):
+        artifact_path = 'career_model_ultra.bin'
+    return HotSwapPredictor(UltraCareerPredictor(artifact_path=artifact_path, **options),
+                            models_dir=models_dir, predictor_kwargs=options)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    model = create_model()
+    batcher = MicroBatcher(
+        model.predict_batch,
+        max_batch_size=int(os.environ.get('HERAPT_MAX_BATCH_SIZE', 64)),
+        max_wait_ms=float(os.environ.get('HERAPT_MAX_WAIT_MS', 5)),
+        max_queue=int(os.environ.get('HERAPT_MAX_QUEUE', 4096)),
+        workers=int(os.environ.get('HERAPT_WORKERS', 1)),
+    )
+    await batcher.start()
+    reload_interval = float(os.environ.get('HERAPT_RELOAD_INTERVAL', 0))
+    if reload_interval > 0:
+        model.watch(reload_interval)
+
+    app.state.model = model
+    app.state.batcher = batcher
+    yield
+    model.stop()
+    await batcher.stop()
+
+
+app = FastAPI(
+    title="HerApt Career Guidance API",
+    description="48-factor career recommendations with success percentages",
+    lifespan=lifespan,
+)
+
+
+class Recommendation(BaseModel):
+    career: str
+    success_percentage: float
+    match_score: float
+
+
+class PredictResponse(BaseModel):
+    success: bool
+    recommendations: List[Recommendation]
+    latency_ms: float
+    model_version: Optional[int]
+
+
+class AdviceRequest(BaseModel):
+    profile: Dict[str, Any]
+    career: Optional[str] = None
+    top_n: int = 3
+
+
+class Advice(BaseModel):
+    career: str
+    strengths: List[str]
+    improvements: List[str]
+
+
+class AdviceResponse(BaseModel):
+    success: bool
+    advice: List[Advice]
+    model_version: Optional[int]
+
+
+class ExplainRequest(BaseModel):
+    profile: Dict[str, Any]
+    career: Optional[str] = None
+    top_n: int = 3
+    top_features: int = 10
+
+
+class Explanation(BaseModel):
+    career: str
+    match_score: float
+    base_score: float
+    contributions: Dict[str, float]
+
+
+class ExplainResponse(BaseModel):
+    success: bool
+    explanations: List[Explanation]
+    model_version: Optional[int]
+
+
+class ReloadResponse(BaseModel):
+    success: bool
+    swapped: bool
+    model_version: Optional[int]
+
+
+def checked_profile(profile):
+    """
+    Copy of a request profile with its numeric fields coerced to numbers
+    (ints unless the field is fractional, like a row of the training CSV)
+
+    Raises:
+        HTTPException 422: a numeric field holds something that is not a
+            number, or a categorical field something other than a string,
+            a number or null
+    """
+
+    schema = app.state.model.predictor.schema
+    checked = dict(profile)
+    for i, name in enumerate(schema.numeric_features):
+        value = profile.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            checked[name] = schema.numeric_value(i, float(value))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=422, detail=f"{name} must be a number, got {value!r}")
+    for name in schema.categorical_features:
+        value = profile.get(name)
+        if value is not None and not isinstance(value, (str, int, float)):
+            raise HTTPException(status_code=422, detail=f"{name} must be a string, got {value!r}")
+    return checked
+
+
+async def recommend(profile, top_n):
+    """Micro-batched prediction for one profile: (predictor that served it, results)"""
+
+    try:
+        return await app.state.batcher.submit(profile, top_n)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.post("/predict", response_model=PredictResponse)
+async def predict(profile: Dict[str, Any] = Body(...), top_n: int = Query(5, ge=1, le=90)):
+    """Top N careers with success percentages for one profile"""
+
+    start = time.perf_counter()
+    predictor, results = await recommend(checked_profile(profile), top_n)
+    return PredictResponse(
+        success=True,
+        recommendations=[
+            Recommendation(career=career, success_percentage=success, match_score=match)
+            for career, success, match in results
+        ],
+        latency_ms=(time.perf_counter() - start) * 1000,
+        model_version=predictor.model_version,
+    )
+
+
+@app.post("/advice", response_model=AdviceResponse)
+async def advice(request: AdviceRequest):
+    """Strengths and improvements for a career, or for the top predicted careers"""
+
+    profile = checked_profile(request.profile)
+    if request.career is not None:
+        predictor = app.state.model.predictor
+        if request.career not in set(predictor.career_classes):
+            raise HTTPException(status_code=400, detail=f"Unknown careers: {[request.career]}")
+        careers = [request.career]
+    else:
+        predictor, results = await recommend(profile, request.top_n)
+        careers = [career for career, _, _ in results]
+
+    advice = await asyncio.to_thread(predictor.get_personalized_advice_batch, [profile], [careers])
+    return AdviceResponse(
+        success=True,
+        advice=[Advice(**a) for a in advice[0]],
+        model_version=predictor.model_version,
+    )
+
+
+@app.post("/explain", response_model=ExplainResponse)
+async def explain(request: ExplainRequest):
+    """Input features that raised or lowered each career's match score, largest effect first"""
+
+    profile = checked_profile(request.profile)
+    predictor = app.state.model.predictor
+    try:
+        # The first call may flatten the forest and build its node values; keep it off the event loop
+        explanations = (await asyncio.to_thread(
+            predictor.explain, profile, top_n=request.top_n,
+            careers=[request.career] if request.career is not None else None,
+        ))[0]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return ExplainResponse(
+        success=True,
+        explanations=[
+            Explanation(**{**e, 'contributions': dict(list(e['contributions'].items())[:request.top_features])})
+            for e in explanations
+        ],
+        model_version=predictor.model_version,
+    )
+
+
+@app.post("/reload", response_model=ReloadResponse)
+async def reload(version: Optional[int] = Query(None, ge=1)):
+    """
+    Load, validate and warm a model version (default: the registry's CURRENT)
+    in a background thread, then swap it in; requests keep being served by
+    the old model until the swap, and a failed candidate leaves it in place
+    """
+
+    model = app.state.model
+    try:
+        swapped = await asyncio.to_thread(model.reload, version)
+    except ModelValidationError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return ReloadResponse(success=True, swapped=swapped, model_version=model.model_version)
+
+
+@app.get("/health")
+async def health():
+    """Liveness plus model version, micro-batching and cache counters"""
+
+    stats = dict(app.state.batcher.stats)
+    stats['mean_batch'] = stats['requests'] / stats['batches'] if stats['batches'] else 0.0
+    model = app.state.model
+    cache = model.predictor.cache
+    return {
+        'status': 'ok',
+        'model_version': model.model_version,
+        'model_path': model.path,
+        'reload': model.status,
+        'queued': app.state.batcher.queue.qsize(),
+        'batching': stats,
+        'cache': cache.stats() if cache is not None else None,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Predictor stage latencies and counters in Prometheus text format"""
+
+    predictor_metrics = app.state.model.predictor.metrics
+    if not predictor_metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled; set HERAPT_METRICS=1")
+    return PlainTextResponse(predictor_metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
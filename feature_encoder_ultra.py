@@ -0,0 +1,178 @@
+"""
+Compiled Feature Encoder for HerApt
+Pandas-free replacement for the fitted ColumnTransformer
+StandardScaler + OneHotEncoder → preallocated NumPy buffer
+"""
+
+import numpy as np
+
+
+class CompiledFeatureEncoder:
+    """Encode profiles exactly like the saved preprocessor, without pandas"""
+
+    def __init__(self, numeric_features, categorical_features, mean, scale, categories,
+                 handle_unknown='ignore'):
+        """
+        Args:
+            numeric_features: numeric column names, in preprocessor order
+            categorical_features: categorical column names, in preprocessor order
+            mean: scaler mean per numeric feature
+            scale: scaler scale per numeric feature
+            categories: list of category arrays, one per categorical feature
+            handle_unknown: 'ignore' (all-zero block) or 'error'
+        """
+        self.numeric_features = list(numeric_features)
+        self.categorical_features = list(categorical_features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.categories = [list(c) for c in categories]
+        self.handle_unknown = handle_unknown
+
+
+        self.category_index = [
+            {category: i for i, category in enumerate(cats)} for cats in self.categories
+        ]
+        sizes = [len(cats) for cats in self.categories]
+        self.n_numeric = len(self.numeric_features)
+        self.category_offsets = self.n_numeric + np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.intp)
+        self.n_features_out = self.n_numeric + sum(sizes)
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor):
+        """Compile a fitted ColumnTransformer(StandardScaler, OneHotEncoder)"""
+
+        transformers = {}
+        for name, transformer, columns in preprocessor.transformers_:
+            if name == 'remainder':
+                if transformer != 'drop' and len(columns):
+                    raise ValueError("Preprocessor remainder columns are not supported")
+                continue
+            transformers[name] = (transformer, list(columns))
+        if set(transformers) != {'num', 'cat'}:
+            raise ValueError(f"Unsupported preprocessor layout: {sorted(transformers)}")
+
+        scaler, numeric_features = transformers['num']
+        onehot, categorical_features = transformers['cat']
+
+        if type(scaler).__name__ != 'StandardScaler':
+            raise ValueError(f"Unsupported numeric transformer: {type(scaler).__name__}")
+        if type(onehot).__name__ != 'OneHotEncoder':
+            raise ValueError(f"Unsupported categorical transformer: {type(onehot).__name__}")
+        if onehot.drop is not None or onehot.handle_unknown not in ('ignore', 'error'):
+            raise ValueError("Only OneHotEncoder(drop=None, handle_unknown='ignore'/'error') is supported")
+        if getattr(onehot, 'infrequent_categories_', None) and any(
+                c is not None for c in onehot.infrequent_categories_):
+            raise ValueError("Infrequent category grouping is not supported")
+
+
+        n_numeric = len(numeric_features)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_numeric)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_numeric)
+
+        return cls(
+            numeric_features, categorical_features, mean, scale,
+            onehot.categories_, handle_unknown=onehot.handle_unknown,
+        )
+
+    def columns(self, profiles):
+        """
+        Split profiles into raw numeric values and category codes
+
+        Args:
+            profiles: a profile dict, a list of dicts, or a DataFrame
+
+        Returns:
+            (numeric, codes): float64 (n, n_numeric) raw values with missing
+            fields as 0, and intp (n, n_categorical) category positions with
+            -1 for missing or unseen categories
+        """
+
+        if isinstance(profiles, dict):
+            profiles = [profiles]
+
+        if hasattr(profiles, 'columns'):
+            n_rows = len(profiles)
+            numeric = np.zeros((n_rows, self.n_numeric), dtype=np.float64)
+            for j, name in enumerate(self.numeric_features):
+                if name in profiles.columns:
+                    numeric[:, j] = profiles[name].to_numpy(dtype=np.float64, na_value=np.nan)
+            raw_categories = [
+                profiles[name].tolist() if name in profiles.columns else [None] * n_rows
+                for name in self.categorical_features
+            ]
+        else:
+            profiles = list(profiles)
+            n_rows = len(profiles)
+            numeric = np.array(
+                [[p.get(f, 0) for f in self.numeric_features] for p in profiles],
+                dtype=np.float64,
+            ).reshape(n_rows, self.n_numeric)
+            raw_categories = [
+                [p.get(name) for p in profiles] for name in self.categorical_features
+            ]
+
+        numeric[np.isnan(numeric)] = 0
+
+
+        codes = np.empty((n_rows, len(self.categorical_features)), dtype=np.intp)
+        for j, (values, lookup) in enumerate(zip(raw_categories, self.category_index)):
+            codes[:, j] = [lookup.get(v, -1) for v in values]
+
+        if self.handle_unknown == 'error' and (codes < 0).any():
+            row, col = np.argwhere(codes < 0)[0]
+            raise ValueError(
+                f"Found unknown category {raw_categories[col][row]!r} "
+                f"in column {self.categorical_features[col]!r}"
+            )
+
+        return numeric, codes
+
+    def encode_columns(self, numeric, codes, out=None, dtype=np.float64):
+        """Fill the encoded feature matrix from raw numeric values and category codes"""
+
+        n_rows = len(numeric)
+        if out is None:
+            out = np.empty((n_rows, self.n_features_out), dtype=dtype)
+        elif out.shape != (n_rows, self.n_features_out):
+            raise ValueError(f"Output buffer has shape {out.shape}, expected {(n_rows, self.n_features_out)}")
+
+
+        scaled = numeric - self.mean
+        scaled /= self.scale
+        out[:, :self.n_numeric] = scaled
+
+
+        out[:, self.n_numeric:] = 0
+        known = codes >= 0
+        rows, cols = np.nonzero(known)
+        out[rows, self.category_offsets[cols] + codes[rows, cols]] = 1
+
+        return out
+
+    def transform(self, profiles, out=None, dtype=np.float64):
+        """
+        Encode profiles into a (n, n_features_out) matrix
+
+        Output is identical to preprocessor.transform on the same rows.
+
+        Args:
+            profiles: a profile dict, a list of dicts, or a DataFrame
+            out: optional preallocated buffer of shape (n, n_features_out)
+            dtype: buffer dtype when out is not given (float32 or float64)
+        """
+        numeric, codes = self.columns(profiles)
+        return self.encode_columns(numeric, codes, out=out, dtype=dtype)
+
+    def transform_one(self, profile, out=None, dtype=np.float64):
+        """Encode a single profile dict into a (n_features_out,) vector"""
+
+        row = None if out is None else out.reshape(1, -1)
+        return self.transform([profile], out=row, dtype=dtype)[0]
+
+    def feature_names_out(self):
+        """Encoded column names, matching preprocessor.get_feature_names_out()"""
+
+        names = [f"num__{f}" for f in self.numeric_features]
+        for feature, cats in zip(self.categorical_features, self.categories):
+            names.extend(f"cat__{feature}_{c}" for c in cats)
+        return names
@@ -0,0 +1,227 @@
+"""
+Forest Attributions for HerApt
+Saabas path contributions: every split on a profile's path shifts the class
+distribution, and the shift is credited to the input feature the split tests
+Internal-node distributions are precomputed once (sparse, float16), so an explanation costs one traversal
+"""
+
+import numpy as np
+
+from forest_engine_ultra import narrowest_int_dtype
+
+
+def node_value_table(model, forest, estimators=None):
+    """
+    Class distribution of every internal node of a flattened sklearn forest
+
+    Args:
+        model: fitted RandomForestClassifier / ExtraTreesClassifier
+        forest: FlatForest.from_sklearn(model) (or the artifact loaded from it),
+                or a forest pruned from `estimators` (forest_compression_ultra)
+        estimators: the trees forest was built from, in order (default:
+                    model.estimators_); regression trees holding probability
+                    vectors (distilled students) are read per output
+
+    Returns:
+        (node_ptr, node_class, node_weight): CSR table with one row per
+        internal node, in FlatForest node order; weights are float16
+    """
+
+    estimators = model.estimators_ if estimators is None else estimators
+    lefts, rights, ptrs, classes, weights = [], [], [], [], []
+    node_base, entry_base = 0, 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        internal = tree.children_left >= 0
+        lefts.append(np.where(internal, tree.children_left + node_base, -1))
+        rights.append(np.where(internal, tree.children_right + node_base, -1))
+
+        values = tree.value[:, 0, :] if tree.value.shape[1] == 1 else tree.value[:, :, 0]
+        values = values * internal[:, None]
+        normalizer = values.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0] = 1
+        rows, cols = np.nonzero(values)
+        ptrs.append(entry_base + np.searchsorted(rows, np.arange(tree.node_count)))
+        classes.append(cols.astype(np.int16))
+        weights.append((values[rows, cols] / normalizer[rows, 0]).astype(np.float16))
+        node_base += tree.node_count
+        entry_base += len(rows)
+
+    sk_left, sk_right = np.concatenate(lefts), np.concatenate(rights)
+    sk_ptr = np.concatenate(ptrs + [[entry_base]])
+    sk_class, sk_weight = np.concatenate(classes), np.concatenate(weights)
+
+
+    # Walk both layouts in step: a flat node's right child is left + 1
+    flat_left = np.asarray(forest.left, dtype=np.int64)
+    is_leaf = np.asarray(forest.leaf_offset) >= 0
+    sklearn_node = np.empty(forest.node_count, dtype=np.int64)
+    flat = np.asarray(forest.roots, dtype=np.int64)
+    sk = np.concatenate(([0], np.cumsum([e.tree_.node_count for e in estimators])[:-1]))
+    while flat.size:
+        sklearn_node[flat] = sk
+        internal = ~is_leaf[flat]
+        flat, sk = flat[internal], sk[internal]
+        flat = np.concatenate([flat_left[flat], flat_left[flat] + 1])
+        sk = np.concatenate([sk_left[sk], sk_right[sk]])
+
+
+    source = sklearn_node[~is_leaf]
+    start = sk_ptr[source]
+    count = sk_ptr[source + 1] - start
+    ends = np.cumsum(count)
+    position = np.arange(ends[-1] if len(ends) else 0) + np.repeat(start - (ends - count), count)
+    node_ptr = np.concatenate(([0], ends))
+
+    return (
+        node_ptr.astype(narrowest_int_dtype(node_ptr[-1])),
+        sk_class[position].astype(narrowest_int_dtype(forest.n_classes)),
+        sk_weight[position],
+    )
+
+
+def concatenate_node_values(tables):
+    """node_value_table() of FlatForest.concatenate(forests), from each forest's table"""
+
+    tables = list(tables)
+    entry_base = np.cumsum([0] + [len(classes) for _, classes, _ in tables])
+    node_ptr = np.concatenate([[0]] + [np.asarray(ptr[1:], dtype=np.int64) + base
+                                       for (ptr, _, _), base in zip(tables, entry_base)])
+    node_class = np.concatenate([classes for _, classes, _ in tables])
+    return (
+        node_ptr.astype(narrowest_int_dtype(node_ptr[-1])),
+        node_class.astype(narrowest_int_dtype(node_class.max() if len(node_class) else 0)),
+        np.concatenate([weights for _, _, weights in tables]).astype(np.float16),
+    )
+
+
+def input_groups(numeric_features, categorical_features, categories):
+    """
+    Original input feature of every encoded column
+
+    Returns:
+        (group, names): group index per encoded column (numeric columns,
+        then each categorical's one-hot block) and the input feature names
+    """
+
+    group = list(range(len(numeric_features)))
+    for i, cats in enumerate(categories):
+        group.extend([len(numeric_features) + i] * len(cats))
+    return np.asarray(group, dtype=np.int64), list(numeric_features) + list(categorical_features)
+
+
+class PathExplainer:
+    """Per-profile, per-career contributions of each input feature to a FlatForest's probabilities"""
+
+    def __init__(self, forest, node_ptr, node_class, node_weight, group, names):
+        """
+        Args:
+            forest: FlatForest
+            node_ptr, node_class, node_weight: node_value_table() output
+            group, names: input_groups() output for the forest's encoded columns
+        """
+        self.forest = forest
+        self.node_ptr = node_ptr
+        self.node_class = node_class
+        self.node_weight = node_weight
+        self.group = group
+        self.names = names
+        self.internal_rank = np.cumsum(np.asarray(forest.leaf_offset) < 0) - 1
+        self.node_group = group[np.asarray(forest.feature, dtype=np.int64)]
+
+    def _values(self, table_row, ptr, classes, weights, target_pos, row):
+        """(pair, target position, weight) entries of the visited nodes' distributions"""
+
+        start = ptr.take(table_row).astype(np.int64)
+        count = ptr.take(table_row + 1) - start
+        ends = np.cumsum(count)
+        position = np.arange(ends[-1] if len(ends) else 0) + np.repeat(start - (ends - count), count)
+
+        target = target_pos.take(np.repeat(row * target_pos.shape[1], count) + classes.take(position))
+        keep = np.flatnonzero(target >= 0)
+        pair = np.searchsorted(ends, keep, side='right')
+        return pair, target.take(keep), weights.take(position.take(keep)).astype(np.float64)
+
+    def contributions(self, X, targets, max_pairs=1_000_000):
+        """
+        Saabas contributions of each input feature to selected class probabilities
+
+        Args:
+            X: (n_rows, n_features) encoded matrix
+            targets: (n_rows, n_targets) class indices to explain per row
+            max_pairs: upper bound on rows x trees walked per chunk
+
+        Returns:
+            (bias, contributions): (n_rows, n_targets) forest-average root
+            probabilities and (n_rows, n_targets, n_inputs) contributions;
+            bias + contributions.sum(-1) equals predict_proba for the targets
+        """
+
+        forest = self.forest
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        targets = np.atleast_2d(np.asarray(targets, dtype=np.int64))
+        n_rows, n_targets = targets.shape
+        n_groups = len(self.names)
+
+        bias = np.zeros((n_rows, n_targets))
+        contributions = np.zeros((n_rows, n_targets, n_groups))
+        chunk = max(1, max_pairs // forest.n_trees)
+        for start in range(0, n_rows, chunk):
+            rows = slice(start, start + chunk)
+            bias[rows], contributions[rows] = self._contributions(X[rows], targets[rows])
+        return bias, contributions
+
+    def _contributions(self, X, targets):
+        forest = self.forest
+        n_rows, n_targets = targets.shape
+        n_groups = len(self.names)
+
+        target_pos = np.full((n_rows, forest.n_classes), -1, dtype=np.int32)
+        target_pos[np.arange(n_rows)[:, None], targets] = np.arange(n_targets)
+
+
+        # Paths of every (row, tree) pair, one level per step; finished pairs sit on their leaf
+        node = np.repeat(np.asarray(forest.roots, dtype=np.int64), n_rows)
+        row = np.tile(np.arange(n_rows), forest.n_trees)
+        levels = [node]
+        while (forest.leaf_offset.take(node) < 0).any():
+            go_right = X[row, forest.feature.take(node)] > forest.threshold.take(node)
+            node = forest.left.take(node) + go_right
+            levels.append(node)
+        paths = np.stack(levels)
+
+        level, pair = np.nonzero(np.concatenate([np.ones((1, paths.shape[1]), dtype=bool),
+                                                 paths[1:] != paths[:-1]]))
+        node = paths[level, pair]
+        parent_group = np.where(level > 0, self.node_group.take(paths[np.maximum(level - 1, 0), pair]), -1)
+        row = row[pair]
+
+
+        # Each node's distribution is credited (+) to the split above it and
+        # debited (-) from its own split, so the path telescopes to the leaf
+        size = n_rows * n_targets
+        bias = np.zeros(size)
+        contributions = np.zeros(size * n_groups)
+        leaf_offset = forest.leaf_offset.take(node)
+        leaf = leaf_offset >= 0
+        for internal, subset, table_row, table in (
+            (False, leaf, leaf_offset[leaf], (forest.dist_ptr, forest.dist_class, forest.dist_weight)),
+            (True, ~leaf, self.internal_rank.take(node[~leaf]),
+             (self.node_ptr, self.node_class, self.node_weight)),
+        ):
+            entry, target, weight = self._values(table_row, *table, target_pos, row[subset])
+            entry = np.flatnonzero(subset)[entry]
+            key = row[entry] * n_targets + target
+
+            parent = parent_group[entry]
+            root = parent < 0
+            bias += np.bincount(key[root], weight[root], minlength=size)
+            contributions += np.bincount(key[~root] * n_groups + parent[~root], weight[~root],
+                                         minlength=size * n_groups)
+            if internal:
+                contributions -= np.bincount(key * n_groups + self.node_group.take(node[entry]), weight,
+                                             minlength=size * n_groups)
+
+        bias /= forest.n_trees
+        contributions /= forest.n_trees
+        return bias.reshape(n_rows, n_targets), contributions.reshape(n_rows, n_targets, n_groups)
@@ -0,0 +1,380 @@
+"""
+Forest Compression for HerApt
+Search tree subsets, depth caps and leaf merging (and optionally a distilled student)
+for the smallest FlatForest that meets a latency target and agrees with the full model
+
+Run:
+    python forest_compression_ultra.py --latency-ms 0.3 --min-top1 0.9 --min-top5 0.8
+"""
+
+import time
+
+import numpy as np
+
+from forest_attribution_ultra import node_value_table
+from forest_engine_ultra import FlatForest
+
+
+# Bumped when search() changes how candidates are ranked or scored (stage cache key)
+SEARCH_VERSION = 2
+
+
+DEFAULT_GRID = {
+    'n_trees': [25, 50, 100, 150, None],
+    'max_depth': [10, 14, 18, 22, None],
+    'min_samples': [1, 4],
+}
+
+DISTILL_GRID = {
+    'n_trees': [20, 50],
+    'max_depth': [12, 16],
+}
+
+
+def node_values(estimator):
+    """(n_nodes, n_classes) class distribution at every node of a fitted tree"""
+
+    value = estimator.tree_.value
+    value = value[:, 0, :] if value.shape[1] == 1 else value[:, :, 0]
+    value = np.clip(value, 0, None)
+    total = value.sum(axis=1, keepdims=True)
+    total[total == 0] = 1
+    return value / total
+
+
+def prune_tree(estimator, max_depth=None, min_samples=1):
+    """
+    Cut one sklearn tree down to a depth cap and a minimum leaf size
+
+    A node becomes a leaf when it is at max_depth or when either child saw
+    fewer than min_samples training rows; its leaf distribution is the class
+    distribution of the rows that reached it, so the two children are merged.
+
+    Returns:
+        (feature, threshold, left, right, leaf_values) in breadth-first
+        order, children -1 for leaves, leaf_values in node order
+    """
+
+    tree = estimator.tree_
+    left, right = tree.children_left, tree.children_right
+    split = left >= 0
+    if min_samples > 1:
+        samples = tree.n_node_samples
+        split &= np.minimum(samples[np.maximum(left, 0)], samples[np.maximum(right, 0)]) >= min_samples
+
+    order = []
+    level = np.array([0])
+    depth = 0
+    while level.size:
+        order.append(level)
+        if max_depth is not None and depth >= max_depth:
+            break
+        internal = level[split[level]]
+        level = np.stack([left[internal], right[internal]], axis=1).ravel()
+        depth += 1
+    order = np.concatenate(order)
+
+    kept_split = split[order]
+    if max_depth is not None:
+        kept_split &= np.isin(left[order], order)
+    new_index = np.full(tree.node_count, -1, dtype=np.int64)
+    new_index[order] = np.arange(len(order))
+
+    return (
+        np.where(kept_split, tree.feature[order], 0),
+        tree.threshold[order],
+        np.where(kept_split, new_index[np.maximum(left[order], 0)], -1),
+        np.where(kept_split, new_index[np.maximum(right[order], 0)], -1),
+        node_values(estimator)[order][~kept_split],
+    )
+
+
+def combine_trees(pruned, n_classes, n_features, classes=None):
+    """FlatForest from a list of prune_tree outputs"""
+
+    features, thresholds, lefts, rights, leaf_values, roots = [], [], [], [], [], []
+    node_base = 0
+    for feature, threshold, left, right, values in pruned:
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(np.where(left >= 0, left + node_base, -1))
+        rights.append(np.where(right >= 0, right + node_base, -1))
+        leaf_values.append(values)
+        roots.append(node_base)
+        node_base += len(feature)
+
+    return FlatForest.from_arrays(
+        np.concatenate(features), np.concatenate(thresholds),
+        np.concatenate(lefts), np.concatenate(rights), np.asarray(roots),
+        np.concatenate(leaf_values),
+        n_classes=n_classes, n_features=n_features, classes=classes,
+    )
+
+
+def rank_trees(model, X, reference):
+    """
+    Tree indices, most faithful to the full forest first
+
+    Each tree is scored by the mean probability it gives the full model's
+    top-1 career; prefixes of the ranking stand in for a greedy subset
+    search, which would cost a full evaluation per tree per step.
+    """
+
+    target = np.argmax(reference, axis=1)
+    scores = [
+        estimator.predict_proba(X)[np.arange(len(X)), target].mean()
+        for estimator in model.estimators_
+    ]
+    return np.argsort(scores)[::-1]
+
+
+def agreement(proba, reference, k=5):
+    """(top-1 agreement, mean top-k overlap) of proba against the full model"""
+
+    top1 = float((np.argmax(proba, axis=1) == np.argmax(reference, axis=1)).mean())
+    top_k = np.argpartition(-proba, k, axis=1)[:, :k]
+    ref_k = np.argpartition(-reference, k, axis=1)[:, :k]
+    overlap = (top_k[:, :, None] == ref_k[:, None, :]).any(axis=2).sum(axis=1) / k
+    return top1, float(overlap.mean())
+
+
+def forest_nbytes(forest):
+    """Bytes of the arrays a FlatForest artifact stores (before leaf deduplication)"""
+
+    arrays = (forest.feature, forest.threshold, forest.left, forest.leaf_offset,
+              forest.roots, forest.dist_ptr, forest.dist_class, forest.dist_weight)
+    return int(sum(np.asarray(a).nbytes for a in arrays))
+
+
+def single_row_latency_ms(forest, X, repeats=200):
+    """Median predict_proba time for one row"""
+
+    forest.predict_proba(X[:1])
+    timings = []
+    for i in range(repeats):
+        row = X[i % len(X):i % len(X) + 1]
+        start = time.perf_counter()
+        forest.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def evaluate_candidate(name, forest, X, reference, settings):
+    """Report entry for one compressed forest"""
+
+    top1, top5 = agreement(forest.predict_proba(X), reference)
+    return {
+        'name': name,
+        **settings,
+        'nodes': int(forest.node_count),
+        'size_bytes': forest_nbytes(forest),
+        'latency_ms': single_row_latency_ms(forest, X),
+        'top1_agreement': top1,
+        'top5_agreement': top5,
+    }
+
+
+def distill_student(model, X_train, n_trees, max_depth, n_numeric, copies=2, noise=0.1, seed=42):
+    """
+    Fit a small multi-output regression forest on the full model's probabilities
+
+    The training rows are augmented with copies whose numeric (standardized)
+    columns get Gaussian noise, so the student also sees the teacher's
+    behaviour between training points. Its leaves hold averaged probability
+    vectors, which FlatForest evaluates like any other leaf distribution.
+    """
+
+    from sklearn.ensemble import RandomForestRegressor
+
+    rng = np.random.default_rng(seed)
+    augmented = [X_train]
+    for _ in range(copies):
+        X_noisy = np.array(X_train, dtype=np.float32)
+        X_noisy[:, :n_numeric] += rng.normal(0, noise, size=(len(X_noisy), n_numeric))
+        augmented.append(X_noisy)
+    X_student = np.concatenate(augmented)
+    y_student = model.predict_proba(X_student)
+
+    student = RandomForestRegressor(n_estimators=n_trees, max_depth=max_depth, max_features=0.3,
+                                    random_state=seed, n_jobs=-1)
+    student.fit(X_student, y_student)
+    return student
+
+
+def build_candidate(model, entry, ranking, X_train=None, n_numeric=None, with_node_values=False):
+    """
+    Rebuild the FlatForest of a report entry
+
+    Returns:
+        the FlatForest, or (FlatForest, node_value_table output) with
+        with_node_values, so the exported artifact can still be explained
+    """
+
+    if entry['kind'] == 'student':
+        student = distill_student(model, X_train, entry['n_trees'], entry['max_depth'], n_numeric)
+        estimators = student.estimators_
+        pruned = [prune_tree(estimator) for estimator in estimators]
+    else:
+        estimators = [model.estimators_[i] for i in ranking[:entry['n_trees']]]
+        pruned = [prune_tree(estimator, entry['max_depth'], entry['min_samples']) for estimator in estimators]
+    forest = combine_trees(pruned, model.n_classes_, model.n_features_in_, model.classes_)
+    if not with_node_values:
+        return forest
+    return forest, node_value_table(model, forest, estimators)
+
+
+def search(model, X_eval, grid=None, distill=False, X_train=None, n_numeric=None, verbose=True):
+    """
+    Evaluate compressed variants of a fitted forest
+
+    Only one candidate forest is alive at a time; build_candidate recreates
+    the chosen one from its report entry.
+
+    Args:
+        model: fitted RandomForestClassifier / ExtraTreesClassifier
+        X_eval: encoded held-out rows (e.g. the test split); the first half
+                ranks the trees, the second measures agreement and latency,
+                so no candidate is scored on the rows that chose its trees
+        grid: dict of n_trees / max_depth / min_samples lists (None = all trees / no cap)
+        distill: also fit students from DISTILL_GRID (needs X_train and n_numeric)
+
+    Returns:
+        (report, ranking): report entries sorted by size, and the tree order
+        subset candidates take their prefixes from
+    """
+
+    grid = grid or DEFAULT_GRID
+    X_eval = np.asarray(X_eval, dtype=np.float32)
+    X_rank, X_eval = X_eval[:len(X_eval) // 2], X_eval[len(X_eval) // 2:]
+    ranking = rank_trees(model, X_rank, model.predict_proba(X_rank))
+    reference = model.predict_proba(X_eval)
+
+    candidates = []
+    for max_depth in grid['max_depth']:
+        for min_samples in grid['min_samples']:
+            for n_trees in grid['n_trees']:
+                n_trees = min(n_trees or len(ranking), len(ranking))
+                candidates.append({
+                    'name': f"trees={n_trees} depth={max_depth or 'full'} merge<{min_samples}",
+                    'kind': 'subset', 'n_trees': n_trees, 'max_depth': max_depth, 'min_samples': min_samples,
+                })
+    if distill:
+        for n_trees in DISTILL_GRID['n_trees']:
+            for max_depth in DISTILL_GRID['max_depth']:
+                candidates.append({
+                    'name': f"student trees={n_trees} depth={max_depth}",
+                    'kind': 'student', 'n_trees': n_trees, 'max_depth': max_depth, 'min_samples': 1,
+                })
+
+    report = []
+    for candidate in candidates:
+        forest = build_candidate(model, candidate, ranking, X_train, n_numeric)
+        settings = {key: value for key, value in candidate.items() if key != 'name'}
+        report.append(evaluate_candidate(candidate['name'], forest, X_eval, reference, settings))
+        if verbose:
+            print_entry(report[-1])
+
+    report.sort(key=lambda entry: entry['size_bytes'])
+    return report, [int(i) for i in ranking]
+
+
+def select(report, latency_ms, min_top1, min_top5):
+    """
+    Smallest candidate within the latency target and both agreement thresholds
+
+    Marks each entry with 'meets_target' and 'pareto' (no other candidate is
+    both faster and more faithful at top-5); returns the chosen entry or None.
+    """
+
+    for entry in report:
+        entry['meets_target'] = (entry['latency_ms'] <= latency_ms
+                                 and entry['top1_agreement'] >= min_top1
+                                 and entry['top5_agreement'] >= min_top5)
+        entry['pareto'] = not any(
+            other['latency_ms'] < entry['latency_ms'] and other['top5_agreement'] > entry['top5_agreement']
+            for other in report
+        )
+
+    passing = [entry for entry in report if entry['meets_target']]
+    return min(passing, key=lambda entry: entry['size_bytes']) if passing else None
+
+
+def print_entry(entry, marker=' '):
+    print(f"  {marker}{entry['name']:<34} {entry['nodes']:>10,} {entry['size_bytes'] / 1e6:>8.1f}MB "
+          f"{entry['latency_ms']:>7.3f}ms {entry['top1_agreement']:>7.1%} {entry['top5_agreement']:>7.1%}")
+
+
+def print_report(report, chosen=None):
+    """Trade-off curve: every candidate by size; * = chosen, + = Pareto-optimal"""
+
+    print(f"\n   {'Candidate':<34} {'Nodes':>10} {'Size':>10} {'Latency':>9} {'Top-1':>7} {'Top-5':>7}")
+    for entry in report:
+        marker = '*' if entry is chosen else ('+' if entry.get('pareto') else ' ')
+        print_entry(entry, marker)
+    print("   (* chosen, + Pareto-optimal latency vs top-5 agreement)")
+
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    import joblib
+    import pandas as pd
+
+    from feature_encoder_ultra import CompiledFeatureEncoder
+    from model_artifact_ultra import export_artifact
+
+    parser = argparse.ArgumentParser(description="Compress the saved forest to a latency budget")
+    parser.add_argument('--data', default='career_path_ultra_enhanced.csv')
+    parser.add_argument('--latency-ms', type=float, default=0.5, help="single-row latency target")
+    parser.add_argument('--min-top1', type=float, default=0.9, help="minimum top-1 agreement")
+    parser.add_argument('--min-top5', type=float, default=0.8, help="minimum top-5 agreement")
+    parser.add_argument('--eval-rows', type=int, default=2000)
+    parser.add_argument('--distill', action='store_true', help="also try distilled students")
+    parser.add_argument('--output', default='career_model_ultra.compressed.bin')
+    parser.add_argument('--report', default='compression_report_ultra.json')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("HERAPT FOREST COMPRESSION")
+    print("="*80)
+
+    model = joblib.load('career_rf_model_ultra.pkl')
+    model.verbose = 0
+    preprocessor = joblib.load('career_preprocessor_ultra.pkl')
+    label_encoder = joblib.load('career_label_encoder_ultra.pkl')
+    feature_config = joblib.load('feature_config_ultra.pkl')
+    numeric_features = feature_config['numeric_features']
+
+    df = pd.read_csv(args.data)
+    X_all = preprocessor.transform(df[numeric_features + feature_config['categorical_features']])
+    rows = np.random.default_rng(0).permutation(len(X_all))
+    X_eval, X_train = X_all[rows[:args.eval_rows]], X_all[rows[args.eval_rows:]]
+
+    print(f"\n Searching {len(model.estimators_)}-tree forest on {len(X_eval)} rows...")
+    report, ranking = search(model, X_eval, distill=args.distill, X_train=X_train,
+                             n_numeric=len(numeric_features))
+    chosen = select(report, args.latency_ms, args.min_top1, args.min_top5)
+    print_report(report, chosen)
+
+    with open(args.report, 'w') as f:
+        json.dump({'target': vars(args), 'chosen': chosen and chosen['name'], 'tree_ranking': ranking,
+                   'candidates': report}, f, indent=2)
+    print(f"\n Saved {args.report}")
+
+    if chosen is None:
+        print(" No candidate meets the target; relax --latency-ms or the agreement thresholds")
+    else:
+        forest, node_values = build_candidate(model, chosen, ranking, X_train, len(numeric_features),
+                                              with_node_values=True)
+        size = export_artifact(
+            args.output, forest,
+            CompiledFeatureEncoder.from_preprocessor(preprocessor), label_encoder.classes_,
+            metadata={**{k: v for k, v in feature_config.items() if k not in ('numeric_features', 'categorical_features')},
+                      'compression': chosen},
+            node_values=node_values,
+        )
+        print(f" Saved {args.output} ({size / 1e6:.1f} MB): {chosen['name']}")
+
+    print("\n" + "="*80)
@@ -0,0 +1,460 @@
+"""
+Flat Forest Inference Engine for HerApt
+All trees of a fitted forest → contiguous node arrays
+Level-by-level NumPy traversal of every (row, tree) pair at once
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class FlatForest:
+    """Array-backed random-forest predict_proba"""
+
+    def __init__(self, feature, threshold, left, right, leaf_offset, roots,
+                 dist_ptr, dist_class, dist_weight, n_classes, n_features, classes=None,
+                 n_jobs=None):
+        """
+        Args:
+            feature: split feature per node
+            threshold: float32 split threshold per node (go left when x <= threshold)
+            left, right: child node indices per node; siblings are adjacent
+                (right == left + 1) and leaves point to themselves.
+                right may be None, it is then derived from left on access
+            leaf_offset: row of the leaf distribution table per node, -1 for internal nodes
+            roots: root node index of each tree
+            dist_ptr: CSR row pointer of the leaf distribution table
+            dist_class, dist_weight: non-zero class ids and probabilities per distribution
+            n_classes: number of classes in the forest output
+            n_features: number of encoded input features
+            classes: class labels of the output columns (defaults to 0..n_classes-1)
+            n_jobs: threads used by predict_proba on large batches (-1 = all cores)
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self._right = right
+        self.leaf_offset = leaf_offset
+        self.roots = roots
+        self.dist_ptr = dist_ptr
+        self.dist_class = dist_class
+        self.dist_weight = dist_weight
+        self.n_classes = int(n_classes)
+        self.n_features = int(n_features)
+        self.classes_ = np.arange(self.n_classes) if classes is None else np.asarray(classes)
+        self.n_trees = len(roots)
+        self.n_jobs = n_jobs
+        self.index_dtype = np.int32 if len(feature) < 2**31 else np.int64
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted RandomForestClassifier / ExtraTreesClassifier"""
+
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests are supported")
+
+        features, thresholds, lefts, rights, leaf_values, roots = [], [], [], [], [], []
+        node_base = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left < 0
+
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, -1, tree.children_left + node_base))
+            rights.append(np.where(is_leaf, -1, tree.children_right + node_base))
+            roots.append(node_base)
+
+
+            values = tree.value[is_leaf, 0, :]
+            normalizer = values.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0] = 1
+            leaf_values.append(values / normalizer)
+
+            node_base += tree.node_count
+
+        return cls.from_arrays(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights), np.asarray(roots),
+            np.concatenate(leaf_values),
+            n_classes=model.n_classes_, n_features=model.n_features_in_, classes=model.classes_,
+            n_jobs=getattr(model, 'n_jobs', None),
+        )
+
+    @classmethod
+    def from_arrays(cls, feature, threshold, left, right, roots, leaf_values,
+                    n_classes, n_features, classes=None, n_jobs=None):
+        """
+        Build the traversal layout from plain tree arrays
+
+        Args:
+            feature, threshold, left, right: per-node arrays with -1 children for leaves
+            roots: root node index of each tree
+            leaf_values: (n_leaves, n_classes) class distributions, in node order
+        """
+
+        left = np.asarray(left, dtype=np.int64)
+        right = np.asarray(right, dtype=np.int64)
+        is_leaf = left < 0
+        leaf_rank = np.cumsum(is_leaf) - 1
+
+
+        order = []
+        level = np.asarray(roots, dtype=np.int64)
+        while level.size:
+            order.append(level)
+            internal = level[~is_leaf[level]]
+            level = np.stack([left[internal], right[internal]], axis=1).ravel()
+        order = np.concatenate(order)
+        new_index = np.empty(len(order), dtype=np.int64)
+        new_index[order] = np.arange(len(order))
+
+        index_dtype = np.int32 if len(order) < 2**31 else np.int64
+        leaf = is_leaf[order]
+        positions = np.arange(len(order))
+        new_left = np.where(leaf, positions, new_index[np.maximum(left[order], 0)])
+        new_right = np.where(leaf, positions, new_index[np.maximum(right[order], 0)])
+
+
+        threshold = round_threshold_down(threshold[order])
+        threshold[leaf] = np.inf
+        leaf_offset = np.where(leaf, leaf_rank[order], -1)
+
+
+        leaf_values = np.asarray(leaf_values, dtype=np.float64)
+        rows, cols = np.nonzero(leaf_values)
+        dist_ptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=len(leaf_values)))))
+
+        return cls(
+            feature=np.where(leaf, 0, feature[order]).astype(narrowest_int_dtype(n_features)),
+            threshold=threshold,
+            left=new_left.astype(index_dtype),
+            right=new_right.astype(index_dtype),
+            leaf_offset=leaf_offset.astype(index_dtype),
+            roots=new_index[np.asarray(roots)].astype(index_dtype),
+            dist_ptr=dist_ptr.astype(np.int64),
+            dist_class=cols.astype(np.int32),
+            dist_weight=leaf_values[rows, cols],
+            n_classes=n_classes,
+            n_features=n_features,
+            classes=classes,
+            n_jobs=n_jobs,
+        )
+
+    @classmethod
+    def concatenate(cls, forests, n_jobs=None):
+        """
+        One forest holding every tree of `forests`, in order
+
+        The forests must share n_classes and n_features, with class ids
+        referring to the same output columns; predict_proba of the result
+        is the tree-count-weighted average of theirs.
+        """
+
+        forests = list(forests)
+        n_classes, n_features = forests[0].n_classes, forests[0].n_features
+        if any(f.n_classes != n_classes or f.n_features != n_features for f in forests):
+            raise ValueError("Forests differ in n_classes or n_features")
+
+        node_base = np.cumsum([0] + [f.node_count for f in forests])
+        leaf_base = np.cumsum([0] + [len(f.dist_ptr) - 1 for f in forests])
+        entry_base = np.cumsum([0] + [len(f.dist_class) for f in forests])
+        index_dtype = np.int32 if node_base[-1] < 2**31 else np.int64
+
+        def offset(arrays, bases):
+            return np.concatenate([np.asarray(a, dtype=np.int64) + b for a, b in zip(arrays, bases)])
+
+        leaf_offset = np.concatenate([
+            np.where(np.asarray(f.leaf_offset) >= 0, np.asarray(f.leaf_offset, dtype=np.int64) + base, -1)
+            for f, base in zip(forests, leaf_base)
+        ])
+        return cls(
+            feature=np.concatenate([f.feature for f in forests]).astype(narrowest_int_dtype(n_features)),
+            threshold=np.concatenate([f.threshold for f in forests]).astype(np.float32),
+            left=offset([f.left for f in forests], node_base).astype(index_dtype),
+            right=None,
+            leaf_offset=leaf_offset.astype(index_dtype),
+            roots=offset([f.roots for f in forests], node_base).astype(index_dtype),
+            dist_ptr=np.concatenate([[0]] + [np.asarray(f.dist_ptr[1:], dtype=np.int64) + base
+                                             for f, base in zip(forests, entry_base)]),
+            dist_class=np.concatenate([f.dist_class for f in forests]).astype(np.int32),
+            dist_weight=np.concatenate([f.dist_weight for f in forests]).astype(np.float64),
+            n_classes=n_classes,
+            n_features=n_features,
+            classes=forests[0].classes_,
+            n_jobs=n_jobs,
+        )
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    @property
+    def is_leaf(self):
+        return np.asarray(self.leaf_offset) >= 0
+
+    @property
+    def right(self):
+        if self._right is None:
+            self._right = self.left + ~self.is_leaf
+        return self._right
+
+    def apply(self, X, levels_per_check=4):
+        """
+        Leaf node reached by every row in every tree
+
+        Pairs are laid out tree-major so each level walks one tree's nodes
+        at a time; finished pairs are dropped every few levels.
+
+        Args:
+            X: (n_rows, n_features) encoded matrix
+            levels_per_check: levels walked between removals of finished pairs
+
+        Returns:
+            (n_rows, n_trees) leaf node indices
+        """
+
+        X = self._check_features(X)
+        n_rows, n_features = X.shape
+        dtype = self.index_dtype
+
+        node = np.repeat(self.roots.astype(dtype), n_rows)
+        row_base = np.tile(np.arange(n_rows, dtype=dtype) * n_features, self.n_trees)
+        leaves = self._walk(X.ravel(), node, row_base, levels_per_check)
+        return leaves.reshape(self.n_trees, n_rows).T
+
+    def descend(self, X, rows, nodes, levels_per_check=4):
+        """
+        Leaf reached by X[rows[i]] when starting from nodes[i] instead of a root
+
+        Returns:
+            leaf node index per (row, start node) pair
+        """
+
+        X = self._check_features(X)
+        dtype = self.index_dtype
+        row_base = np.asarray(rows, dtype=dtype) * dtype(X.shape[1])
+        return self._walk(X.ravel(), np.asarray(nodes, dtype=dtype), row_base, levels_per_check)
+
+    def _walk(self, X_flat, node, row_base, levels_per_check):
+        """Step every (node, row offset) pair down to its leaf"""
+
+        pair = np.arange(len(node), dtype=self.index_dtype)
+        leaves = np.empty(len(node), dtype=self.index_dtype)
+
+
+        while node.size:
+            for _ in range(levels_per_check):
+                go_right = X_flat.take(row_base + self.feature.take(node)) > self.threshold.take(node)
+                node = self.left.take(node)
+                node += go_right
+
+            done = self.leaf_offset.take(node) >= 0
+            if done.any():
+                leaves[pair[done]] = node[done]
+                pending = ~done
+                node, row_base, pair = node[pending], row_base[pending], pair[pending]
+
+        return leaves
+
+    def decision_paths(self, x):
+        """
+        Nodes visited by one encoded row in every tree
+
+        Returns:
+            (depth + 1, n_trees) node indices, root first; a path that ends
+            early repeats its leaf (leaves point to themselves)
+        """
+
+        x = self._check_features(np.atleast_2d(x))[0]
+        node = self.roots.astype(self.index_dtype)
+        path = [node]
+        while (self.leaf_offset.take(node) < 0).any():
+            go_right = x.take(self.feature.take(node)) > self.threshold.take(node)
+            node = self.left.take(node) + go_right
+            path.append(node)
+        return np.stack(path)
+
+    def apply_perturbed(self, x, X, max_pairs=4_000_000):
+        """
+        apply() for rows that each differ from a base row in a few features
+
+        A tree's leaf can only change if the row flips a split on the base
+        row's path through it. Trees without a flip reuse the base leaf,
+        and the others are walked again from the first flipped split, not
+        from their root.
+
+        Args:
+            x: base encoded row
+            X: (n_rows, n_features) perturbed copies of x
+            max_pairs: upper bound on rows x path nodes compared per chunk
+
+        Returns:
+            (n_rows, n_trees) leaf node indices, equal to apply(X)
+        """
+
+        X = self._check_features(X)
+        x = self._check_features(np.atleast_2d(x))[0]
+        path = self.decision_paths(x)
+        leaves = np.tile(path[-1], (len(X), 1))
+
+        # Only splits on changed features can flip (leaves never do: infinite threshold)
+        changed = np.flatnonzero((X != x).any(axis=0))
+        level, tree = np.nonzero(np.isin(self.feature.take(path), changed) & (self.leaf_offset.take(path) < 0))
+        nodes = path[level, tree]
+        node_feature = self.feature.take(nodes)
+        node_threshold = self.threshold.take(nodes)
+        base_right = x.take(node_feature) > node_threshold
+
+        chunk = max(1, max_pairs // max(1, len(nodes)))
+        for start in range(0, len(X), chunk):
+            block = X[start:start + chunk]
+            rows, k = np.nonzero((block[:, node_feature] > node_threshold) != base_right)
+            if not len(rows):
+                continue
+            # nonzero() lists each row's splits root level first: keep the first per (row, tree)
+            _, first = np.unique(rows * self.n_trees + tree[k], return_index=True)
+            rows, k = rows[first], k[first]
+            leaves[start + rows, tree[k]] = self.descend(block, rows, nodes[k])
+        return leaves
+
+    def _check_features(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, forest expects {self.n_features}")
+        return X
+
+    def proba_from_leaves(self, leaves):
+        """Average the leaf class distributions of an (n_rows, n_trees) leaf matrix"""
+
+        n_rows, n_trees = leaves.shape
+        offsets = self.leaf_offset.take(leaves.ravel())
+        start = self.dist_ptr.take(offsets)
+        count = self.dist_ptr.take(offsets + 1) - start
+
+
+        ends = np.cumsum(count)
+        position = np.arange(ends[-1] if len(ends) else 0) + np.repeat(start - (ends - count), count)
+        pair_row = np.repeat(np.arange(len(offsets)) // n_trees, count)
+
+        bins = pair_row * self.n_classes + self.dist_class.take(position)
+        proba = np.bincount(bins, weights=self.dist_weight.take(position), minlength=n_rows * self.n_classes)
+        proba = proba.reshape(n_rows, self.n_classes)
+        proba /= n_trees
+        return proba
+
+    def predict_proba(self, X, max_pairs=4_000_000):
+        """
+        Class probabilities, matching RandomForestClassifier.predict_proba
+
+        Large batches are split into row chunks of at most max_pairs
+        (row, tree) pairs; with n_jobs the chunks run on a thread pool,
+        since NumPy releases the GIL inside take and ufunc loops.
+
+        Args:
+            X: (n_rows, n_features) encoded matrix
+            max_pairs: upper bound on rows x trees traversed per chunk
+        """
+
+        X = np.asarray(X)
+        n_jobs = self.n_jobs or 1
+        if n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
+
+        chunk = max(1, min(max_pairs // self.n_trees, -(-len(X) // n_jobs)))
+        if len(X) <= chunk:
+            return self.proba_from_leaves(self.apply(X))
+
+        proba = np.empty((len(X), self.n_classes), dtype=np.float64)
+
+        def fill(start):
+            proba[start:start + chunk] = self.proba_from_leaves(self.apply(X[start:start + chunk]))
+
+        starts = range(0, len(X), chunk)
+        if n_jobs == 1:
+            for start in starts:
+                fill(start)
+        else:
+            with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+                list(pool.map(fill, starts))
+        return proba
+
+    def predict(self, X):
+        """Most likely class label per row"""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def narrowest_int_dtype(max_value, min_value=-1):
+    """Smallest signed integer dtype holding every value in [min_value, max_value]"""
+
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= min_value and max_value <= info.max:
+            return dtype
+    raise ValueError(f"No integer dtype holds {max_value}")
+
+
+def round_threshold_down(threshold):
+    """
+    Largest float32 at or below each threshold
+
+    sklearn compares float32 inputs against float64 thresholds, so for any
+    float32 x, `x <= t` and `x <= round_threshold_down(t)` always agree.
+    """
+
+    threshold = np.asarray(threshold, dtype=np.float64)
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+
+if __name__ == "__main__":
+    import time
+    import joblib
+
+    print("="*80)
+    print("HERAPT FLAT FOREST ENGINE - SKLEARN COMPARISON")
+    print("="*80)
+
+    model = joblib.load('career_rf_model_ultra.pkl')
+    model.verbose = 0
+    preprocessor = joblib.load('career_preprocessor_ultra.pkl')
+    feature_config = joblib.load('feature_config_ultra.pkl')
+
+    import pandas as pd
+    df = pd.read_csv('career_path_ultra_enhanced.csv')
+    X_all = preprocessor.transform(df[feature_config['numeric_features'] + feature_config['categorical_features']])
+
+    start = time.perf_counter()
+    forest = FlatForest.from_sklearn(model)
+    print(f"\n Flattened {forest.n_trees} trees / {forest.node_count:,} nodes "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(42)
+    for batch_size in (1, 10_000):
+        X = X_all[rng.integers(0, len(X_all), size=batch_size)]
+        repeats = 50 if batch_size == 1 else 3
+
+        timings = {}
+        for name, engine in (('sklearn', model), ('flat', forest)):
+            engine.predict_proba(X)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                proba = engine.predict_proba(X)
+            timings[name] = (time.perf_counter() - start) / repeats
+            if name == 'sklearn':
+                reference = proba
+
+        max_diff = np.abs(proba - reference).max()
+        print(f"\n Batch size {batch_size:,}:")
+        print(f"   sklearn: {timings['sklearn'] * 1000:9.2f} ms")
+        print(f"   flat:    {timings['flat'] * 1000:9.2f} ms  ({timings['sklearn'] / timings['flat']:.1f}x)")
+        print(f"   max |Δp|: {max_diff:.2e}")
+
+    print("\n" + "="*80)
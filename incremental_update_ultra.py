@@ -0,0 +1,261 @@
+"""
+HerApt Incremental Model Update
+Grow the saved forest with trees fitted on new labelled profiles (warm_start)
+The oldest trees are evicted to keep a fixed budget; unseen careers or
+categories fall back to a full retrain with train_model_ultra.py
+
+Run:
+    python incremental_update_ultra.py new_outcomes.csv --trees 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from dataset_loader_ultra import load_dataset, read_csv_typed
+from train_model_ultra import ENGINES, next_model_version, publish_outputs, save_outputs, split_data
+import model_registry_ultra
+import train_model_ultra
+
+
+def read_labelled_rows(path):
+    """New profiles with a Career column, from CSV or JSONL"""
+
+    if path.lower().endswith(('.jsonl', '.ndjson')):
+        df = pd.read_json(path, lines=True)
+    else:
+        df = read_csv_typed(path)
+
+    if 'Career' not in df.columns:
+        raise ValueError(f"{path} has no Career column; incremental updates need labelled rows")
+    return df
+
+
+def find_novelties(df, preprocessor, label_encoder, numeric_features, categorical_features):
+    """
+    Values in new rows the saved model cannot represent
+
+    Returns:
+        dict with 'careers' (unseen career labels), 'categories'
+        ({column: unseen values}) and 'missing_columns'
+    """
+
+    known_careers = set(label_encoder.classes_)
+    careers = sorted({str(c) for c in df['Career'].dropna()} - known_careers)
+
+    missing_columns = [c for c in numeric_features + categorical_features if c not in df.columns]
+
+    categories = {}
+    category_encoder = preprocessor.named_transformers_['cat']
+    for column, known in zip(categorical_features, category_encoder.categories_):
+        if column not in df.columns:
+            continue
+        unseen = sorted({str(v) for v in df[column].dropna()} - {str(v) for v in known})
+        if unseen:
+            categories[column] = unseen
+
+    return {'careers': careers, 'categories': categories, 'missing_columns': missing_columns}
+
+
+def replay_sample(y_base, size, min_per_class=2, seed=0):
+    """
+    Row indices of base training data replayed alongside the new rows
+
+    Every class gets at least min_per_class rows, so new trees keep the full
+    set of career outputs; the rest is a uniform sample.
+    """
+
+    rng = np.random.default_rng(seed)
+    chosen = []
+    for label in np.unique(y_base):
+        rows = np.flatnonzero(y_base == label)
+        chosen.append(rng.choice(rows, size=min(min_per_class, len(rows)), replace=False))
+    chosen = np.concatenate(chosen)
+
+    remaining = max(size - len(chosen), 0)
+    if remaining:
+        others = np.setdiff1d(np.arange(len(y_base)), chosen)
+        chosen = np.concatenate([chosen, rng.choice(others, size=min(remaining, len(others)), replace=False)])
+    return np.sort(chosen)
+
+
+def grow_forest(model, X, y, n_new_trees, budget, seed):
+    """
+    Fit n_new_trees on (X, y) with warm_start, then keep the newest `budget` trees
+
+    Returns:
+        number of trees evicted
+    """
+
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_new_trees,
+                     random_state=seed)
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+
+    evicted = max(len(model.estimators_) - budget, 0)
+    if evicted:
+        model.estimators_ = model.estimators_[evicted:]
+    model.n_estimators = len(model.estimators_)
+    return evicted
+
+
+def full_retrain(data_path, new_df, engine, merged_path=None, models_dir=model_registry_ultra.MODELS_DIR):
+    """Append the new rows to the training CSV and run the full training pipeline"""
+
+    merged_path = merged_path or os.path.splitext(data_path)[0] + '_merged.csv'
+    base = pd.read_csv(data_path)
+    merged = pd.concat([base, new_df.astype(object).reindex(columns=base.columns)], ignore_index=True)
+
+    # Stratified splitting and k-fold CV need a few rows of every career
+    counts = merged['Career'].value_counts()
+    too_rare = counts[counts < train_model_ultra.CV_FOLDS]
+    if len(too_rare):
+        print(f"❌ Need at least {train_model_ultra.CV_FOLDS} labelled rows per career to retrain; "
+              f"too few for: {', '.join(f'{c} ({n})' for c, n in too_rare.items())}")
+        sys.exit(1)
+
+    merged.to_csv(merged_path, index=False)
+    print(f"   Wrote {len(merged)} rows to {merged_path}")
+
+    train_model_ultra.main(['--data', merged_path, '--engine', engine, '--models-dir', models_dir])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the saved forest with new labelled profiles")
+    parser.add_argument('new_rows', help="CSV or JSONL of profiles with a Career column")
+    parser.add_argument('--data', default='career_path_ultra_enhanced.csv',
+                        help="original training CSV (replay sample and full-retrain base)")
+    parser.add_argument('--trees', type=int, default=20, help="trees fitted on the new rows")
+    parser.add_argument('--budget', type=int, help="trees kept after the update (default: current count)")
+    parser.add_argument('--replay-size', type=int,
+                        help="base rows mixed into the update (default: 2x the new rows)")
+    parser.add_argument('--merged-data', help="where a full retrain writes base + new rows")
+    parser.add_argument('--full', action='store_true', help="skip the incremental path and retrain")
+    parser.add_argument('--models-dir', default=model_registry_ultra.MODELS_DIR,
+                        help="model registry to publish the new version to ('' to skip)")
+    args = parser.parse_args(argv)
+
+    print("="*80)
+    print("HERAPT INCREMENTAL MODEL UPDATE")
+    print("="*80)
+
+
+    print("\n[1/5] Loading current model...")
+    try:
+        model = joblib.load('career_rf_model_ultra.pkl')
+        preprocessor = joblib.load('career_preprocessor_ultra.pkl')
+        label_encoder = joblib.load('career_label_encoder_ultra.pkl')
+        feature_config = joblib.load('feature_config_ultra.pkl')
+    except FileNotFoundError:
+        print("❌ Model not found. Run train_model_ultra.py first.")
+        sys.exit(1)
+
+    if hasattr(model, 'verbose'):
+        model.verbose = 0
+    engine = feature_config.get('engine', 'rf')
+    numeric_features = feature_config['numeric_features']
+    categorical_features = feature_config['categorical_features']
+    budget = args.budget or len(getattr(model, 'estimators_', []))
+    print(f"✅ {ENGINES[engine]['name']} model version {feature_config.get('model_version', 1)}")
+
+
+    print("\n[2/5] Reading new labelled rows...")
+    new_df = read_labelled_rows(args.new_rows)
+    print(f"✅ {len(new_df)} rows, {new_df['Career'].nunique()} careers")
+
+
+    print("\n[3/5] Checking for careers and categories the model has not seen...")
+    novelties = find_novelties(new_df, preprocessor, label_encoder, numeric_features, categorical_features)
+    reasons = []
+    if args.full:
+        reasons.append("--full requested")
+    if ENGINES[engine]['features'] != 'onehot':
+        reasons.append(f"{ENGINES[engine]['name']} cannot grow by warm_start tree eviction")
+    if novelties['careers']:
+        reasons.append(f"unseen careers: {', '.join(novelties['careers'])}")
+    for column, values in novelties['categories'].items():
+        reasons.append(f"unseen {column}: {', '.join(values)}")
+    if novelties['missing_columns']:
+        print(f"   ⚠️  Missing columns filled with defaults: {', '.join(novelties['missing_columns'])}")
+
+    if reasons:
+        print("   Falling back to a full retrain:")
+        for reason in reasons:
+            print(f"      - {reason}")
+        full_retrain(args.data, new_df, engine, args.merged_data, args.models_dir)
+        return
+    print("✅ Every career and category is known; updating incrementally")
+
+
+    print("\n[4/5] Growing the forest...")
+    columns = numeric_features + categorical_features
+    new_frame = new_df.reindex(columns=columns)
+    new_frame[numeric_features] = new_frame[numeric_features].fillna(0)
+    new_frame[categorical_features] = new_frame[categorical_features].astype(object).fillna('Unknown')
+    X_new = preprocessor.transform(new_frame).astype(np.float32)
+    y_new = label_encoder.transform(new_df['Career'].astype(str))
+
+    # Replay only the training split; its test split measures the updated model
+    base_df = load_dataset(args.data)
+    y_base = label_encoder.transform(base_df['Career'].astype(str))
+    train_rows, test_rows, _, _ = split_data(np.arange(len(y_base)), y_base)
+    model_version = next_model_version(args.models_dir or model_registry_ultra.MODELS_DIR)
+    replay_size = args.replay_size or 2 * len(new_df)
+    replay = train_rows[replay_sample(y_base[train_rows], replay_size, seed=model_version)]
+    X_replay = preprocessor.transform(base_df.iloc[replay][columns]).astype(np.float32)
+    X_test = preprocessor.transform(base_df.iloc[test_rows][columns]).astype(np.float32)
+    y_test = y_base[test_rows]
+
+    X = np.concatenate([X_new, X_replay])
+    y = np.concatenate([y_new, y_base[replay]])
+    print(f"   {len(X_new)} new + {len(replay)} replayed rows covering {len(np.unique(y))} careers")
+
+    accuracy_before = float((model.predict(X_new) == y_new).mean())
+    test_before = float((model.predict(X_test) == y_test).mean())
+    start = time.perf_counter()
+    evicted = grow_forest(model, X, y, args.trees, budget, seed=model_version)
+    elapsed = time.perf_counter() - start
+    accuracy_after = float((model.predict(X_new) == y_new).mean())
+    test_after = float((model.predict(X_test) == y_test).mean())
+
+    print(f"✅ Fitted {args.trees} trees in {elapsed:.1f}s, evicted the {evicted} oldest "
+          f"({model.n_estimators} trees kept)")
+    print(f"✅ Accuracy on the new rows: {accuracy_before:.2%} → {accuracy_after:.2%}")
+    print(f"✅ Accuracy on the test split: {test_before:.2%} → {test_after:.2%}")
+
+
+    print("\n[5/5] Saving the updated model...")
+    model_version = save_outputs(
+        engine, model, preprocessor, label_encoder, numeric_features, categorical_features,
+        {'accuracy': test_after},
+        pipeline_key=f"incremental-{model_version}",
+        extra_config={
+            'update': {
+                'rows': int(len(new_df)),
+                'replayed': int(len(replay)),
+                'trees_added': args.trees,
+                'trees_evicted': int(evicted),
+                'new_rows_accuracy': accuracy_after,
+                'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+        },
+        models_dir=args.models_dir or model_registry_ultra.MODELS_DIR,
+    )
+    if args.models_dir:
+        published = publish_outputs(engine, args.models_dir)
+        if published:
+            print(f"    {published}/ published and made CURRENT (running services pick it up on reload)")
+
+    print("\n" + "="*80)
+    print(f" MODEL VERSION {model_version} READY")
+    print("="*80)
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+HerApt Multi-Process Inference Pool
+Batches spread across cores, results returned in input order
+The model artifact is memory-mapped once before forking, so every
+worker reads the same page-cache pages instead of its own copy
+"""
+
+import multiprocessing as mp
+import os
+from collections import deque
+
+from career_predictor_ultra import UltraCareerPredictor
+
+
+_worker_predictor = None
+
+
+def _load_predictor(artifact_path):
+    predictor = UltraCareerPredictor(artifact_path=artifact_path)
+    predictor.forest.n_jobs = 1
+    return predictor
+
+
+def _init_worker(artifact_path):
+    """Open the artifact in workers that were not forked from a loaded parent"""
+    global _worker_predictor
+    if _worker_predictor is None:
+        _worker_predictor = _load_predictor(artifact_path)
+
+
+def _score_chunk(args):
+    profiles, top_n = args
+    return _worker_predictor.predict_batch(profiles, top_n=top_n)
+
+
+class InferencePool:
+    """Process pool of predictors sharing one memory-mapped model"""
+
+    def __init__(self, artifact_path='career_model_ultra.bin', processes=None, chunk_size=256):
+        """
+        Args:
+            artifact_path: model artifact written by train_model_ultra.py
+            processes: worker count (default: all cores)
+            chunk_size: profiles sent to a worker per task
+        """
+        global _worker_predictor
+
+        if not os.path.exists(artifact_path):
+            raise FileNotFoundError(f"{artifact_path} not found. Run train_model_ultra.py first.")
+
+        self.artifact_path = artifact_path
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+
+        if 'fork' in mp.get_all_start_methods():
+            _worker_predictor = _load_predictor(artifact_path)
+            context = mp.get_context('fork')
+        else:
+            context = mp.get_context('spawn')
+
+        self.pool = context.Pool(self.processes, initializer=_init_worker, initargs=(artifact_path,))
+
+    def _chunks(self, profiles, top_n):
+        chunk = []
+        for profile in profiles:
+            chunk.append(profile)
+            if len(chunk) == self.chunk_size:
+                yield chunk, top_n
+                chunk = []
+        if chunk:
+            yield chunk, top_n
+
+    def predict_batch(self, profiles, top_n=5):
+        """Score profiles across workers; one result list per profile, in input order"""
+
+        if hasattr(profiles, 'to_dict'):
+            profiles = profiles.to_dict('records')
+
+        results = []
+        for chunk_results in self.pool.imap(_score_chunk, self._chunks(profiles, top_n)):
+            results.extend(chunk_results)
+        return results
+
+    def imap_chunks(self, chunks, top_n=5, max_pending=None):
+        """
+        Score an iterable of profile lists lazily, yielding each chunk's results in order
+
+        At most max_pending chunks (default: two per worker) are read ahead of
+        the consumer, so a long input stream is never buffered in full.
+        """
+        max_pending = max_pending or 2 * self.processes
+        pending = deque()
+        for chunk in chunks:
+            pending.append(self.pool.apply_async(_score_chunk, ((chunk, top_n),)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def worker_pids(self):
+        return [p.pid for p in self.pool._pool]
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def memory_usage_kb(pid):
+    """RSS and PSS (shared pages split between sharers) of a process, from /proc"""
+
+    usage = {}
+    for source in (f'/proc/{pid}/smaps_rollup', f'/proc/{pid}/status'):
+        try:
+            with open(source) as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if key in ('Rss', 'Pss', 'VmRSS'):
+                        usage[key.replace('VmRSS', 'Rss').lower()] = int(value.split()[0])
+        except OSError:
+            continue
+    return usage
+
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Score the dataset with a process pool")
+    parser.add_argument('--artifact', default='career_model_ultra.bin')
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--rows', type=int, default=20_000)
+    args = parser.parse_args()
+
+    print("="*80)
+    print("HERAPT INFERENCE POOL")
+    print("="*80)
+
+    df = pd.read_csv('career_path_ultra_enhanced.csv')
+    profiles = df.sample(args.rows, replace=True, random_state=42).to_dict('records')
+
+    print(f"\n {'Workers':>7} {'Rows/s':>10} {'Total RSS':>11} {'Total PSS':>11}")
+    for processes in args.processes:
+        with InferencePool(args.artifact, processes=processes) as pool:
+            pool.predict_batch(profiles[:processes * pool.chunk_size])
+            start = time.perf_counter()
+            pool.predict_batch(profiles)
+            elapsed = time.perf_counter() - start
+
+            pids = [os.getpid()] + pool.worker_pids()
+            usage = [memory_usage_kb(pid) for pid in pids]
+            rss = sum(u.get('rss', 0) for u in usage) / 1024
+            pss = sum(u.get('pss', 0) for u in usage) / 1024
+            print(f" {processes:>7} {len(profiles) / elapsed:>10,.0f} {rss:>9.0f}MB {pss:>9.0f}MB")
+
+    print("\n" + "="*80)
@@ -0,0 +1,234 @@
+"""
+Compact Model Artifact for HerApt
+Forest + feature encoder + career labels in one versioned binary file
+Opened with np.memmap so worker processes share the same page-cache pages
+
+Layout:
+    magic (8 bytes) | format version (uint32) | header length (uint32)
+    JSON header (array table + metadata)
+    64-byte aligned raw arrays
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from feature_encoder_ultra import CompiledFeatureEncoder
+from forest_engine_ultra import FlatForest, narrowest_int_dtype
+
+
+MAGIC = b'HERAPT\x00\x01'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+PREAMBLE = struct.Struct('<8sII')
+
+# Optional internal-node class distributions (CSR) for attributions
+NODE_VALUE_ARRAYS = ('node_ptr', 'node_class', 'node_weight')
+
+
+class ModelArtifact:
+    """A loaded artifact: flat forest, compiled encoder, career labels and optional node values"""
+
+    def __init__(self, forest, encoder, classes, metadata, path=None, node_values=None):
+        self.forest = forest
+        self.encoder = encoder
+        self.classes = classes
+        self.metadata = metadata
+        self.path = path
+        self.node_values = node_values
+
+    @property
+    def feature_config(self):
+        return {
+            'numeric_features': list(self.encoder.numeric_features),
+            'categorical_features': list(self.encoder.categorical_features),
+            **{key: self.metadata[key] for key in ('engine', 'model_version') if key in self.metadata},
+        }
+
+
+def compact_leaf_table(forest):
+    """
+    Deduplicate identical leaf class distributions
+
+    With min_samples_leaf=1 most leaves are pure, so hundreds of thousands
+    of leaves collapse into a table of a few thousand distinct rows.
+
+    Returns:
+        (leaf_offset, dist_ptr, dist_class, dist_weight) over unique distributions
+    """
+
+    dist_ptr = np.asarray(forest.dist_ptr)
+    dist_class = np.asarray(forest.dist_class)
+    dist_weight = np.asarray(forest.dist_weight)
+
+    unique_index = {}
+    remap = np.empty(len(dist_ptr) - 1, dtype=np.int64)
+    new_ptr, new_class, new_weight = [0], [], []
+
+    for leaf in range(len(remap)):
+        start, end = dist_ptr[leaf], dist_ptr[leaf + 1]
+        key = dist_class[start:end].tobytes() + dist_weight[start:end].tobytes()
+        index = unique_index.get(key)
+        if index is None:
+            index = unique_index[key] = len(unique_index)
+            new_class.append(dist_class[start:end])
+            new_weight.append(dist_weight[start:end])
+            new_ptr.append(new_ptr[-1] + end - start)
+        remap[leaf] = index
+
+    leaf_offset = np.asarray(forest.leaf_offset)
+    leaf_offset = np.where(leaf_offset >= 0, remap[np.maximum(leaf_offset, 0)], -1)
+
+    return (
+        leaf_offset,
+        np.asarray(new_ptr),
+        np.concatenate(new_class) if new_class else np.empty(0, dtype=np.int64),
+        np.concatenate(new_weight) if new_weight else np.empty(0, dtype=np.float64),
+    )
+
+
+def export_artifact(path, forest, encoder, classes, metadata=None, node_values=None):
+    """
+    Write a forest, encoder and class labels to a single artifact file
+
+    Args:
+        path: output file path
+        forest: FlatForest
+        encoder: CompiledFeatureEncoder
+        classes: career name per forest output column
+        metadata: optional JSON-serialisable dict stored in the header
+        node_values: optional forest_attribution_ultra.node_value_table()
+            output, stored so the artifact can explain its predictions
+
+    Returns:
+        Size of the written file in bytes
+    """
+
+    leaf_offset, dist_ptr, dist_class, dist_weight = compact_leaf_table(forest)
+    node_count = forest.node_count
+
+    arrays = {
+        'feature': np.asarray(forest.feature).astype(narrowest_int_dtype(encoder.n_features_out)),
+        'threshold': np.asarray(forest.threshold, dtype=np.float32),
+        'left': np.asarray(forest.left).astype(narrowest_int_dtype(node_count)),
+        'leaf_offset': leaf_offset.astype(narrowest_int_dtype(len(dist_ptr))),
+        'roots': np.asarray(forest.roots).astype(narrowest_int_dtype(node_count)),
+        'dist_ptr': dist_ptr.astype(narrowest_int_dtype(dist_ptr[-1])),
+        'dist_class': dist_class.astype(narrowest_int_dtype(forest.n_classes)),
+        'dist_weight': dist_weight.astype(np.float64),
+        'scaler_mean': np.asarray(encoder.mean, dtype=np.float64),
+        'scaler_scale': np.asarray(encoder.scale, dtype=np.float64),
+    }
+    if node_values is not None:
+        arrays.update(zip(NODE_VALUE_ARRAYS, node_values))
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'n_trees': forest.n_trees,
+        'n_nodes': node_count,
+        'n_classes': forest.n_classes,
+        'n_features': forest.n_features,
+        'classes': [str(c) for c in classes],
+        'numeric_features': list(encoder.numeric_features),
+        'categorical_features': list(encoder.categorical_features),
+        'categories': [[str(c) for c in cats] for cats in encoder.categories],
+        'handle_unknown': encoder.handle_unknown,
+        'metadata': metadata or {},
+        'arrays': {},
+    }
+
+
+    def aligned(offset):
+        return -(-offset // ALIGNMENT) * ALIGNMENT
+
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+        }
+        offset = aligned(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = aligned(PREAMBLE.size + len(header_bytes))
+
+
+    with open(path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+        return f.tell()
+
+
+def read_header(path):
+    """Read and check the artifact preamble and JSON header"""
+
+    with open(path, 'rb') as f:
+        magic, version, header_len = PREAMBLE.unpack(f.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a HerApt model artifact")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        header = json.loads(f.read(header_len).decode('utf-8'))
+
+    data_start = -(-(PREAMBLE.size + header_len) // ALIGNMENT) * ALIGNMENT
+    return header, data_start
+
+
+def load_artifact(path, mmap=True):
+    """
+    Open an artifact written by export_artifact
+
+    With mmap=True every array is a read-only view of one np.memmap, so
+    opening costs the same for any model size and processes that open the
+    same file share its page-cache pages.
+
+    Returns:
+        ModelArtifact
+    """
+
+    header, data_start = read_header(path)
+
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        buffer = np.fromfile(path, dtype=np.uint8)
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        start = data_start + spec['offset']
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+
+    forest = FlatForest(
+        feature=arrays['feature'],
+        threshold=arrays['threshold'],
+        left=arrays['left'],
+        right=None,
+        leaf_offset=arrays['leaf_offset'],
+        roots=arrays['roots'],
+        dist_ptr=arrays['dist_ptr'],
+        dist_class=arrays['dist_class'],
+        dist_weight=arrays['dist_weight'],
+        n_classes=header['n_classes'],
+        n_features=header['n_features'],
+        n_jobs=-1,
+    )
+    encoder = CompiledFeatureEncoder(
+        header['numeric_features'], header['categorical_features'],
+        arrays['scaler_mean'], arrays['scaler_scale'], header['categories'],
+        handle_unknown=header['handle_unknown'],
+    )
+
+    node_values = None
+    if all(name in arrays for name in NODE_VALUE_ARRAYS):
+        node_values = tuple(arrays[name] for name in NODE_VALUE_ARRAYS)
+
+    return ModelArtifact(forest, encoder, np.asarray(header['classes'], dtype=object),
+                         header['metadata'], path=path, node_values=node_values)
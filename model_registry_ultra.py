@@ -0,0 +1,389 @@
+"""
+Model Registry for HerApt
+Trained models are published to versioned directories (models/v0001, models/v0002, ...)
+and a CURRENT pointer names the one to serve; HotSwapPredictor loads, validates and
+warms a new version off the request path, then swaps it in between batches
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import numpy as np
+
+from career_predictor_ultra import SAMPLE_PROFILE, UltraCareerPredictor
+from profile_record_ultra import FORM_RANGES
+
+
+MODELS_DIR = 'models'
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+ARTIFACT_FILE = 'career_model_ultra.bin'
+
+# Published versions kept on disk (CURRENT is never pruned)
+KEEP_VERSIONS = 5
+
+# Probe batches run on a candidate before it takes traffic
+WARM_ROUNDS = 3
+
+
+class ModelValidationError(Exception):
+    """Raised when a candidate model fails to load, validate or warm up"""
+
+
+def version_name(version):
+    return f'v{int(version):04d}'
+
+
+def version_dir(version, models_dir=MODELS_DIR):
+    return os.path.join(models_dir, version_name(version))
+
+
+def list_versions(models_dir=MODELS_DIR):
+    """Published version numbers, oldest first"""
+
+    try:
+        names = os.listdir(models_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        int(name[1:]) for name in names
+        if name.startswith('v') and name[1:].isdigit() and os.path.isdir(os.path.join(models_dir, name))
+    )
+
+
+def current_version(models_dir=MODELS_DIR):
+    """Version named by the CURRENT pointer, or None before the first publish"""
+
+    try:
+        with open(os.path.join(models_dir, CURRENT_FILE)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    if not (name.startswith('v') and name[1:].isdigit()):
+        raise ValueError(f"{models_dir}/{CURRENT_FILE} does not name a version: {name!r}")
+    return int(name[1:])
+
+
+def activate(version, models_dir=MODELS_DIR):
+    """
+    Point CURRENT at a published version
+
+    The pointer is written to a temporary file and renamed over the old one,
+    so a reader sees either the previous version or the new one, never a
+    partial write.
+    """
+
+    if not os.path.isdir(version_dir(version, models_dir)):
+        raise FileNotFoundError(f"{version_dir(version, models_dir)} is not a published model")
+
+    pointer = os.path.join(models_dir, CURRENT_FILE)
+    staging = f'{pointer}.{os.getpid()}.tmp'
+    with open(staging, 'w') as f:
+        f.write(version_name(version) + '\n')
+    os.replace(staging, pointer)
+
+
+def publish(files, version, models_dir=MODELS_DIR, metadata=None, make_current=True, keep=KEEP_VERSIONS):
+    """
+    Copy a trained model's files into a new version directory
+
+    Files are copied rather than linked: the trainer rewrites its outputs in
+    place, which must not change a version a service has memory-mapped. The
+    directory is assembled under a temporary name and renamed into place.
+
+    Args:
+        files: paths to copy (the artifact, or the pickles for engines without one)
+        version: version number; models/v{version:04d} must not exist yet
+        metadata: JSON-serialisable dict stored in the version's manifest.json
+        make_current: point CURRENT at the new version
+        keep: published versions to keep (older ones are deleted; 0 keeps all)
+
+    Returns:
+        Path of the version directory
+    """
+
+    path = version_dir(version, models_dir)
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+
+    os.makedirs(models_dir, exist_ok=True)
+    staging = os.path.join(models_dir, f'.{version_name(version)}.tmp')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for file in files:
+        shutil.copy2(file, staging)
+    with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+        json.dump({
+            'version': int(version),
+            'files': [os.path.basename(file) for file in files],
+            'published_at': time.time(),
+            'metadata': metadata or {},
+        }, f, indent=2)
+    os.rename(staging, path)
+
+    if make_current:
+        activate(version, models_dir)
+    if keep:
+        prune(models_dir, keep)
+    return path
+
+
+def prune(models_dir=MODELS_DIR, keep=KEEP_VERSIONS):
+    """Delete the oldest published versions beyond `keep`, never the CURRENT one"""
+
+    current = current_version(models_dir)
+    for version in list_versions(models_dir)[:-keep]:
+        if version != current:
+            shutil.rmtree(version_dir(version, models_dir))
+
+
+def load_version(path, **predictor_kwargs):
+    """
+    UltraCareerPredictor for a version directory: its artifact when present,
+    else its pickles; model_version is the directory's published version
+    """
+
+    artifact = os.path.join(path, ARTIFACT_FILE)
+    if os.path.exists(artifact):
+        predictor = UltraCareerPredictor(artifact_path=artifact, **predictor_kwargs)
+    else:
+        predictor = UltraCareerPredictor(model_dir=path, **predictor_kwargs)
+
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        predictor.model_version = json.load(f)['version']
+    return predictor
+
+
+def probe_profiles():
+    """The sample profile plus copies with every form field at its lowest and highest value"""
+
+    low, high = dict(SAMPLE_PROFILE), dict(SAMPLE_PROFILE)
+    for field, (lowest, highest) in FORM_RANGES.items():
+        low[field], high[field] = lowest, highest
+    return [dict(SAMPLE_PROFILE), low, high]
+
+
+def validate(predictor, probes, top_n=5, features=None):
+    """
+    Check a freshly loaded predictor before it serves traffic
+
+    Args:
+        predictor: candidate UltraCareerPredictor
+        probes: profiles to score
+        top_n: recommendations requested per probe
+        features: (numeric, categorical) feature lists the candidate must
+            accept, i.e. the serving model's (None skips the check)
+
+    Raises:
+        ModelValidationError: describing the first failed check
+    """
+
+    n_classes = len(predictor.career_classes)
+    if n_classes == 0:
+        raise ModelValidationError("model has no careers")
+    if features is not None and (list(predictor.numeric_features), list(predictor.categorical_features)) \
+            != (list(features[0]), list(features[1])):
+        raise ModelValidationError("input features differ from the serving model")
+
+    probabilities, success = predictor.score_matrix([dict(p) for p in probes])
+    if probabilities.shape != (len(probes), n_classes):
+        raise ModelValidationError(f"probabilities have shape {probabilities.shape}, "
+                                   f"expected {(len(probes), n_classes)}")
+    if not (np.isfinite(probabilities).all() and np.isfinite(success).all()):
+        raise ModelValidationError("non-finite scores")
+    if not np.allclose(probabilities.sum(axis=1), 1, atol=1e-3):
+        raise ModelValidationError("class probabilities do not sum to 1")
+
+    results = predictor.predict_batch([dict(p) for p in probes], top_n)
+    if len(results) != len(probes) or any(len(r) != min(top_n, n_classes) for r in results):
+        raise ModelValidationError("predict_batch returned the wrong number of recommendations")
+
+
+def warm(predictor, probes, rounds=WARM_ROUNDS):
+    """Fault in a memory-mapped model's pages and run the probe batch a few times"""
+
+    arrays = list(vars(predictor.forest).values()) if predictor.forest is not None else []
+    arrays += list(predictor.node_values or ())
+    for array in arrays:
+        if isinstance(array, np.memmap):
+            np.asarray(array).view(np.uint8).sum()
+
+    for _ in range(rounds):
+        predictor.predict_batch([dict(p) for p in probes], 5)
+
+
+class HotSwapPredictor:
+    """The serving predictor, replaceable by a new model version while requests are in flight"""
+
+    def __init__(self, predictor, models_dir=MODELS_DIR, path=None, probes=None, predictor_kwargs=None):
+        """
+        Args:
+            predictor: UltraCareerPredictor serving until the first reload
+            models_dir: registry to reload versions from
+            path: version directory `predictor` was loaded from (None when
+                it came from elsewhere, e.g. HERAPT_ARTIFACT)
+            probes: profiles used to validate and warm candidates
+                (default: probe_profiles())
+            predictor_kwargs: UltraCareerPredictor options for candidates
+                (cache size, metrics, ...)
+        """
+        self.predictor = predictor
+        self.models_dir = models_dir
+        self.path = path
+        self.probes = probes if probes is not None else probe_profiles()
+        self.predictor_kwargs = predictor_kwargs or {}
+        self.rejected = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.watcher = None
+        self.status = {
+            'reloads': 0, 'failures': 0, 'rollbacks': 0,
+            'loading': None, 'last_error': None, 'loaded_at': time.time(),
+        }
+
+    @classmethod
+    def from_registry(cls, models_dir=MODELS_DIR, **predictor_kwargs):
+        """Serve the version CURRENT names"""
+
+        version = current_version(models_dir)
+        if version is None:
+            raise FileNotFoundError(f"{models_dir}/{CURRENT_FILE} not found; run train_model_ultra.py first")
+        path = version_dir(version, models_dir)
+        return cls(load_version(path, **predictor_kwargs), models_dir=models_dir, path=path,
+                   predictor_kwargs=predictor_kwargs)
+
+    @property
+    def model_version(self):
+        return self.predictor.model_version
+
+    def predict_batch(self, profiles, top_n=5):
+        """
+        Score a batch with whichever model is serving when it starts
+
+        Returns:
+            (predictor, results): the predictor that scored every profile in
+            the batch (a swap mid-batch does not affect it) and its results
+        """
+        predictor = self.predictor
+        return predictor, predictor.predict_batch(profiles, top_n)
+
+    def reload(self, version=None):
+        """
+        Load, validate and warm a published version, then swap it in
+
+        The serving predictor keeps answering throughout; the swap is one
+        reference assignment, so batches already running finish on the old
+        model and the next batch uses the new one. A candidate that fails is
+        discarded and, when it came from the CURRENT pointer, CURRENT is
+        pointed back at the serving version so other workers skip it too.
+
+        Args:
+            version: version number to load (default: the one CURRENT names)
+
+        Returns:
+            True when a new model was swapped in, False when `version` is
+            already serving (or CURRENT names a version rejected before)
+
+        Raises:
+            ModelValidationError: the candidate failed; nothing was swapped
+        """
+
+        with self.lock:
+            from_pointer = version is None
+            if from_pointer:
+                version = current_version(self.models_dir)
+                if version is None:
+                    raise ModelValidationError(f"{self.models_dir}/{CURRENT_FILE} not found")
+            path = version_dir(version, self.models_dir)
+            if path == self.path or (from_pointer and path in self.rejected):
+                return False
+
+            self.status['loading'] = version_name(version)
+            try:
+                serving = self.predictor
+                candidate = load_version(path, **self.predictor_kwargs)
+                validate(candidate, self.probes,
+                         features=(serving.numeric_features, serving.categorical_features))
+                warm(candidate, self.probes)
+            except Exception as e:
+                self.status['failures'] += 1
+                self.status['last_error'] = f"{version_name(version)}: {e}"
+                self.rejected.add(path)
+                if from_pointer and self.path is not None and current_version(self.models_dir) == version:
+                    activate(int(os.path.basename(self.path)[1:]), self.models_dir)
+                    self.status['rollbacks'] += 1
+                if isinstance(e, ModelValidationError):
+                    raise
+                raise ModelValidationError(f"{version_name(version)} failed to load: {e}") from e
+            finally:
+                self.status['loading'] = None
+
+            self.predictor = candidate
+            self.path = path
+            self.rejected.discard(path)
+            self.status['reloads'] += 1
+            self.status['loaded_at'] = time.time()
+            return True
+
+    def watch(self, interval):
+        """Reload in a background thread whenever CURRENT moves (polled every `interval` seconds)"""
+
+        def poll():
+            while not self.stopped.wait(interval):
+                try:
+                    if self.reload():
+                        print(f" Now serving model version {self.model_version} ({self.path})")
+                except Exception as e:
+                    print(f"  Model reload failed, still serving version {self.model_version}: {e}")
+
+        self.watcher = threading.Thread(target=poll, name='herapt-reload', daemon=True)
+        self.watcher.start()
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self.stopped.set()
+        if self.watcher is not None:
+            self.watcher.join()
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List published HerApt models or change the one served")
+    parser.add_argument('command', choices=['list', 'activate', 'validate'])
+    parser.add_argument('version', nargs='?', type=int, help="version number (activate / validate)")
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    args = parser.parse_args()
+
+    print("="*80)
+    print("HERAPT MODEL REGISTRY")
+    print("="*80)
+
+    if args.command == 'list':
+        current = current_version(args.models_dir)
+        for version in list_versions(args.models_dir):
+            with open(os.path.join(version_dir(version, args.models_dir), MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+            published = time.strftime('%Y-%m-%d %H:%M', time.localtime(manifest['published_at']))
+            accuracy = manifest['metadata'].get('accuracy')
+            print(f" {'*' if version == current else ' '} {version_name(version)}  {published}  "
+                  f"{manifest['metadata'].get('engine', '?'):<4} "
+                  f"{f'{accuracy:.2%}' if accuracy is not None else '-':>7}  {', '.join(manifest['files'])}")
+    elif args.version is None:
+        parser.error(f"{args.command} needs a version")
+    else:
+        try:
+            validate(load_version(version_dir(args.version, args.models_dir)), probe_profiles())
+        except Exception as e:
+            print(f"\n {version_name(args.version)} failed validation: {e}")
+            sys.exit(1)
+        print(f"\n {version_name(args.version)} passed validation")
+        if args.command == 'activate':
+            activate(args.version, args.models_dir)
+            print(f" CURRENT -> {version_name(args.version)}; services with HERAPT_RELOAD_INTERVAL "
+                  f"set pick it up, others on POST /reload")
+
+    print("\n" + "="*80)
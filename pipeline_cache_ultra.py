@@ -0,0 +1,105 @@
+"""
+HerApt Training Stage Cache
+Content-addressed cache for train_model_ultra.py stages
+Each stage output is stored under a hash of its inputs, so unchanged stages are loaded instead of recomputed
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import joblib
+
+
+CACHE_VERSION = 1
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 of a file's contents"""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stage_key(stage, *inputs):
+    """
+    Hash a stage name and its inputs into a cache key
+
+    Inputs must be JSON-serializable (feature lists, hyperparameters, upstream
+    stage keys, file digests); dict keys are sorted so ordering never matters.
+    """
+
+    payload = json.dumps([CACHE_VERSION, stage, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class StageCache:
+    """Directory of joblib files, one per (stage, input hash)"""
+
+    def __init__(self, cache_dir='.herapt_cache', enabled=True):
+        """
+        Args:
+            cache_dir: where stage outputs are stored
+            enabled: False recomputes every stage and stores nothing
+        """
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.hits = []
+        self.misses = []
+
+    def path(self, stage, key):
+        return os.path.join(self.cache_dir, f"{stage}-{key[:24]}.joblib")
+
+    def run(self, stage, inputs, compute, mmap_mode=None):
+        """
+        Output of a stage, loaded from the cache when its inputs are unchanged
+
+        Args:
+            stage: stage name, also used in the file name
+            inputs: list of JSON-serializable inputs the output depends on
+            compute: zero-argument callable producing the output on a miss
+            mmap_mode: passed to joblib.load so large arrays are memory-mapped
+
+        Returns:
+            (output, key): key identifies this output for downstream stages
+        """
+
+        key = stage_key(stage, *inputs)
+        if not self.enabled:
+            self.misses.append(stage)
+            return compute(), key
+
+        path = self.path(stage, key)
+        if os.path.exists(path):
+            try:
+                output = joblib.load(path, mmap_mode=mmap_mode)
+                self.hits.append(stage)
+                return output, key
+            except Exception as e:
+                print(f"   ⚠️  Ignoring unreadable cache entry {path}: {e}")
+
+        output = compute()
+        self.misses.append(stage)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(output, temp_path)
+        os.replace(temp_path, path)
+        return output, key
+
+    def clear(self):
+        """Delete every cached stage output (and anything else stored in cache_dir)"""
+
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def summary(self):
+        """One-line hit/miss report"""
+
+        if not self.enabled:
+            return "cache disabled"
+        return f"{len(self.hits)} stage(s) reused ({', '.join(self.hits) or '-'}), " \
+               f"{len(self.misses)} computed ({', '.join(self.misses) or '-'})"
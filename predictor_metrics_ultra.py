@@ -0,0 +1,264 @@
+"""
+Predictor Metrics for HerApt
+Per-stage latency histograms, batch sizes, default-filled fields and error counts
+Exported as a dict snapshot or Prometheus text; NULL_METRICS turns it all into no-ops
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+
+# Seconds; spans a cached lookup (~µs) to a cold sklearn batch (~s)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+COUNTERS = {
+    'profiles': "Profiles passed to predict_batch",
+    'missing_fields': "Profile fields filled with their default value",
+    'errors': "Exceptions raised inside a predictor stage",
+    'failed_predictions': "predict() calls that returned no recommendations",
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus 'le' semantics: value <= bound)"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def cumulative(self):
+        """[(upper bound, observations <= bound)], ending with +Inf"""
+
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket"""
+
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.buckets[-1]
+
+
+class _StageTimer:
+    """Context manager timing one stage; an exception is counted once, by the innermost stage"""
+
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe_stage(self.name, time.perf_counter() - self.start)
+        if exc_value is not None and getattr(self.metrics._local, 'last_error', None) is not exc_value:
+            self.metrics._local.last_error = exc_value
+            self.metrics.count('errors', stage=self.name, error=exc_type.__name__)
+        return False
+
+
+class PredictorMetrics:
+    """Thread-safe stage timings and counters for UltraCareerPredictor"""
+
+    enabled = True
+
+    def __init__(self, namespace='herapt', latency_buckets=LATENCY_BUCKETS, batch_buckets=BATCH_BUCKETS):
+        """
+        Args:
+            namespace: prefix of every exported metric name
+            latency_buckets: stage latency histogram bounds in seconds
+            batch_buckets: batch size histogram bounds in profiles
+        """
+        self.namespace = namespace
+        self.latency_buckets = tuple(latency_buckets)
+        self.batch_buckets = tuple(batch_buckets)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.batch_size = Histogram(self.batch_buckets)
+            self.counters = {}
+
+    def stage(self, name):
+        """Context manager recording the wall time of a stage (and any exception it raises)"""
+        return _StageTimer(self, name)
+
+    def observe_stage(self, name, seconds):
+        with self._lock:
+            histogram = self.stages.get(name)
+            if histogram is None:
+                histogram = self.stages[name] = Histogram(self.latency_buckets)
+            histogram.observe(seconds)
+
+    def observe_batch(self, size):
+        with self._lock:
+            self.batch_size.observe(size)
+            key = ('profiles', ())
+            self.counters[key] = self.counters.get(key, 0) + size
+
+    def count(self, name, amount=1, **labels):
+        """Add amount to a counter; labels split it into series (e.g. field='GPA')"""
+
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def record_missing(self, missing):
+        """Count default-filled fields from a {field: occurrences} mapping"""
+
+        for field, amount in missing.items():
+            if amount:
+                self.count('missing_fields', int(amount), field=field)
+
+    def snapshot(self):
+        """
+        Current values as plain Python data
+
+        Returns:
+            dict with 'stages' ({stage: count, total seconds, mean, max and
+            p50/p95/p99 bucket estimates in ms}), 'batch_size' and 'counters'
+            ({name: total or {label string: value}})
+        """
+
+        with self._lock:
+            stages = {
+                name: {
+                    'count': h.count,
+                    'total_s': h.sum,
+                    'mean_ms': h.sum / h.count * 1000 if h.count else 0.0,
+                    'p50_ms': h.quantile(0.50) * 1000,
+                    'p95_ms': h.quantile(0.95) * 1000,
+                    'p99_ms': h.quantile(0.99) * 1000,
+                    'max_ms': h.max * 1000,
+                }
+                for name, h in self.stages.items()
+            }
+            batch = self.batch_size
+            batch_size = {
+                'count': batch.count,
+                'mean': batch.sum / batch.count if batch.count else 0.0,
+                'max': batch.max,
+            }
+
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                if labels:
+                    series = counters.setdefault(name, {})
+                    series[','.join(f"{k}={v}" for k, v in labels)] = value
+                else:
+                    counters[name] = value
+
+        return {'stages': stages, 'batch_size': batch_size, 'counters': counters}
+
+    def prometheus_text(self):
+        """Snapshot in the Prometheus text exposition format (version 0.0.4)"""
+
+        ns = self.namespace
+        lines = []
+        with self._lock:
+            lines += [f"# HELP {ns}_stage_seconds Wall time of each predictor stage",
+                      f"# TYPE {ns}_stage_seconds histogram"]
+            for name, histogram in sorted(self.stages.items()):
+                lines += _histogram_lines(f"{ns}_stage_seconds", histogram, {'stage': name})
+
+            lines += [f"# HELP {ns}_batch_size Profiles per predict_batch call",
+                      f"# TYPE {ns}_batch_size histogram"]
+            lines += _histogram_lines(f"{ns}_batch_size", self.batch_size, {})
+
+            for name, description in COUNTERS.items():
+                lines += [f"# HELP {ns}_{name}_total {description}",
+                          f"# TYPE {ns}_{name}_total counter"]
+                series = [(labels, v) for (n, labels), v in sorted(self.counters.items()) if n == name]
+                for labels, value in series or [((), 0)]:
+                    lines.append(f"{ns}_{name}_total{_labels(dict(labels))} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+
+class NullMetrics:
+    """Disabled metrics: same interface, nothing recorded"""
+
+    enabled = False
+    _stage = nullcontext()
+
+    def stage(self, name):
+        return self._stage
+
+    def observe_stage(self, name, seconds):
+        pass
+
+    def observe_batch(self, size):
+        pass
+
+    def count(self, name, amount=1, **labels):
+        pass
+
+    def record_missing(self, missing):
+        pass
+
+    def reset(self):
+        pass
+
+    def snapshot(self):
+        return {'stages': {}, 'batch_size': {}, 'counters': {}}
+
+    def prometheus_text(self):
+        return ''
+
+
+NULL_METRICS = NullMetrics()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def _histogram_lines(name, histogram, labels):
+    lines = [
+        f"{name}_bucket{_labels({**labels, 'le': _format_bound(bound)})} {count}"
+        for bound, count in histogram.cumulative()
+    ]
+    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
@@ -0,0 +1,370 @@
+"""
+HerApt Profile Records
+Fixed-schema profiles: numeric fields in one float array, categoricals as int8 codes
+ProfileRecord holds one profile, ProfileBatch holds many as two columnar arrays
+"""
+
+import numpy as np
+
+
+# Numeric fields that keep their fractional part (dataset_loader_ultra.FLOAT_COLUMNS);
+# every other numeric field reads back as an int, like a row of the training CSV
+FRACTIONAL_FIELDS = ('GPA', 'Salary_Expectation_Lakh')
+
+UNKNOWN = 'Unknown'
+
+# career_assessment_form.py option labels → values the model was trained on
+FORM_LABELS = {
+    'Academic_Stream': {
+        'Science (PCM/PCB)': 'Science',
+        'Arts/Humanities': 'Arts',
+    },
+    'Education_Level': {
+        'High School (10th/12th)': 'High School',
+        'Bachelors Degree': 'Bachelors',
+        'Masters Degree': 'Masters',
+        'PhD/Doctorate': 'PhD',
+    },
+    'Location_Preference': {
+        'Metro Cities (Tier 1)': 'Tier1_City',
+        'Big Cities (Tier 2)': 'Tier2_City',
+        'Smaller Cities (Tier 3)': 'Tier3_City',
+        'Any Location': 'Any',
+    },
+    'Industry_Preference': {
+        'Technology': 'Tech',
+        'No Preference': 'Other',
+    },
+    'Career_Break': {'No': 0, 'Yes': 1},
+    'Willing_To_Relocate': {'No': 0, 'Yes': 1},
+    'Prefer_Corporate': {
+        'Startup (Dynamic, Fast-paced)': 0,
+        'Corporate (Structured, Stable)': 1,
+    },
+}
+
+# career_assessment_form.py answer ranges: numeric questions, then the 1-5 rating scales
+FORM_RANGES = {
+    'GPA': (0, 4.0),
+    'Work_Experience_Years': (0, 30),
+    'Internships': (0, 10),
+    'Projects': (0, 20),
+    'Industry_Certifications': (0, 20),
+    'Extracurricular_Activities': (0, 20),
+    'Career_Break_Months': (1, 120),
+    'Salary_Expectation_Lakh': (1, 100),
+    **{field: (1, 5) for field in (
+        'Coding_Skills', 'Analytical_Skills', 'Problem_Solving_Skills', 'Data_Driven_Thinking',
+        'Domain_Expertise_Depth', 'Communication_Skills', 'Teamwork_Skills', 'Presentation_Skills',
+        'Networking_Skills', 'Public_Speaking_Confidence', 'Conflict_Resolution_Skills',
+        'Leadership_Readiness', 'Risk_Tolerance', 'Adaptability_Score', 'Stress_Management_Skills',
+        'Continuous_Learning', 'Innovation_Interest', 'Customer_Focus', 'Mentoring_Experience',
+        'Work_Life_Balance_Priority', 'Entrepreneurship_Interest', 'Career_Goal_Clarity',
+        'Certifications_Interest', 'English_Proficiency', 'Family_Support_Score',
+    )},
+}
+
+
+class ProfileSchema:
+    """Field order, category vocabularies and defaults shared by records of one model"""
+
+    def __init__(self, numeric_features, categorical_features, categories, dtype=np.float64):
+        """
+        Args:
+            numeric_features: numeric field names, in feature_config order
+            categorical_features: categorical field names, in feature_config order
+            categories: list of known category values per categorical field
+            dtype: numeric storage; float64 keeps predictions identical to dict
+                   profiles, float32 halves the memory of large batches
+        """
+        self.numeric_features = list(numeric_features)
+        self.categorical_features = list(categorical_features)
+        self.categories = [[str(c) for c in cats] for cats in categories]
+        self.dtype = np.dtype(dtype)
+
+        if max((len(c) for c in self.categories), default=0) > 127:
+            raise ValueError("int8 category codes hold at most 127 categories per field")
+
+        self.numeric_index = {name: i for i, name in enumerate(self.numeric_features)}
+        self.categorical_index = {name: j for j, name in enumerate(self.categorical_features)}
+        self.category_codes = [{c: code for code, c in enumerate(cats)} for cats in self.categories]
+        self.integer_mask = np.array([name not in FRACTIONAL_FIELDS for name in self.numeric_features])
+        self.fields = self.numeric_features + self.categorical_features
+        self._csv_layouts = {}
+
+    @classmethod
+    def from_encoder(cls, encoder, dtype=np.float64):
+        """Schema of a CompiledFeatureEncoder (so codes line up with its one-hot blocks)"""
+        return cls(encoder.numeric_features, encoder.categorical_features, encoder.categories, dtype)
+
+    @classmethod
+    def from_predictor(cls, predictor, dtype=np.float64):
+        """Schema of a loaded UltraCareerPredictor (compiled encoder or fitted preprocessor)"""
+
+        if predictor.encoder is not None:
+            return cls.from_encoder(predictor.encoder, dtype)
+        category_encoder = predictor.preprocessor.named_transformers_['cat']
+        return cls(predictor.numeric_features, predictor.categorical_features,
+                   category_encoder.categories_, dtype)
+
+    @classmethod
+    def load(cls, feature_config_path='feature_config_ultra.pkl',
+             preprocessor_path='career_preprocessor_ultra.pkl', dtype=np.float64):
+        """Schema from the files train_model_ultra.py writes"""
+
+        import joblib
+
+        feature_config = joblib.load(feature_config_path)
+        category_encoder = joblib.load(preprocessor_path).named_transformers_['cat']
+        return cls(feature_config['numeric_features'], feature_config['categorical_features'],
+                   category_encoder.categories_, dtype)
+
+    def same_layout(self, encoder):
+        """True when codes of this schema can be fed to encoder.encode_columns as-is"""
+
+        return (
+            self.numeric_features == list(encoder.numeric_features)
+            and self.categorical_features == list(encoder.categorical_features)
+            and self.categories == [[str(c) for c in cats] for cats in encoder.categories]
+        )
+
+    def code(self, j, value):
+        """int8 code of a category value in categorical field j (-1 = missing or unseen)"""
+        if value is None:
+            return -1
+        return self.category_codes[j].get(str(value), -1)
+
+    def category(self, j, code):
+        return self.categories[j][code] if code >= 0 else UNKNOWN
+
+    def numeric_value(self, i, value):
+        """Stored value as a Python number (int unless the field is fractional)"""
+        return int(value) if self.integer_mask[i] and float(value).is_integer() else float(value)
+
+    def csv_layout(self, header):
+        """(numeric positions, categorical positions) of schema fields in a CSV header; -1 = absent"""
+
+        header = tuple(header)
+        layout = self._csv_layouts.get(header)
+        if layout is None:
+            position = {name: k for k, name in enumerate(header)}
+            layout = (
+                [position.get(name, -1) for name in self.numeric_features],
+                [position.get(name, -1) for name in self.categorical_features],
+            )
+            self._csv_layouts[header] = layout
+        return layout
+
+
+def _number(value):
+    """float of a dict or CSV value; None, '' and NaN become the 0 default"""
+
+    if value is None or value == '':
+        return 0.0
+    value = float(value)
+    return 0.0 if value != value else value
+
+
+class ProfileRecord:
+    """
+    One profile with a fixed schema
+
+    Reads like the dict profiles it replaces (record['GPA'], record.get(...)),
+    so calculate_success_percentage and get_personalized_advice accept it
+    unchanged; missing fields are already filled with their defaults.
+    """
+
+    __slots__ = ('schema', 'numeric', 'codes')
+
+    def __init__(self, schema, numeric, codes):
+        self.schema = schema
+        self.numeric = numeric
+        self.codes = codes
+
+    @classmethod
+    def from_dict(cls, schema, profile):
+        """Record from a profile dict (missing numbers → 0, missing categories → Unknown)"""
+
+        numeric = np.fromiter((_number(profile.get(name)) for name in schema.numeric_features),
+                              dtype=schema.dtype, count=len(schema.numeric_features))
+        codes = np.fromiter((schema.code(j, profile.get(name)) for j, name in enumerate(schema.categorical_features)),
+                            dtype=np.int8, count=len(schema.categorical_features))
+        return cls(schema, numeric, codes)
+
+    @classmethod
+    def from_form_answers(cls, schema, answers):
+        """Record from CareerAssessmentForm answers, mapping option labels to model values"""
+
+        mapped = {
+            key: FORM_LABELS.get(key, {}).get(value, value) if isinstance(value, str) else value
+            for key, value in answers.items()
+        }
+        return cls.from_dict(schema, mapped)
+
+    @classmethod
+    def from_csv_row(cls, schema, row, header):
+        """Record from one csv.reader row (strings) and the file's header row"""
+
+        numeric_positions, categorical_positions = schema.csv_layout(header)
+        numeric = np.fromiter((_number(row[k]) if k >= 0 else 0.0 for k in numeric_positions),
+                              dtype=schema.dtype, count=len(numeric_positions))
+        codes = np.fromiter((schema.code(j, row[k] or None) if k >= 0 else -1
+                             for j, k in enumerate(categorical_positions)),
+                            dtype=np.int8, count=len(categorical_positions))
+        return cls(schema, numeric, codes)
+
+    def __getitem__(self, name):
+        i = self.schema.numeric_index.get(name)
+        if i is not None:
+            return self.schema.numeric_value(i, self.numeric[i])
+        j = self.schema.categorical_index.get(name)
+        if j is not None:
+            return self.schema.category(j, self.codes[j])
+        raise KeyError(name)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __contains__(self, name):
+        return name in self.schema.numeric_index or name in self.schema.categorical_index
+
+    def __iter__(self):
+        return iter(self.schema.fields)
+
+    def __len__(self):
+        return len(self.schema.fields)
+
+    def __eq__(self, other):
+        if not isinstance(other, ProfileRecord):
+            return NotImplemented
+        return np.array_equal(self.numeric, other.numeric) and np.array_equal(self.codes, other.codes)
+
+    def keys(self):
+        return list(self.schema.fields)
+
+    def to_dict(self):
+        """Plain profile dict (categoricals as strings, Unknown for missing)"""
+        return {name: self[name] for name in self.schema.fields}
+
+    def __repr__(self):
+        return f"ProfileRecord({self.to_dict()!r})"
+
+
+class ProfileBatch:
+    """
+    Many profiles as an (n, n_numeric) float array and an (n, n_categorical) int8 array
+
+    About 350 bytes per profile at float64 (200 at float32), against several KB
+    for a dict of 45 boxed values.
+    """
+
+    __slots__ = ('schema', 'numeric', 'codes')
+
+    def __init__(self, schema, numeric, codes):
+        if len(numeric) != len(codes):
+            raise ValueError(f"{len(numeric)} numeric rows but {len(codes)} code rows")
+        self.schema = schema
+        self.numeric = numeric
+        self.codes = codes
+
+    @classmethod
+    def empty(cls, schema, n=0):
+        return cls(schema,
+                   np.zeros((n, len(schema.numeric_features)), dtype=schema.dtype),
+                   np.full((n, len(schema.categorical_features)), -1, dtype=np.int8))
+
+    @classmethod
+    def from_dicts(cls, schema, profiles):
+        """Batch from an iterable of profile dicts"""
+
+        profiles = list(profiles)
+        batch = cls.empty(schema, len(profiles))
+        for i, name in enumerate(schema.numeric_features):
+            batch.numeric[:, i] = [_number(p.get(name)) for p in profiles]
+        for j, name in enumerate(schema.categorical_features):
+            batch.codes[:, j] = [schema.code(j, p.get(name)) for p in profiles]
+        return batch
+
+    @classmethod
+    def from_records(cls, schema, records):
+        records = list(records)
+        if not records:
+            return cls.empty(schema)
+        return cls(schema, np.stack([r.numeric for r in records]), np.stack([r.codes for r in records]))
+
+    @classmethod
+    def from_form_answers(cls, schema, answers_list):
+        return cls.from_records(schema, (ProfileRecord.from_form_answers(schema, a) for a in answers_list))
+
+    @classmethod
+    def from_frame(cls, schema, df):
+        """Batch from a DataFrame; absent columns and NaN take their defaults"""
+
+        import pandas as pd
+
+        batch = cls.empty(schema, len(df))
+        for i, name in enumerate(schema.numeric_features):
+            if name in df.columns:
+                batch.numeric[:, i] = pd.to_numeric(df[name]).fillna(0).to_numpy(dtype=schema.dtype)
+        for j, name in enumerate(schema.categorical_features):
+            if name in df.columns:
+                values = df[name].astype(object).where(df[name].notna(), None).astype(str)
+                batch.codes[:, j] = pd.Categorical(values, categories=schema.categories[j]).codes
+        return batch
+
+    @classmethod
+    def from_csv(cls, schema, path, chunk_size=100_000):
+        """Batch from a CSV file, parsed in chunks so only the arrays stay in memory"""
+
+        import pandas as pd
+
+        columns = set(schema.fields)
+        chunks = [
+            cls.from_frame(schema, chunk)
+            for chunk in pd.read_csv(path, usecols=lambda c: c in columns, chunksize=chunk_size)
+        ]
+        return cls.concat(schema, chunks)
+
+    @classmethod
+    def concat(cls, schema, batches):
+        batches = list(batches)
+        if not batches:
+            return cls.empty(schema)
+        return cls(schema, np.concatenate([b.numeric for b in batches]),
+                   np.concatenate([b.codes for b in batches]))
+
+    def __len__(self):
+        return len(self.numeric)
+
+    def __getitem__(self, index):
+        """A ProfileRecord view for an int, a ProfileBatch for a slice or index array"""
+
+        if isinstance(index, (int, np.integer)):
+            return ProfileRecord(self.schema, self.numeric[index], self.codes[index])
+        return ProfileBatch(self.schema, self.numeric[index], self.codes[index])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self):
+        return self.numeric.nbytes + self.codes.nbytes
+
+    def to_dicts(self):
+        return [record.to_dict() for record in self]
+
+    def to_frame(self):
+        """DataFrame in schema field order (for the preprocessor fallback path)"""
+
+        import pandas as pd
+
+        df = pd.DataFrame(self.numeric.astype(np.float64), columns=self.schema.numeric_features)
+        for j, name in enumerate(self.schema.categorical_features):
+            # Code -1 indexes the trailing Unknown
+            categories = np.array(self.schema.categories[j] + [UNKNOWN], dtype=object)
+            df[name] = categories[self.codes[:, j]]
+        return df
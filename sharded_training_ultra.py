@@ -0,0 +1,320 @@
+"""
+HerApt Sharded Forest Training
+Out-of-core training for datasets that do not fit in memory: the CSV is streamed
+twice (statistics, then encoded bootstrap shards on disk), tree subsets are fitted
+on the shards in separate processes and merged into one career_model_ultra.bin
+
+Run:
+    python sharded_training_ultra.py --data big.csv --shards 8 --shard-rows 500000
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from dataset_loader_ultra import peak_rss_mb, read_csv_chunks
+from feature_encoder_ultra import CompiledFeatureEncoder
+from forest_attribution_ultra import concatenate_node_values, node_value_table
+from forest_engine_ultra import FlatForest, narrowest_int_dtype
+from model_artifact_ultra import export_artifact, load_artifact
+from train_model_ultra import CATEGORICAL_FEATURES, ENGINES, NUMERIC_FEATURES, next_model_version
+import model_registry_ultra
+
+
+CHUNK_ROWS = 100_000
+
+# Largest share of the rows held out for evaluation (matches the 80-20 split)
+HOLDOUT_FRACTION = 0.2
+
+# Per-shard files: encoded features, career codes, bootstrap counts
+SHARD_FILES = {'X': np.float32, 'y': np.int32, 'w': np.uint8}
+
+
+class StreamingStats:
+    """Preprocessor statistics accumulated one chunk at a time"""
+
+    def __init__(self, numeric_features, categorical_features, target='Career'):
+        self.numeric_features = list(numeric_features)
+        self.categorical_features = list(categorical_features)
+        self.target = target
+        self.rows = 0
+        self.count = np.zeros(len(self.numeric_features))
+        self.mean = np.zeros(len(self.numeric_features))
+        self.m2 = np.zeros(len(self.numeric_features))
+        self.categories = [set() for _ in self.categorical_features]
+        self.careers = {}
+
+    def update(self, chunk):
+        """Fold a DataFrame chunk into the statistics"""
+
+        chunk = chunk[chunk[self.target].notna()]
+        self.rows += len(chunk)
+
+        # Chan et al. pairwise update of the per-column mean and squared deviations
+        values = chunk[self.numeric_features].to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        count = present.sum(axis=0)
+        mean = np.nansum(values, axis=0) / np.maximum(count, 1)
+        m2 = np.nansum((values - mean) ** 2, axis=0)
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / np.maximum(total, 1)
+        self.m2 += m2 + delta ** 2 * self.count * count / np.maximum(total, 1)
+        self.count = total
+
+        for seen, name in zip(self.categories, self.categorical_features):
+            seen.update(str(v) for v in chunk[name].dropna().unique())
+        for career, n in chunk[self.target].astype(str).value_counts().items():
+            self.careers[career] = self.careers.get(career, 0) + int(n)
+
+    @property
+    def classes(self):
+        """Career labels in LabelEncoder order"""
+        return np.asarray(sorted(self.careers), dtype=object)
+
+    def encoder(self):
+        """CompiledFeatureEncoder equal to a StandardScaler + OneHotEncoder fitted on every row"""
+
+        scale = np.sqrt(self.m2 / np.maximum(self.count, 1))
+        scale[scale < 10 * np.finfo(np.float64).eps] = 1.0
+        return CompiledFeatureEncoder(
+            self.numeric_features, self.categorical_features, self.mean, scale,
+            [sorted(seen) for seen in self.categories], handle_unknown='ignore',
+        )
+
+
+def scan(path, numeric_features, categorical_features, chunk_rows=CHUNK_ROWS):
+    """First pass: StreamingStats over the whole CSV"""
+
+    stats = StreamingStats(numeric_features, categorical_features)
+    for chunk in read_csv_chunks(path, chunk_rows, numeric_features + categorical_features + ['Career']):
+        stats.update(chunk)
+    return stats
+
+
+def write_shards(path, encoder, classes, work_dir, n_shards, rate, holdout_fraction, holdout_rows,
+                 chunk_rows=CHUNK_ROWS, seed=42):
+    """
+    Second pass: encode each chunk and append it to the bootstrap shards
+
+    Every training row is copied into each shard Poisson(rate) times (stored
+    once with its count as sample weight), the streaming equivalent of
+    drawing a bootstrap sample of rate x n rows. Rows are held out with
+    probability holdout_fraction, up to holdout_rows, and go to no shard.
+
+    Returns:
+        (shard_rows, X_holdout, y_holdout): rows written per shard and the
+        encoded evaluation rows
+    """
+
+    columns = encoder.numeric_features + encoder.categorical_features + ['Career']
+    shard_dirs = [os.path.join(work_dir, f'shard-{s:03d}') for s in range(n_shards)]
+    files = []
+    for shard_dir in shard_dirs:
+        os.makedirs(shard_dir, exist_ok=True)
+        files.append({name: open(os.path.join(shard_dir, f'{name}.bin'), 'wb') for name in SHARD_FILES})
+
+    shard_rows = np.zeros(n_shards, dtype=np.int64)
+    holdout_X, holdout_y, n_holdout = [], [], 0
+    try:
+        for index, chunk in enumerate(read_csv_chunks(path, chunk_rows, columns)):
+            rng = np.random.default_rng([seed, index])
+            chunk = chunk[chunk['Career'].notna()]
+            y = np.searchsorted(classes, chunk['Career'].astype(str).to_numpy()).astype(np.int32)
+            X = encoder.encode_columns(*encoder.columns(chunk), dtype=np.float32)
+
+            held = rng.random(len(X)) < holdout_fraction
+            held &= np.cumsum(held) <= holdout_rows - n_holdout
+            holdout_X.append(X[held])
+            holdout_y.append(y[held])
+            n_holdout += int(held.sum())
+            X, y = X[~held], y[~held]
+
+            counts = rng.poisson(rate, size=(n_shards, len(X)))
+            for s in range(n_shards):
+                rows = np.flatnonzero(counts[s])
+                files[s]['X'].write(X[rows].tobytes())
+                files[s]['y'].write(y[rows].tobytes())
+                files[s]['w'].write(np.minimum(counts[s, rows], 255).astype(np.uint8).tobytes())
+                shard_rows[s] += len(rows)
+    finally:
+        for shard_files in files:
+            for f in shard_files.values():
+                f.close()
+
+    return shard_rows, np.concatenate(holdout_X), np.concatenate(holdout_y)
+
+
+def fit_shard(shard_dir, rows, engine, params, n_trees, seed, encoder, classes):
+    """
+    Fit `n_trees` trees on one shard (runs in a worker process)
+
+    The shard is memory-mapped, so the worker holds one shard at a time. The
+    trees are flattened and written to <shard_dir>/forest.bin with their
+    node values; class ids are mapped from the shard's careers to the
+    global ones, since a shard can miss rare careers.
+
+    Returns:
+        (artifact path, peak RSS of the worker in MB)
+    """
+
+    n_features = encoder.n_features_out
+    data = {
+        name: np.memmap(os.path.join(shard_dir, f'{name}.bin'), dtype=dtype, mode='r',
+                        shape=(rows, n_features) if name == 'X' else (rows,))
+        for name, dtype in SHARD_FILES.items()
+    }
+    model = ENGINES[engine]['estimator'](**{**params, 'n_estimators': n_trees, 'random_state': seed,
+                                            'n_jobs': 1, 'verbose': 0})
+    model.fit(data['X'], data['y'], sample_weight=data['w'])
+    del data
+
+    forest = FlatForest.from_sklearn(model)
+    node_ptr, node_class, node_weight = node_value_table(model, forest)
+    forest.dist_class = model.classes_[forest.dist_class].astype(np.int32)
+    forest.n_classes = len(classes)
+    forest.classes_ = np.arange(len(classes))
+    node_class = model.classes_[node_class].astype(narrowest_int_dtype(len(classes)))
+
+    path = os.path.join(shard_dir, 'forest.bin')
+    export_artifact(path, forest, encoder, classes, node_values=(node_ptr, node_class, node_weight))
+    for name in SHARD_FILES:
+        os.remove(os.path.join(shard_dir, f'{name}.bin'))
+    return path, peak_rss_mb()
+
+
+def merge_shards(paths):
+    """(FlatForest, node values) holding the trees of every shard artifact, in shard order"""
+
+    artifacts = [load_artifact(path) for path in paths]
+    forest = FlatForest.concatenate([a.forest for a in artifacts], n_jobs=-1)
+    return forest, concatenate_node_values(a.node_values for a in artifacts)
+
+
+def split_trees(n_trees, n_shards):
+    """Trees per shard, as even as possible"""
+    return [n_trees // n_shards + (s < n_trees % n_shards) for s in range(n_shards)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the forest out of core on bootstrap shards")
+    parser.add_argument('--data', default='career_path_ultra_enhanced.csv', help="training CSV (any size)")
+    parser.add_argument('--engine', choices=[e for e in ENGINES if ENGINES[e]['features'] == 'onehot'],
+                        default='rf')
+    parser.add_argument('--trees', type=int, default=ENGINES['rf']['params']['n_estimators'])
+    parser.add_argument('--shards', type=int, default=8, help="bootstrap shards (tree subsets)")
+    parser.add_argument('--shard-rows', type=int, default=500_000,
+                        help="expected rows per shard; bounds each worker's memory")
+    parser.add_argument('--workers', type=int, help="worker processes (default: min(shards, CPUs))")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="CSV rows read at a time")
+    parser.add_argument('--holdout-rows', type=int, default=20_000, help="rows kept back for evaluation")
+    parser.add_argument('--max-depth', type=int, help="override the engine's max_depth")
+    parser.add_argument('--min-samples-leaf', type=int, help="override the engine's min_samples_leaf")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--work-dir', help="where shards are staged (default: a temporary directory)")
+    parser.add_argument('--output', default='career_model_ultra.bin')
+    parser.add_argument('--models-dir', default=model_registry_ultra.MODELS_DIR,
+                        help="model registry to publish the new version to ('' to skip)")
+    args = parser.parse_args(argv)
+
+    params = dict(ENGINES[args.engine]['params'])
+    if args.max_depth is not None:
+        params['max_depth'] = args.max_depth
+    if args.min_samples_leaf is not None:
+        params['min_samples_leaf'] = args.min_samples_leaf
+    workers = args.workers or min(args.shards, os.cpu_count() or 1)
+    start = time.perf_counter()
+
+    print("="*80)
+    print("HERAPT SHARDED FOREST TRAINING")
+    print("="*80)
+
+
+    print(f"\n[1/5] Streaming statistics from {args.data}...")
+    if not os.path.exists(args.data):
+        print(f"❌ {args.data} not found!")
+        print("   Run: python create_ultra_dataset.py")
+        exit(1)
+    stats = scan(args.data, NUMERIC_FEATURES, CATEGORICAL_FEATURES, args.chunk_rows)
+    encoder, classes = stats.encoder(), stats.classes
+    holdout_fraction = min(HOLDOUT_FRACTION, args.holdout_rows / max(stats.rows, 1))
+    rate = min(1.0, args.shard_rows / max(stats.rows * (1 - holdout_fraction), 1))
+    print(f"✅ {stats.rows:,} rows, {len(classes)} careers, {encoder.n_features_out} encoded features")
+
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='herapt-shards-')
+    try:
+        print(f"\n[2/5] Writing {args.shards} bootstrap shards (rate {rate:.3f}) to {work_dir}...")
+        shard_rows, X_holdout, y_holdout = write_shards(
+            args.data, encoder, classes, work_dir, args.shards, rate, holdout_fraction, args.holdout_rows,
+            args.chunk_rows, args.seed,
+        )
+        print(f"✅ {shard_rows.min():,}-{shard_rows.max():,} rows per shard "
+              f"({shard_rows.max() * (encoder.n_features_out * 4 + 5) / 1e6:.0f} MB largest), "
+              f"{len(X_holdout):,} held out")
+
+
+        trees = split_trees(args.trees, args.shards)
+        print(f"\n[3/5] Fitting {args.trees} {ENGINES[args.engine]['name']} trees "
+              f"({trees[0]} per shard) in {workers} worker process(es)...")
+        paths = [None] * args.shards
+        worker_peak = 0.0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(fit_shard, os.path.join(work_dir, f'shard-{s:03d}'), int(shard_rows[s]),
+                            args.engine, params, trees[s], args.seed + s, encoder, classes): s
+                for s in range(args.shards) if trees[s] and shard_rows[s]
+            }
+            for future in as_completed(futures):
+                s = futures[future]
+                paths[s], peak = future.result()
+                worker_peak = max(worker_peak, peak)
+                print(f"   shard {s:3d}: {trees[s]} trees on {shard_rows[s]:,} rows ({peak:.0f} MB peak)")
+
+
+        print("\n[4/5] Merging shard forests...")
+        forest, node_values = merge_shards([p for p in paths if p is not None])
+        accuracy = float((forest.predict(X_holdout) == y_holdout).mean()) if len(X_holdout) else None
+        print(f"✅ {forest.n_trees} trees, {forest.node_count:,} nodes")
+        if accuracy is not None:
+            print(f"✅ Hold-out accuracy: {accuracy:.2%} on {len(X_holdout):,} rows")
+
+
+        print("\n[5/5] Saving the artifact...")
+        model_version = next_model_version(args.models_dir or model_registry_ultra.MODELS_DIR)
+        metadata = {
+            'engine': args.engine,
+            'model_version': model_version,
+            'accuracy': accuracy,
+            'sharded': {
+                'rows': stats.rows, 'shards': args.shards, 'shard_rows': [int(n) for n in shard_rows],
+                'trees': args.trees, 'rate': rate, 'seed': args.seed,
+            },
+        }
+        staging = f'{args.output}.{os.getpid()}.tmp'
+        size = export_artifact(staging, forest, encoder, classes, metadata=metadata, node_values=node_values)
+        os.replace(staging, args.output)
+        print(f"    {args.output} ({size / 1e6:.1f} MB, model version {model_version})")
+        if args.models_dir:
+            published = model_registry_ultra.publish(
+                [args.output], model_version, args.models_dir,
+                metadata={key: metadata[key] for key in ('engine', 'accuracy')},
+            )
+            print(f"    {published}/ published and made CURRENT")
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n Finished in {time.perf_counter() - start:.1f}s; peak memory "
+          f"{peak_rss_mb():.0f} MB (coordinator), {worker_peak:.0f} MB (largest worker)")
+    print("\n" + "="*80)
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+HerApt Similar Profiles
+"People like you": nearest training profiles in the fitted preprocessor's encoded space
+Exact search with a KD-tree, approximate search with a NumPy inverted-file (IVF) index
+
+Run:
+    python similar_profiles_ultra.py --k 10 --n-probe 1 4 8 16
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+
+DEFAULT_PATH = 'similar_profiles_ultra'
+
+# Bump when build() changes, so cached and saved indexes are rebuilt
+INDEX_VERSION = 2
+
+# Above this many rows the KD-tree is skipped and exact search scans in chunks
+KDTREE_MAX_ROWS = 200_000
+
+# build() picks the smallest n_probe whose recall@RECALL_K reaches RECALL_TARGET
+RECALL_K = 10
+RECALL_TARGET = 0.9
+N_PROBES = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def squared_distances(X, Y):
+    """(len(X), len(Y)) squared Euclidean distances, clipped at 0"""
+
+    d = (X * X).sum(axis=1)[:, None] - 2 * (X @ Y.T) + (Y * Y).sum(axis=1)[None, :]
+    return np.maximum(d, 0)
+
+
+def encoding_key(encoder, preprocessor=None):
+    """
+    Fingerprint of the space profiles are encoded into
+
+    Hashes the compiled encoder's columns, categories and scaling, so a
+    pickled preprocessor and the artifact's encoder of the same fit agree.
+    Preprocessors that do not compile (encoder None) hash their pickle.
+    """
+
+    if encoder is None:
+        import joblib
+        return joblib.hash(preprocessor)
+
+    digest = hashlib.sha256(json.dumps([
+        encoder.numeric_features, encoder.categorical_features,
+        [[str(c) for c in cats] for cats in encoder.categories],
+    ]).encode())
+    digest.update(np.ascontiguousarray(encoder.mean, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(encoder.scale, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def kmeans(X, n_clusters, iterations=20, sample_size=50_000, seed=0):
+    """Lloyd's k-means on a sample of X; returns float32 centroids"""
+
+    rng = np.random.default_rng(seed)
+    if len(X) > sample_size:
+        X = X[rng.choice(len(X), sample_size, replace=False)]
+    X = np.asarray(X, dtype=np.float32)
+    centroids = X[rng.choice(len(X), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = squared_distances(X, centroids).argmin(axis=1)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, X)
+        moved = counts > 0
+        updated = centroids.copy()
+        updated[moved] = sums[moved] / counts[moved, None]
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+    return centroids
+
+
+def _top_k(distances, k):
+    """Positions of the k smallest distances, nearest first"""
+
+    k = min(k, len(distances))
+    nearest = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+    return nearest[np.argsort(distances[nearest], kind='stable')]
+
+
+class SimilarProfileIndex:
+    """Training profiles (encoded vectors, careers, success) grouped into IVF lists"""
+
+    def __init__(self, vectors, careers, success, rows, centroids, offsets, career_names,
+                 kdtree=None, metadata=None):
+        """
+        Args:
+            vectors: (n, d) float32 encoded profiles, stored list by list
+            careers: (n,) career class index per profile
+            success: (n,) Success_Percentage per profile
+            rows: (n,) row of each profile in the training CSV
+            centroids: (n_lists, d) IVF list centroids
+            offsets: (n_lists + 1,) start of each list in the stored order
+            career_names: career class names
+            kdtree: sklearn KDTree over vectors for exact search (optional)
+            metadata: free-form build information saved with the index
+        """
+        self.vectors = vectors
+        self.careers = careers
+        self.success = success
+        self.rows = rows
+        self.centroids = centroids
+        self.offsets = offsets
+        self.career_names = [str(c) for c in career_names]
+        self.kdtree = kdtree
+        self.metadata = metadata or {}
+        self.norms = np.einsum('ij,ij->i', vectors, vectors)
+
+    @classmethod
+    def build(cls, vectors, careers, success, career_names, n_lists=None, kdtree=None,
+              seed=0, metadata=None):
+        """
+        Cluster encoded training profiles into IVF lists
+
+        Args:
+            vectors: (n, d) preprocessor output for the training rows
+            careers: (n,) encoded career labels
+            success: (n,) Success_Percentage values
+            career_names: label_encoder.classes_
+            n_lists: IVF lists (default: about sqrt(n))
+            kdtree: also build a KD-tree for exact search (default: n <= KDTREE_MAX_ROWS)
+        """
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        n_lists = n_lists or max(1, min(4096, int(np.sqrt(n))))
+        centroids = kmeans(vectors, min(n_lists, n), seed=seed)
+
+        assignment = np.concatenate([
+            squared_distances(vectors[start:start + 65536], centroids).argmin(axis=1)
+            for start in range(0, n, 65536)
+        ])
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+
+        index = cls(
+            vectors[order], np.asarray(careers, dtype=np.int16)[order],
+            np.asarray(success, dtype=np.float32)[order], order.astype(np.int64),
+            centroids, offsets, career_names, metadata=metadata,
+        )
+        if kdtree if kdtree is not None else n <= KDTREE_MAX_ROWS:
+            index.build_kdtree()
+
+        # Jittered training rows stand in for unseen profiles
+        rng = np.random.default_rng(seed)
+        queries = vectors[rng.choice(n, min(n, 256), replace=False)]
+        index.tune(queries + rng.normal(0, 0.25, queries.shape).astype(np.float32))
+        return index
+
+    def build_kdtree(self):
+        from sklearn.neighbors import KDTree
+        self.kdtree = KDTree(np.asarray(self.vectors))
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def n_probe(self):
+        """Default IVF lists scanned per query (set by tune())"""
+        return self.metadata.get('n_probe', 8)
+
+    @property
+    def recall_curve(self):
+        """{n_probe: recall@RECALL_K} measured by tune(), up to the chosen n_probe"""
+        return {int(n_probe): recall for n_probe, recall in self.metadata.get('recall', [])}
+
+    def tune(self, X, k=RECALL_K, target=RECALL_TARGET):
+        """Measure recall against exact search per n_probe; keep the cheapest meeting target"""
+
+        _, exact = self.exact(X, k)
+        curve = []
+        for n_probe in N_PROBES:
+            if n_probe >= len(self.centroids):
+                curve.append((len(self.centroids), 1.0))
+                break
+            curve.append((n_probe, self.recall(X, k, n_probe, exact=exact)))
+            if curve[-1][1] >= target:
+                break
+        else:
+            curve.append((len(self.centroids), 1.0))
+        self.metadata['recall'] = curve
+        self.metadata['n_probe'] = next(n_probe for n_probe, recall in curve if recall >= target)
+        return self.metadata['n_probe']
+
+    def exact(self, X, k=5):
+        """
+        Exact k nearest stored profiles for each query row
+
+        Returns:
+            (distances, positions): (n_queries, k) Euclidean distances and
+            positions in the stored order, nearest first
+        """
+
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        k = min(k, len(self))
+        if self.kdtree is not None:
+            return self.kdtree.query(X, k=k)
+
+        distances = np.empty((len(X), k))
+        positions = np.empty((len(X), k), dtype=np.int64)
+        for i, x in enumerate(X):
+            best_d, best_p = np.empty(0), np.empty(0, dtype=np.int64)
+            for start in range(0, len(self), 65536):
+                d = squared_distances(x[None], self.vectors[start:start + 65536])[0]
+                d = np.concatenate([best_d, d])
+                p = np.concatenate([best_p, np.arange(start, start + len(d) - len(best_d))])
+                keep = _top_k(d, k)
+                best_d, best_p = d[keep], p[keep]
+            distances[i], positions[i] = np.sqrt(best_d), best_p
+        return distances, positions
+
+    def search(self, X, k=5, n_probe=None):
+        """
+        Approximate k nearest neighbours: scan only the n_probe closest IVF lists
+        (default: the value tune() picked)
+
+        Returns:
+            (distances, positions) like exact(); rows are padded with inf / -1
+            when the probed lists hold fewer than k profiles
+        """
+
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        probed = np.argpartition(squared_distances(X, self.centroids), n_probe - 1, axis=1)[:, :n_probe]
+
+        distances = np.full((len(X), k), np.inf)
+        positions = np.full((len(X), k), -1, dtype=np.int64)
+        for i, lists in enumerate(probed):
+            candidates = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+            d = np.maximum(self.norms[candidates] - 2 * (self.vectors[candidates] @ X[i]) + X[i] @ X[i], 0)
+            nearest = _top_k(d, k)
+            distances[i, :len(nearest)] = np.sqrt(d[nearest])
+            positions[i, :len(nearest)] = candidates[nearest]
+        return distances, positions
+
+    def recall(self, X, k=5, n_probe=None, exact=None):
+        """Mean fraction of the exact k nearest neighbours (positions, if already known) that search() returns"""
+
+        if exact is None:
+            _, exact = self.exact(X, k)
+        _, approximate = self.search(X, k, n_probe)
+        hits = [len(np.intersect1d(e, a)) for e, a in zip(exact, approximate)]
+        return float(np.mean(hits)) / exact.shape[1]
+
+    def neighbours(self, X, k=5, exact=False, n_probe=None):
+        """
+        Nearest training profiles as readable results
+
+        Returns:
+            List (one per query row) of dicts with the training CSV 'row', its
+            'career', 'success_percentage' and 'distance'
+        """
+
+        distances, positions = self.exact(X, k) if exact else self.search(X, k, n_probe)
+        return [
+            [
+                {
+                    'row': int(self.rows[p]),
+                    'career': self.career_names[self.careers[p]],
+                    'success_percentage': float(self.success[p]),
+                    'distance': float(d),
+                }
+                for d, p in zip(row_distances, row_positions) if p >= 0
+            ]
+            for row_distances, row_positions in zip(distances, positions)
+        ]
+
+    def save(self, path=DEFAULT_PATH):
+        """Write .npy arrays, manifest.json and (if built) kdtree.joblib; replaced atomically"""
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+
+        for name in ('vectors', 'careers', 'success', 'rows', 'centroids', 'offsets'):
+            np.save(os.path.join(temp_path, f"{name}.npy"), getattr(self, name))
+        if self.kdtree is not None:
+            import joblib
+            joblib.dump(self.kdtree, os.path.join(temp_path, 'kdtree.joblib'))
+
+        with open(os.path.join(temp_path, 'manifest.json'), 'w') as f:
+            json.dump({'career_names': self.career_names, 'metadata': self.metadata}, f)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH, mmap=True):
+        """Open a saved index; arrays are memory-mapped unless mmap=False"""
+
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+            for name in ('vectors', 'careers', 'success', 'rows', 'centroids', 'offsets')
+        }
+        arrays['centroids'] = np.asarray(arrays['centroids'])
+        arrays['offsets'] = np.asarray(arrays['offsets'])
+
+        kdtree = None
+        kdtree_path = os.path.join(path, 'kdtree.joblib')
+        if os.path.exists(kdtree_path):
+            import joblib
+            kdtree = joblib.load(kdtree_path)
+
+        return cls(career_names=manifest['career_names'], kdtree=kdtree,
+                   metadata=manifest['metadata'], **arrays)
+
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import pandas as pd
+
+    from career_predictor_ultra import UltraCareerPredictor
+
+    parser = argparse.ArgumentParser(description="Nearest-neighbour recall and latency on sampled profiles")
+    parser.add_argument('--index', default=DEFAULT_PATH)
+    parser.add_argument('--data', default='career_path_ultra_enhanced.csv')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    print("="*80)
+    print("HERAPT SIMILAR PROFILES")
+    print("="*80)
+
+    index = SimilarProfileIndex.load(args.index)
+    predictor = UltraCareerPredictor()
+    print(f"\n {len(index):,} profiles, {len(index.centroids)} IVF lists, "
+          f"KD-tree {'yes' if index.kdtree is not None else 'no'}, default n_probe {index.n_probe}")
+
+    # Perturbed copies of training rows, so queries are not exact matches
+    df = pd.read_csv(args.data).sample(args.queries, random_state=42)
+    profiles = df.drop(columns=['Career', 'Success_Percentage']).to_dict('records')
+    rng = np.random.default_rng(0)
+    for profile in profiles:
+        for field in rng.choice(predictor.numeric_features, 5, replace=False):
+            profile[field] = max(0, profile[field] + rng.integers(-1, 2))
+    X = predictor.encode(*predictor.profile_columns(profiles))
+
+    start = time.perf_counter()
+    index.exact(X, args.k)
+    exact_ms = (time.perf_counter() - start) / len(X) * 1000
+    print(f"\n {'Search':<14} {'ms/query':>10} {'Recall@' + str(args.k):>10}")
+    print(f" {'exact':<14} {exact_ms:>10.3f} {1.0:>10.3f}")
+    for n_probe in args.n_probe:
+        start = time.perf_counter()
+        index.search(X, args.k, n_probe)
+        elapsed = (time.perf_counter() - start) / len(X) * 1000
+        print(f" {'ivf probe ' + str(n_probe):<14} {elapsed:>10.3f} {index.recall(X, args.k, n_probe):>10.3f}")
+
+    print("\n People like the first query profile:")
+    for neighbour in index.neighbours(X[:1], k=5, exact=True)[0]:
+        print(f"   row {neighbour['row']:>6}  {neighbour['career']:<35} "
+              f"success {neighbour['success_percentage']:5.1f}%  distance {neighbour['distance']:.2f}")
+
+    print("\n" + "="*80)
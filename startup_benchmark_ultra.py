@@ -0,0 +1,93 @@
+"""
+HerApt Startup Benchmark
+Time from `import career_predictor_ultra` to the first prediction
+Each mode runs in a fresh interpreter so nothing is cached in-process
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+CHILD_SCRIPT = r'''
+import json, sys, time
+start = time.perf_counter()
+import career_predictor_ultra
+imported = time.perf_counter()
+predictor = career_predictor_ultra.UltraCareerPredictor(**json.loads(sys.argv[1]))
+loaded = time.perf_counter()
+predictor.predict(dict(career_predictor_ultra.SAMPLE_PROFILE))
+predicted = time.perf_counter()
+print(json.dumps({
+    'import_s': imported - start,
+    'load_s': loaded - imported,
+    'first_predict_s': predicted - loaded,
+    'total_s': predicted - start,
+    'sklearn_imported': 'sklearn' in sys.modules,
+    'pandas_imported': 'pandas' in sys.modules,
+}))
+'''
+
+MODES = {
+    'pickle-sklearn': {},
+    'pickle-flat': {'engine': 'flat'},
+    'artifact': {'artifact_path': 'career_model_ultra.bin'},
+}
+
+
+def run_mode(kwargs):
+    """Run one cold start in a fresh interpreter and return its timings"""
+
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, json.dumps(kwargs)],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Cold start failed for {kwargs}:\n{result.stderr or result.stdout}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark(modes, repeats):
+    """Median cold-start timings per mode"""
+
+    results = {}
+    for mode in modes:
+        runs = [run_mode(MODES[mode]) for _ in range(repeats)]
+        summary = {
+            key: statistics.median(run[key] for run in runs)
+            for key in ('import_s', 'load_s', 'first_predict_s', 'total_s')
+        }
+        summary['sklearn_imported'] = runs[0]['sklearn_imported']
+        summary['pandas_imported'] = runs[0]['pandas_imported']
+        results[mode] = summary
+    return results
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure predictor cold-start latency")
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=list(MODES))
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--json', help="also write results to this file")
+    args = parser.parse_args()
+
+    print("="*80)
+    print("HERAPT STARTUP BENCHMARK (import → first prediction)")
+    print("="*80)
+
+    results = benchmark(args.modes, args.repeats)
+
+    print(f"\n {'Mode':<16} {'Import':>9} {'Load':>9} {'1st pred':>9} {'Total':>9}  sklearn  pandas")
+    for mode, r in results.items():
+        print(f" {mode:<16} {r['import_s'] * 1000:8.1f}ms {r['load_s'] * 1000:8.1f}ms "
+              f"{r['first_predict_s'] * 1000:8.1f}ms {r['total_s'] * 1000:8.1f}ms  "
+              f"{'yes' if r['sklearn_imported'] else 'no':>7}  {'yes' if r['pandas_imported'] else 'no':>6}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n Saved {args.json}")
+
+    print("\n" + "="*80)
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from career_index_ultra import CareerIndex, rank_rows
+from profile_record_ultra import ProfileSchema
+
+
+CAREERS = ['X', 'Y', 'Z']
+
+
+class ScorePredictor:
+    """Scores a profile's careers straight from its numeric fields"""
+
+    def score_matrix(self, batch):
+        probabilities = batch.numeric[:, :len(CAREERS)].astype(np.float64)
+        return probabilities, probabilities * 10
+
+
+def make_index(depth):
+    schema = ProfileSchema(['x', 'y', 'z'], ['Age_Group'], [['18-24', '25-30']])
+    return CareerIndex(CAREERS, schema, depth=depth, score='probability', predictor=ScorePredictor())
+
+
+def profile(scores, age='18-24'):
+    return {'x': scores[0], 'y': scores[1], 'z': scores[2], 'Age_Group': age}
+
+
+def expected(index, career, k, filters=None):
+    """Top k ids from a full scan of the active rows"""
+
+    j = index.career_index[career]
+    rows = np.flatnonzero(index.active[:index.size])
+    if filters:
+        rows = rows[index._filter_mask(rows, filters)]
+    return [index.ids[row] for row in rank_rows(rows, index.scores[rows, j], k).tolist()]
+
+
+def test_insert_after_update_shortens_list():
+    index = make_index(depth=2)
+    index.insert([profile([10, 0, 0]), profile([9, 0, 0]), profile([8, 0, 0])], ids=['A', 'B', 'C'])
+    index.update([profile([1, 0, 0])], ids=['A'])
+    index.insert([profile([2, 0, 0])], ids=['D'])
+
+    assert [i for i, _, _ in index.query('X', k=2)] == ['B', 'C']
+
+
+def test_insert_after_remove_shortens_list():
+    index = make_index(depth=2)
+    index.insert([profile([10, 0, 0]), profile([9, 0, 0]), profile([8, 0, 0])], ids=['A', 'B', 'C'])
+    index.remove(['A'])
+    index.insert([profile([2, 0, 0])], ids=['D'])
+
+    assert [i for i, _, _ in index.query('X', k=2)] == ['B', 'C']
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_mixed_operations_match_full_scan(seed):
+    rng = np.random.default_rng(seed)
+    index = make_index(depth=8)
+    next_id = 0
+
+    for _ in range(300):
+        active = list(index.rows)
+        operation = rng.choice(['insert', 'update', 'remove']) if active else 'insert'
+        if operation == 'insert':
+            n = int(rng.integers(1, 4))
+            index.insert([profile(rng.integers(0, 20, 3), rng.choice(['18-24', '25-30'])) for _ in range(n)],
+                         ids=range(next_id, next_id + n))
+            next_id += n
+        elif operation == 'update':
+            ids = list(rng.choice(active, size=min(len(active), int(rng.integers(1, 4))), replace=False))
+            index.update([profile(rng.integers(0, 20, 3)) for _ in ids], ids=ids)
+        else:
+            index.remove([active[int(rng.integers(len(active)))]])
+
+        for career in CAREERS:
+            k = int(rng.integers(1, 12))
+            assert [i for i, _, _ in index.query(career, k=k)] == expected(index, career, k)
+        filters = {'Age_Group': '25-30'}
+        assert [i for i, _, _ in index.query('Y', k=3, filters=filters)] == expected(index, 'Y', 3, filters)
+
+
+def test_failed_remove_leaves_index_unchanged():
+    index = make_index(depth=2)
+    index.insert([profile([10, 0, 0]), profile([9, 0, 0]), profile([8, 0, 0])], ids=['A', 'B', 'C'])
+
+    with pytest.raises(KeyError):
+        index.remove(['A', 'missing'])
+    assert index.n_active == 3
+    assert [i for i, _, _ in index.query('X', k=3)] == ['A', 'B', 'C']
+
+    index.remove(['A', 'A'])
+    assert [i for i, _, _ in index.query('X', k=3)] == ['B', 'C']
+    index.update([profile([20, 0, 0])], ids=['C'])
+    assert [i for i, _, _ in index.query('X', k=1)] == ['C']
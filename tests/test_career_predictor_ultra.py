@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from career_predictor_ultra import UltraCareerPredictor
+
+
+def baseline_top_n(probabilities, top_n):
+    """The per-row ranking predict used before batching"""
+    return np.array([np.argsort(row, kind='stable')[-top_n:][::-1] for row in probabilities])
+
+
+@pytest.mark.parametrize('top_n', [1, 3, 5, 89, 90, 120])
+def test_select_top_n_matches_baseline_with_ties(top_n):
+    rng = np.random.default_rng(top_n)
+    # Coarse forest-like probabilities: most classes tie at 0, many others tie too
+    probabilities = rng.integers(0, 4, size=(500, 90)) * (rng.random((500, 90)) < 0.08) / 10
+
+    expected = baseline_top_n(probabilities, min(top_n, 90))
+    np.testing.assert_array_equal(UltraCareerPredictor.select_top_n(probabilities, top_n), expected)
+
+
+def test_select_top_n_without_ties():
+    probabilities = np.random.default_rng(0).dirichlet(np.ones(90), size=200)
+    np.testing.assert_array_equal(UltraCareerPredictor.select_top_n(probabilities, 5),
+                                  baseline_top_n(probabilities, 5))
+
+
+def neighbour_predictor(encoder):
+    """Just enough of a predictor for similar_profiles"""
+    predictor = UltraCareerPredictor.__new__(UltraCareerPredictor)
+    predictor.encoder = encoder
+    predictor.preprocessor = None
+    predictor.model_version = 7
+    predictor.neighbour_index = None
+    codes = np.zeros((1, 0), dtype=np.intp)
+    predictor.profile_columns = lambda profiles: (np.array([[0.5, 0.5]]), codes, None)
+    return predictor
+
+
+def test_similar_profiles_rejects_index_from_another_preprocessor(tmp_path, monkeypatch):
+    from feature_encoder_ultra import CompiledFeatureEncoder
+    from similar_profiles_ultra import DEFAULT_PATH, SimilarProfileIndex, encoding_key
+
+    def encoder(mean):
+        return CompiledFeatureEncoder(['a', 'b'], [], [mean, 0.0], [1.0, 1.0], [])
+
+    rng = np.random.default_rng(0)
+    monkeypatch.chdir(tmp_path)
+    SimilarProfileIndex.build(
+        rng.random((64, 2)), rng.integers(0, 3, 64), rng.random(64) * 100, ['x', 'y', 'z'],
+        metadata={'encoding_key': encoding_key(encoder(0.0))},
+    ).save(DEFAULT_PATH)
+
+    assert len(neighbour_predictor(encoder(0.0)).similar_profiles({}, k=3)[0]) == 3
+
+    stale = neighbour_predictor(encoder(1.0))
+    with pytest.raises(ValueError, match='different preprocessor'):
+        stale.similar_profiles({}, k=3)
+    assert stale.neighbour_index is None
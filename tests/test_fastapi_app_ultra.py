@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from fastapi_app_ultra import app
+from profile_record_ultra import ProfileSchema
+
+
+class StubPredictor:
+    """Just enough of UltraCareerPredictor for request validation"""
+
+    schema = ProfileSchema(['GPA', 'Coding_Skills'], ['Field'], [['Engineering', 'Arts']])
+    numeric_features = schema.numeric_features
+    career_classes = np.array(['Data Scientist', 'Teacher'])
+    model_version = 1
+
+    def get_personalized_advice_batch(self, profiles, careers):
+        return [[{'career': career, 'strengths': [], 'improvements': []} for career in careers[0]]]
+
+
+@pytest.fixture
+def client():
+    # No lifespan: requests rejected during validation never reach the batcher
+    app.state.model = SimpleNamespace(predictor=StubPredictor())
+    return TestClient(app)
+
+
+@pytest.mark.parametrize('profile, field', [
+    ({'GPA': 'abc'}, 'GPA'),
+    ({'GPA': 3.5, 'Field': ['x']}, 'Field'),
+    ({'Field': {'name': 'Arts'}}, 'Field'),
+])
+def test_predict_rejects_malformed_fields(client, profile, field):
+    response = client.post('/predict', json=profile)
+    assert response.status_code == 422
+    assert response.json()['detail'].startswith(f"{field} must be")
+
+
+def test_advice_rejects_list_category(client):
+    response = client.post('/advice', json={'profile': {'Field': ['x']}, 'career': 'Teacher'})
+    assert response.status_code == 422
+
+
+def test_advice_rejects_unknown_career(client):
+    response = client.post('/advice', json={'profile': {'GPA': 3.5}, 'career': 'Astronaut'})
+    assert response.status_code == 400
+    assert 'Astronaut' in response.json()['detail']
+
+
+def test_advice_for_known_career(client):
+    response = client.post('/advice', json={'profile': {'GPA': '3.5', 'Field': 'Arts'}, 'career': 'Teacher'})
+    assert response.status_code == 200
+    assert response.json()['advice'][0]['career'] == 'Teacher'
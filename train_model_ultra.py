@@ -4,44 +4,33 @@ HerApt ULTRA MODEL TRAINING
 Advanced ML with better accuracy and interpretability
 """
 
+import argparse
+import json
+import tempfile
+import time
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder, StandardScaler, OneHotEncoder
+from sklearn.preprocessing import LabelEncoder, StandardScaler, OneHotEncoder, OrdinalEncoder
 from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier, HistGradientBoostingClassifier
 from sklearn.compose import ColumnTransformer
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
+import os
+from feature_encoder_ultra import CompiledFeatureEncoder
+from forest_engine_ultra import FlatForest
+from model_artifact_ultra import export_artifact
+from forest_attribution_ultra import node_value_table
+from pipeline_cache_ultra import StageCache, file_digest, stage_key
+import forest_compression_ultra
+import model_registry_ultra
+import similar_profiles_ultra
+from dataset_loader_ultra import SCHEMA_VERSION, load_dataset, peak_rss_mb
 import warnings
 warnings.filterwarnings('ignore')
 
-print("="*80)
-print("HERAPT ULTRA MODEL TRAINING")
-print("48 Features → Success Percentage Predictions")
-print("="*80)
 
-
-print("\n[1/8] Loading ultra-enhanced dataset...")
-try:
-    df = pd.read_csv('career_path_ultra_enhanced.csv')
-    print(f"✅ Loaded {len(df)} records with {len(df.columns)} columns")
-except FileNotFoundError:
-    print("❌ career_path_ultra_enhanced.csv not found!")
-    print("   Run: python create_ultra_dataset.py")
-    exit(1)
-
-
-print(f"\n[2/8] Exploring data...")
-print(f"   Columns: {len(df.columns)}")
-print(f"   Rows: {len(df)}")
-print(f"   Careers: {df['Career'].nunique()}")
-print(f"   Success % - Min: {df['Success_Percentage'].min():.1f}%, Max: {df['Success_Percentage'].max():.1f}%")
-print(f"   Missing values: {df.isnull().sum().sum()}")
-
-
-print("\n[3/8] Defining features and target...")
-
-numeric_features = [
+NUMERIC_FEATURES = [
     'GPA', 'Extracurricular_Activities', 'Internships', 'Projects',
     'Leadership_Positions', 'Field_Specific_Courses', 'Research_Experience',
     'Coding_Skills', 'Communication_Skills', 'Problem_Solving_Skills',
@@ -57,149 +46,618 @@ numeric_features = [
     'Current_Role_Success'
 ]
 
-categorical_features = [
+CATEGORICAL_FEATURES = [
     'Academic_Stream', 'Education_Level', 'Age_Group',
     'Preferred_Work_Mode', 'Location_Preference', 'Industry_Preference',
     'Field'
 ]
 
+RF_PARAMS = {
+    'n_estimators': 200,
+    'max_depth': 30,
+    'min_samples_split': 3,
+    'min_samples_leaf': 1,
+    'random_state': 42,
+}
+
+HGB_PARAMS = {
+    'max_iter': 200,
+    'learning_rate': 0.1,
+    'early_stopping': True,
+    'validation_fraction': 0.1,
+    'n_iter_no_change': 10,
+    'random_state': 42,
+}
 
-X = df[numeric_features + categorical_features]
-y = df['Career']  
-target_success = df['Success_Percentage']  
+# 'onehot' engines get scaled numerics + one-hot categoricals and can be
+# exported as a FlatForest artifact; 'ordinal' engines get raw numerics +
+# category codes and handle the categoricals natively
+ENGINES = {
+    'rf': {
+        'name': 'Random Forest',
+        'estimator': RandomForestClassifier,
+        'params': RF_PARAMS,
+        'fit_options': {'n_jobs': -1, 'verbose': 1},
+        'features': 'onehot',
+    },
+    'et': {
+        'name': 'Extra Trees',
+        'estimator': ExtraTreesClassifier,
+        'params': RF_PARAMS,
+        'fit_options': {'n_jobs': -1, 'verbose': 1},
+        'features': 'onehot',
+    },
+    'hgb': {
+        'name': 'Hist Gradient Boosting',
+        'estimator': HistGradientBoostingClassifier,
+        'params': HGB_PARAMS,
+        'fit_options': {},
+        'features': 'ordinal',
+    },
+}
 
-print(f"✅ Numeric features: {len(numeric_features)}")
-print(f"✅ Categorical features: {len(categorical_features)}")
-print(f"✅ Total features: {len(X.columns)}")
+SPLIT_PARAMS = {'test_size': 0.2, 'random_state': 42}
+CV_FOLDS = 5
 
+OUTPUT_FILES = [
+    'career_rf_model_ultra.pkl', 'career_preprocessor_ultra.pkl',
+    'career_label_encoder_ultra.pkl', 'feature_config_ultra.pkl', 'career_model_ultra.bin',
+]
 
-print("\n[4/8] Encoding target variable...")
-le_career = LabelEncoder()
-y_encoded = le_career.fit_transform(y)
-print(f"✅ Encoded {len(le_career.classes_)} unique careers")
 
+def encode_target(df):
+    """Fit the career label encoder; returns (encoder, encoded labels)"""
 
-print("\n[5/8] Creating preprocessing pipeline...")
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', StandardScaler(), numeric_features),
-        ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical_features)
-    ])
+    le_career = LabelEncoder()
+    y_encoded = le_career.fit_transform(df['Career'])
+    return le_career, y_encoded
 
-X_processed = preprocessor.fit_transform(X)
-print(f"✅ Preprocessed features shape: {X_processed.shape}")
-print(f"✅ Total features after encoding: {X_processed.shape[1]}")
 
+def build_preprocessor(kind, numeric_features, categorical_features):
+    """ColumnTransformer for an engine's feature layout ('onehot' or 'ordinal')"""
 
-print("\n[6/8] Splitting data (80-20 train-test)...")
-X_train, X_test, y_train, y_test = train_test_split(
-    X_processed, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
-)
-print(f"✅ Training set: {len(X_train)} samples")
-print(f"✅ Test set: {len(X_test)} samples")
+    if kind == 'ordinal':
+        return ColumnTransformer(
+            transformers=[
+                ('num', 'passthrough', numeric_features),
+                ('cat', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan),
+                 categorical_features)
+            ])
 
+    return ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), numeric_features),
+            ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical_features)
+        ])
 
-print("\n[7/8] Training models...")
 
-print("\n   Training Random Forest Classifier...")
-rf_model = RandomForestClassifier(
-    n_estimators=200,       
-    max_depth=30,           
-    min_samples_split=3,
-    min_samples_leaf=1,
-    random_state=42,
-    n_jobs=-1,
-    verbose=1
-)
-rf_model.fit(X_train, y_train)
+def fit_preprocessor(df, numeric_features, categorical_features, dtype=np.float32, kind='onehot'):
+    """
+    Fit the preprocessor; returns (preprocessor, X_processed)
 
+    X_processed is cast to float32 by default: the tree engines convert their
+    input to float32 anyway, so the fitted models are the same at half the memory.
+    """
 
-y_pred_rf = rf_model.predict(X_test)
-accuracy_rf = accuracy_score(y_test, y_pred_rf)
+    preprocessor = build_preprocessor(kind, numeric_features, categorical_features)
 
-print(f"\n   ✅ Random Forest Accuracy: {accuracy_rf:.2%}")
+    X_processed = preprocessor.fit_transform(df[numeric_features + categorical_features])
+    return preprocessor, X_processed.astype(dtype, copy=False)
 
 
-cv_scores = cross_val_score(rf_model, X_processed, y_encoded, cv=5)
-print(f"   ✅ Cross-validation (5-fold): {cv_scores.mean():.2%} (±{cv_scores.std():.2%})")
+def split_data(X_processed, y_encoded):
+    """Deterministic stratified 80-20 split"""
+    return train_test_split(X_processed, y_encoded, stratify=y_encoded, **SPLIT_PARAMS)
 
 
-print("\n   Extracting feature importance...")
-feature_names = numeric_features + list(preprocessor.get_feature_names_out()[len(numeric_features):])
-feature_importance = pd.DataFrame({
-    'Feature': [f.replace('cat__', '') for f in preprocessor.get_feature_names_out()],
-    'Importance': rf_model.feature_importances_
-}).sort_values('Importance', ascending=False)
+def create_model(engine, n_categorical=len(CATEGORICAL_FEATURES)):
+    """Unfitted estimator for an ENGINES entry"""
 
-print("\n   Top 15 Most Important Features:")
-for idx, row in feature_importance.head(15).iterrows():
-    print(f"      {row['Feature']:<40} {row['Importance']:.4f}")
+    spec = ENGINES[engine]
+    options = dict(spec['fit_options'])
+    if spec['features'] == 'ordinal':
+        n_numeric = len(NUMERIC_FEATURES)
+        options['categorical_features'] = np.arange(n_numeric, n_numeric + n_categorical)
+    return spec['estimator'](**spec['params'], **options)
 
 
-print("\n[8/8] Saving models and preprocessors...")
+def train_model(engine, X_train, y_train):
+    """Fit an engine on the training split; returns (model, training seconds)"""
 
-joblib.dump(rf_model, 'career_rf_model_ultra.pkl')
-print("    career_rf_model_ultra.pkl")
+    model = create_model(engine)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    return model, time.perf_counter() - start
 
-joblib.dump(preprocessor, 'career_preprocessor_ultra.pkl')
-print("    career_preprocessor_ultra.pkl")
 
-joblib.dump(le_career, 'career_label_encoder_ultra.pkl')
-print("    career_label_encoder_ultra.pkl")
+def evaluate_model(model, X_test, y_test, X_processed, y_encoded):
+    """Hold-out accuracy and k-fold cross-validation scores"""
 
-feature_config = {
-    'numeric_features': numeric_features,
-    'categorical_features': categorical_features,
-}
-joblib.dump(feature_config, 'feature_config_ultra.pkl')
-print("    feature_config_ultra.pkl")
-
-print("\n" + "="*80)
-print(" ULTRA MODEL TRAINING COMPLETE!")
-print("="*80)
-
-print("\n MODEL SPECIFICATIONS:")
-print(f"   Algorithm: Random Forest with {rf_model.n_estimators} trees")
-print(f"   Max Depth: {rf_model.max_depth}")
-print(f"   Accuracy: {accuracy_rf:.2%}")
-print(f"   Cross-validation: {cv_scores.mean():.2%}")
-print(f"   Input Features: 48 (37 numeric + 11 categorical after encoding)")
-print(f"   Output: 90 unique careers")
-print(f"   Success Metric: 0-100% probability based on 8 factors")
-
-print("\n CAREER STATISTICS:")
-print(f"   Total unique careers: {len(le_career.classes_)}")
-print(f"   Sample careers:")
-for i, career in enumerate(le_career.classes_[:10], 1):
-    print(f"      {i:2d}. {career}")
-
-print("\n NEXT STEPS:")
-print("   1. Test the model: python career_predictor_ultra.py")
-print("   2. Run assessment form: python career_assessment_form.py")
-print("   3. Deploy API: uvicorn fastapi_app_ultra:app --reload")
-
-print("\n" + "="*80)
-
-
-print("\n SAMPLE PREDICTION:")
-print("-" * 80)
-
-sample_idx = np.random.randint(0, len(X_test))
-sample_features = X_test[sample_idx:sample_idx+1]
-sample_pred = rf_model.predict(sample_features)[0]
-sample_proba = rf_model.predict_proba(sample_features)[0]
-
-predicted_career = le_career.inverse_transform([sample_pred])[0]
-top_5_idx = np.argsort(sample_proba)[-5:][::-1]
-top_5_careers = le_career.inverse_transform(top_5_idx)
-top_5_probs = sample_proba[top_5_idx] * 100
-
-print(f"\nPredicted Career: {predicted_career}")
-print(f"\nTop 5 Predictions:")
-for i, (career, prob) in enumerate(zip(top_5_careers, top_5_probs), 1):
-    bar = "█" * int(prob / 2)
-    print(f"   {i}. {career:<40} {prob:>5.1f}% {bar}")
-
-print("\n" + "="*80)
-print("Ready to use!!")
-print("="*80)
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+    cv_scores = cross_val_score(model, X_processed, y_encoded, cv=CV_FOLDS)
+    return {'accuracy': float(accuracy), 'cv_scores': cv_scores}
+
+
+def deployed_estimator(engine, model):
+    """What UltraCareerPredictor scores with: a FlatForest for forests, else the model itself"""
+
+    if ENGINES[engine]['features'] == 'onehot':
+        return FlatForest.from_sklearn(model)
+    return model
+
+
+def measure_inference(engine, model, X_test, repeats=200):
+    """
+    Median single-row latency (ms) and batch throughput (rows/s) on
+    preprocessed features, using the engine's deployed scorer
+    """
+
+    estimator = deployed_estimator(engine, model)
+    estimator.predict_proba(X_test[:1])
+
+    timings = []
+    for i in range(repeats):
+        row = X_test[i % len(X_test):i % len(X_test) + 1]
+        start = time.perf_counter()
+        estimator.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    estimator.predict_proba(X_test)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'single_ms': float(np.median(timings) * 1000),
+        'batch_rows_per_sec': len(X_test) / batch_seconds,
+    }
+
+
+def model_sizes(engine, model, preprocessor, classes):
+    """Pickle size and (for forest engines) artifact size in bytes"""
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pickle_path = os.path.join(temp_dir, 'model.pkl')
+        joblib.dump(model, pickle_path)
+        sizes = {'pickle': os.path.getsize(pickle_path), 'artifact': None}
+        if ENGINES[engine]['features'] == 'onehot':
+            sizes['artifact'] = export_artifact(
+                os.path.join(temp_dir, 'model.bin'),
+                FlatForest.from_sklearn(model),
+                CompiledFeatureEncoder.from_preprocessor(preprocessor),
+                classes,
+            )
+    return sizes
+
+
+def print_comparison(results):
+    """Accuracy / latency / size table for every trained engine"""
+
+    print(f"\n   {'Engine':<24} {'Accuracy':>9} {'CV':>8} {'Train':>8} {'1 row':>9} "
+          f"{'Batch':>11} {'Pickle':>9} {'Artifact':>9}")
+    for engine, r in results.items():
+        artifact = f"{r['sizes']['artifact'] / 1e6:.1f}MB" if r['sizes']['artifact'] else '-'
+        print(f"   {ENGINES[engine]['name']:<24} {r['evaluation']['accuracy']:>9.2%} "
+              f"{r['evaluation']['cv_scores'].mean():>8.2%} {r['train_seconds']:>7.1f}s "
+              f"{r['inference']['single_ms']:>7.2f}ms {r['inference']['batch_rows_per_sec']:>7,.0f}/s "
+              f"{r['sizes']['pickle'] / 1e6:>7.1f}MB {artifact:>9}")
+
+
+def outputs_current(pipeline_key, engine):
+    """True when every output file exists and was written by this exact pipeline run"""
+
+    expected = [path for path in OUTPUT_FILES
+                if path != 'career_model_ultra.bin' or ENGINES[engine]['features'] == 'onehot']
+    if not all(os.path.exists(path) for path in expected):
+        return False
+    try:
+        return joblib.load('feature_config_ultra.pkl').get('pipeline_key') == pipeline_key
+    except Exception:
+        return False
+
+
+def next_model_version(models_dir=model_registry_ultra.MODELS_DIR):
+    """Version number for the model about to be written (previous or latest published + 1)"""
+
+    try:
+        previous = joblib.load('feature_config_ultra.pkl').get('model_version', 0)
+    except FileNotFoundError:
+        previous = 0
+    return max([previous] + model_registry_ultra.list_versions(models_dir)) + 1
+
+
+def publish_outputs(engine, models_dir):
+    """
+    Copy the saved model into the registry as a new version and make it CURRENT
+
+    Forest engines publish only the artifact, which serves on its own; the
+    others publish their pickles. Versions already published are left
+    alone, so a rerun does not undo a rollback.
+    """
+
+    feature_config = joblib.load('feature_config_ultra.pkl')
+    version = feature_config.get('model_version')
+    if version is None or version in model_registry_ultra.list_versions(models_dir):
+        return None
+
+    if ENGINES[engine]['features'] == 'onehot':
+        files = ['career_model_ultra.bin']
+    else:
+        files = [path for path in OUTPUT_FILES if path != 'career_model_ultra.bin']
+    metadata = {key: feature_config[key] for key in ('engine', 'accuracy', 'cv_mean', 'pipeline_key')
+                if key in feature_config}
+    return model_registry_ultra.publish(files, version, models_dir, metadata=metadata)
+
+
+def save_outputs(engine, model, preprocessor, le_career, numeric_features, categorical_features,
+                 evaluation, pipeline_key, extra_config=None, forest=None,
+                 models_dir=model_registry_ultra.MODELS_DIR):
+    """
+    Write the pickles and, for forest engines, the memory-mappable artifact
+
+    The model pickle keeps its career_rf_model_ultra.pkl name for every
+    engine; feature_config['engine'] records which one it holds and
+    feature_config['model_version'] counts the models written so far.
+
+    Args:
+        evaluation: dict with 'accuracy' and optionally 'cv_scores'
+        extra_config: additional feature_config / artifact metadata entries
+        forest: (FlatForest, node_value_table output) to export instead of
+                the full model, e.g. a compressed candidate
+        models_dir: registry whose published versions the version number continues
+
+    Returns:
+        the model version written
+    """
+
+    model_version = next_model_version(models_dir)
+    metadata = {
+        'engine': engine,
+        'model_version': model_version,
+        'accuracy': evaluation['accuracy'],
+        'pipeline_key': pipeline_key,
+        **(extra_config or {}),
+    }
+    if 'cv_scores' in evaluation:
+        metadata['cv_mean'] = float(evaluation['cv_scores'].mean())
+
+    joblib.dump(model, 'career_rf_model_ultra.pkl')
+    print(f"    career_rf_model_ultra.pkl ({ENGINES[engine]['name']})")
+
+    joblib.dump(preprocessor, 'career_preprocessor_ultra.pkl')
+    print("    career_preprocessor_ultra.pkl")
+
+    joblib.dump(le_career, 'career_label_encoder_ultra.pkl')
+    print("    career_label_encoder_ultra.pkl")
+
+    if ENGINES[engine]['features'] == 'onehot':
+        if forest is None:
+            forest = FlatForest.from_sklearn(model)
+            node_values = node_value_table(model, forest)
+        else:
+            forest, node_values = forest
+        artifact_size = export_artifact(
+            'career_model_ultra.bin',
+            forest,
+            CompiledFeatureEncoder.from_preprocessor(preprocessor),
+            le_career.classes_,
+            metadata=metadata,
+            node_values=node_values,
+        )
+        pickle_size = os.path.getsize('career_rf_model_ultra.pkl')
+        print(f"    career_model_ultra.bin ({artifact_size / 1e6:.1f} MB vs {pickle_size / 1e6:.1f} MB model pickle)")
+    elif os.path.exists('career_model_ultra.bin'):
+        # A stale forest artifact would otherwise be served instead of this model
+        os.remove('career_model_ultra.bin')
+        print("    removed career_model_ultra.bin (no artifact format for this engine)")
+
+    # Written last: its pipeline_key marks the whole set as complete
+    feature_config = {
+        'numeric_features': numeric_features,
+        'categorical_features': categorical_features,
+        **metadata,
+    }
+    joblib.dump(feature_config, 'feature_config_ultra.pkl')
+    print(f"    feature_config_ultra.pkl (model version {model_version})")
+    return model_version
+
+
+def neighbours_current(features_key):
+    """True when the saved similar-profile index was built from these features"""
+
+    try:
+        with open(os.path.join(similar_profiles_ultra.DEFAULT_PATH, 'manifest.json')) as f:
+            metadata = json.load(f)['metadata']
+    except (OSError, ValueError, KeyError):
+        return False
+    return (metadata.get('features_key') == features_key
+            and metadata.get('version') == similar_profiles_ultra.INDEX_VERSION)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the HerApt ultra career model")
+    parser.add_argument('--data', default='career_path_ultra_enhanced.csv', help="training CSV")
+    parser.add_argument('--cache-dir', default='.herapt_cache', help="stage cache directory")
+    parser.add_argument('--no-cache', action='store_true', help="recompute every stage")
+    parser.add_argument('--clear-cache', action='store_true', help="delete cached stages first")
+    parser.add_argument('--legacy-loader', action='store_true',
+                        help="plain pd.read_csv and float64 features (for memory comparisons)")
+    parser.add_argument('--engine', choices=sorted(ENGINES) + ['all'], default='rf',
+                        help="model to train; 'all' trains each, prints a comparison and "
+                             "keeps the best cross-validation score")
+    parser.add_argument('--models-dir', default=model_registry_ultra.MODELS_DIR,
+                        help="model registry to publish the new version to ('' to skip)")
+    parser.add_argument('--compress', action='store_true',
+                        help="export the smallest compressed forest meeting the targets below")
+    parser.add_argument('--latency-ms', type=float, default=0.5, help="compression: single-row latency target")
+    parser.add_argument('--min-top1', type=float, default=0.9, help="compression: minimum top-1 agreement")
+    parser.add_argument('--min-top5', type=float, default=0.8, help="compression: minimum top-5 agreement")
+    parser.add_argument('--distill', action='store_true', help="compression: also try distilled students")
+    args = parser.parse_args(argv)
+
+    engines = list(ENGINES) if args.engine == 'all' else [args.engine]
+
+    cache = StageCache(args.cache_dir, enabled=not args.no_cache)
+    if args.clear_cache:
+        cache.clear()
+
+    numeric_features = NUMERIC_FEATURES
+    categorical_features = CATEGORICAL_FEATURES
+
+    print("="*80)
+    print("HERAPT ULTRA MODEL TRAINING")
+    print("48 Features → Success Percentage Predictions")
+    print("="*80)
+
+
+    print("\n[1/8] Loading ultra-enhanced dataset...")
+    try:
+        data_digest = file_digest(args.data)
+    except FileNotFoundError:
+        print(f"❌ {args.data} not found!")
+        print("   Run: python create_ultra_dataset.py")
+        exit(1)
+    if args.legacy_loader:
+        df = pd.read_csv(args.data)
+        data_key = stage_key('dataset', data_digest, 'legacy')
+        feature_dtype = np.float64
+    else:
+        column_cache = os.path.join(args.cache_dir, 'columns') if cache.enabled else None
+        df = load_dataset(args.data, cache_dir=column_cache, digest=data_digest)
+        data_key = stage_key('dataset', data_digest, SCHEMA_VERSION)
+        feature_dtype = np.float32
+    print(f"✅ Loaded {len(df)} records with {len(df.columns)} columns "
+          f"({df.memory_usage(deep=True).sum() / 1e6:.1f} MB in memory)")
+
+
+    print(f"\n[2/8] Exploring data...")
+    print(f"   Columns: {len(df.columns)}")
+    print(f"   Rows: {len(df)}")
+    print(f"   Careers: {df['Career'].nunique()}")
+    print(f"   Success % - Min: {df['Success_Percentage'].min():.1f}%, Max: {df['Success_Percentage'].max():.1f}%")
+    print(f"   Missing values: {df.isnull().sum().sum()}")
+
+
+    print("\n[3/8] Defining features and target...")
+    print(f"✅ Numeric features: {len(numeric_features)}")
+    print(f"✅ Categorical features: {len(categorical_features)}")
+    print(f"✅ Total features: {len(numeric_features) + len(categorical_features)}")
+
+
+    print("\n[4/8] Encoding target variable...")
+    (le_career, y_encoded), target_key = cache.run('target', [data_key], lambda: encode_target(df))
+    print(f"✅ Encoded {len(le_career.classes_)} unique careers")
+
+
+    print("\n[5/8] Creating preprocessing pipeline...")
+    features = {}
+    for kind in sorted({ENGINES[engine]['features'] for engine in engines}):
+        (preprocessor, X_processed), features_key = cache.run(
+            'features', [data_key, numeric_features, categorical_features,
+                         np.dtype(feature_dtype).name, kind],
+            lambda: fit_preprocessor(df, numeric_features, categorical_features, feature_dtype, kind),
+            mmap_mode='r',
+        )
+        features[kind] = (preprocessor, X_processed, features_key)
+        print(f"✅ {kind} features shape: {X_processed.shape} ({X_processed.dtype}, {X_processed.nbytes / 1e6:.1f} MB)")
+
+
+    print("\n[6/8] Splitting data (80-20 train-test)...")
+    splits = {kind: split_data(X_processed, y_encoded) for kind, (_, X_processed, _) in features.items()}
+    X_train, X_test, y_train, y_test = next(iter(splits.values()))
+    print(f"✅ Training set: {len(X_train)} samples")
+    print(f"✅ Test set: {len(X_test)} samples")
+    print(f"✅ Peak memory after data stages: {peak_rss_mb():.0f} MB")
+
+
+    print("\n[7/8] Training models...")
+    results = {}
+    for engine in engines:
+        kind = ENGINES[engine]['features']
+        preprocessor, X_processed, features_key = features[kind]
+        X_train, X_test, y_train, y_test = splits[kind]
+
+        print(f"\n   Training {ENGINES[engine]['name']} Classifier...")
+        (model, train_seconds), model_key = cache.run(
+            'model', [features_key, target_key, engine, ENGINES[engine]['params'], SPLIT_PARAMS],
+            lambda: train_model(engine, X_train, y_train),
+        )
+
+        evaluation, _ = cache.run(
+            'evaluation', [model_key, CV_FOLDS],
+            lambda: evaluate_model(model, X_test, y_test, X_processed, y_encoded),
+        )
+        cv_scores = evaluation['cv_scores']
+
+        print(f"\n   ✅ {ENGINES[engine]['name']} Accuracy: {evaluation['accuracy']:.2%}")
+        print(f"   ✅ Cross-validation ({CV_FOLDS}-fold): {cv_scores.mean():.2%} (±{cv_scores.std():.2%})")
+
+        results[engine] = {
+            'model': model,
+            'model_key': model_key,
+            'train_seconds': train_seconds,
+            'evaluation': evaluation,
+        }
+        if len(engines) > 1:
+            results[engine]['inference'] = measure_inference(engine, model, X_test)
+            results[engine]['sizes'] = model_sizes(engine, model, preprocessor, le_career.classes_)
+
+    if len(engines) > 1:
+        print("\n   Engine comparison (inference on preprocessed features, deployed scorer):")
+        print_comparison(results)
+
+    engine = max(results, key=lambda e: results[e]['evaluation']['cv_scores'].mean())
+    if len(engines) > 1:
+        print(f"\n   Keeping {ENGINES[engine]['name']} (best cross-validation score)")
+
+    model = results[engine]['model']
+    model_key = results[engine]['model_key']
+    evaluation = results[engine]['evaluation']
+    preprocessor = features[ENGINES[engine]['features']][0]
+    X_train, X_test, y_train, y_test = splits[ENGINES[engine]['features']]
+    accuracy = evaluation['accuracy']
+    cv_scores = evaluation['cv_scores']
+
+
+    if hasattr(model, 'feature_importances_'):
+        print("\n   Extracting feature importance...")
+        feature_importance = pd.DataFrame({
+            'Feature': [f.replace('cat__', '') for f in preprocessor.get_feature_names_out()],
+            'Importance': model.feature_importances_
+        }).sort_values('Importance', ascending=False)
+
+        print("\n   Top 15 Most Important Features:")
+        for idx, row in feature_importance.head(15).iterrows():
+            print(f"      {row['Feature']:<40} {row['Importance']:.4f}")
+
+
+    output_key = model_key
+    compressed_forest, compression = None, None
+    if args.compress and ENGINES[engine]['features'] == 'onehot':
+        targets = {'latency_ms': args.latency_ms, 'min_top1': args.min_top1, 'min_top5': args.min_top5}
+        print(f"\n   Compressing the forest (≤{args.latency_ms}ms per row, top-1 ≥{args.min_top1:.0%}, "
+              f"top-5 ≥{args.min_top5:.0%})...")
+        (report, ranking), search_key = cache.run(
+            'compression', [model_key, args.distill, forest_compression_ultra.SEARCH_VERSION],
+            lambda: forest_compression_ultra.search(
+                model, X_test, distill=args.distill, X_train=X_train,
+                n_numeric=len(numeric_features), verbose=False,
+            ),
+        )
+        compression = forest_compression_ultra.select(report, **targets)
+        forest_compression_ultra.print_report(report, compression)
+        with open('compression_report_ultra.json', 'w') as f:
+            json.dump({'targets': targets, 'chosen': compression and compression['name'],
+                       'tree_ranking': ranking, 'candidates': report}, f, indent=2)
+        print("   Saved compression_report_ultra.json")
+
+        output_key = stage_key('outputs', search_key, targets)
+        if compression is None:
+            print("   ⚠️  No candidate meets the targets; exporting the full forest")
+        else:
+            print(f"   ✅ Exporting {compression['name']}")
+            compressed_forest = forest_compression_ultra.build_candidate(
+                model, compression, ranking, X_train, len(numeric_features), with_node_values=True)
+    elif args.compress:
+        print(f"\n   ⚠️  --compress only applies to forest engines, not {ENGINES[engine]['name']}")
+
+
+    print("\n[8/8] Saving models and preprocessors...")
+    if outputs_current(output_key, engine):
+        print("    Model files already match this run; nothing to write")
+    else:
+        save_outputs(engine, model, preprocessor, le_career, numeric_features, categorical_features,
+                     evaluation, output_key,
+                     extra_config={'compression': compression} if compression else None,
+                     forest=compressed_forest, models_dir=args.models_dir or model_registry_ultra.MODELS_DIR)
+    if args.models_dir:
+        published = publish_outputs(engine, args.models_dir)
+        if published:
+            print(f"    {published}/ published and made CURRENT (running services pick it up on reload)")
+
+    features_key = features[ENGINES[engine]['features']][2]
+    if neighbours_current(features_key):
+        print(f"    {similar_profiles_ultra.DEFAULT_PATH}/ already matches these features")
+    else:
+        X_processed = features[ENGINES[engine]['features']][1]
+        try:
+            encoder = CompiledFeatureEncoder.from_preprocessor(preprocessor)
+        except ValueError:
+            encoder = None
+        metadata = {
+            'features_key': features_key,
+            'encoding_key': similar_profiles_ultra.encoding_key(encoder, preprocessor),
+            'version': similar_profiles_ultra.INDEX_VERSION,
+        }
+        neighbours, _ = cache.run(
+            'neighbours', [features_key, target_key, similar_profiles_ultra.INDEX_VERSION],
+            lambda: similar_profiles_ultra.SimilarProfileIndex.build(
+                X_processed, y_encoded, df['Success_Percentage'].to_numpy(), le_career.classes_,
+                metadata=metadata,
+            ),
+        )
+        neighbours.save(similar_profiles_ultra.DEFAULT_PATH)
+        print(f"    {similar_profiles_ultra.DEFAULT_PATH}/ ({len(neighbours):,} profiles, "
+              f"{len(neighbours.centroids)} IVF lists, recall@{similar_profiles_ultra.RECALL_K} "
+              f"{neighbours.recall_curve[neighbours.n_probe]:.0%} at n_probe={neighbours.n_probe})")
+    print(f"    Stage cache: {cache.summary()}")
+    print(f"    Peak memory: {peak_rss_mb():.0f} MB")
+
+    print("\n" + "="*80)
+    print(" ULTRA MODEL TRAINING COMPLETE!")
+    print("="*80)
+
+    print("\n MODEL SPECIFICATIONS:")
+    if engine == 'hgb':
+        print(f"   Algorithm: {ENGINES[engine]['name']} with {model.n_iter_} iterations")
+        print(f"   Categoricals: native ({len(categorical_features)} ordinal-encoded columns)")
+    else:
+        print(f"   Algorithm: {ENGINES[engine]['name']} with {model.n_estimators} trees")
+        print(f"   Max Depth: {model.max_depth}")
+    print(f"   Accuracy: {accuracy:.2%}")
+    print(f"   Cross-validation: {cv_scores.mean():.2%}")
+    print(f"   Input Features: 48 (37 numeric + 11 categorical after encoding)")
+    print(f"   Output: 90 unique careers")
+    print(f"   Success Metric: 0-100% probability based on 8 factors")
+
+    print("\n CAREER STATISTICS:")
+    print(f"   Total unique careers: {len(le_career.classes_)}")
+    print(f"   Sample careers:")
+    for i, career in enumerate(le_career.classes_[:10], 1):
+        print(f"      {i:2d}. {career}")
+
+    print("\n NEXT STEPS:")
+    print("   1. Test the model: python career_predictor_ultra.py")
+    print("   2. Run assessment form: python career_assessment_form.py")
+    print("   3. Deploy API: uvicorn fastapi_app_ultra:app --reload")
+    print("   4. Roll out to a running API: curl -X POST localhost:8000/reload")
+
+    print("\n" + "="*80)
+
+
+    print("\n SAMPLE PREDICTION:")
+    print("-" * 80)
+
+    sample_idx = np.random.randint(0, len(X_test))
+    sample_features = X_test[sample_idx:sample_idx+1]
+    sample_pred = model.predict(sample_features)[0]
+    sample_proba = model.predict_proba(sample_features)[0]
+
+    predicted_career = le_career.inverse_transform([sample_pred])[0]
+    top_5_idx = np.argsort(sample_proba)[-5:][::-1]
+    top_5_careers = le_career.inverse_transform(top_5_idx)
+    top_5_probs = sample_proba[top_5_idx] * 100
+
+    print(f"\nPredicted Career: {predicted_career}")
+    print(f"\nTop 5 Predictions:")
+    for i, (career, prob) in enumerate(zip(top_5_careers, top_5_probs), 1):
+        bar = "█" * int(prob / 2)
+        print(f"   {i}. {career:<40} {prob:>5.1f}% {bar}")
+
+    print("\n" + "="*80)
+    print("Ready to use!!")
+    print("="*80)
+
+
+
+if __name__ == "__main__":
+    main()